@@ -0,0 +1,224 @@
+###
+###  Deterministic synthetic logs for benchmarking the parsers.
+###
+###  Each format has a function that writes one line, either one that the
+###  parsers for that format are interested in or one that they are not, so
+###  that logs can be generated with any share of matching lines.  The same
+###  seed always gives the same log.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import random
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+CODES = ('200', '200', '200', '200', '304', '404', '500')
+COLLECTIONS = ('ms_os', 'ms_geology', 'ms_marine', 'ms_historic')
+PRODUCTS = ('OS', 'GEOLOGY', 'MARINE')
+CACHES = ('os-base', 'os-roads', 'historic-1900')
+
+
+def ip(rng):
+    return '%d.%d.%d.%d' % (rng.randint(1, 223), rng.randint(0, 255), rng.randint(0, 255), rng.randint(1, 254))
+
+
+def clock(rng):
+    return '%02d:%02d:%02d' % (rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+
+
+def apache_time(rng):
+    return '%02d/%s/2026:%s +0000' % (rng.randint(1, 28), rng.choice(MONTHS), clock(rng))
+
+
+# Requests that each of the parsers of the Digimap Apache logs is
+# interested in, as (layout, method, path).  The layouts are those of the
+# vhosts' logs: 'map' has the vhost first and the response time in
+# microseconds last, 'web' has the response time and session after the user
+# agent, and 'cosmo' has the response time after the client address.
+APACHE_REQUESTS = {
+    'DMMapLogster': (
+        ('map', 'GET', '/cgi-bin/mapserv?map=mapfiles/%(collection)s/%(collection)s.map&mode=map&layers=all'),
+        ('map', 'GET', '/clive/clive?product=%(product)s&request=GetMap&bbox=0,0,1000,1000'),
+        ('map', 'POST', '/clive/clive?log=%(product)s&format=pdf'),
+    ),
+    'DMMapServerLogster': (
+        ('map', 'GET', '/cgi-bin/mapserv?map=/etc/mapserver/mapfiles/%(collection)s/base.map&mode=map'),
+    ),
+    'DMMapProxyLogster': (
+        ('map', 'GET', '/mapproxy/service?layers=%(cache)s&tiled=true&bbox=0,0,256,256'),
+        ('map', 'GET', '/mapproxy/service?layers=%(cache)s&request=GetMap'),
+    ),
+    'DMTileLogster': (
+        ('map', 'GET', '/%(product)s/tilecache.py?layers=%(cache)s&x=1&y=2&z=3'),
+    ),
+    'DMEdiAuthLogster': (
+        ('map', 'GET', '/cgi-bin/getSession?user=%(user)s'),
+    ),
+    'DfCMapLogster': (
+        ('map', 'GET', '/cgi-bin/mapserv?map=mapfiles/%(collection)s/%(collection)s.map&mode=map&layers=all'),
+        ('map', 'GET', '/clive/clive?product=%(product)s&request=GetMap&bbox=0,0,1000,1000'),
+        ('map', 'GET', '/mapstream/wms?request=GetMap&layers=%(cache)s'),
+    ),
+    'DMWebLogster': (
+        ('web', 'GET', '/login?service=digimap'),
+        ('web', 'POST', '/roam/api/schools/login'),
+        ('web', 'PUT', '/api/user/register'),
+        ('web', 'POST', '/roam/api/download/orders'),
+        ('web', 'GET', '/mapproxy/wmsMap?layers=%(cache)s'),
+        ('web', 'GET', '/mapproxy/wms/%(cache)s?request=GetMap'),
+        ('web', 'GET', '/dfsmapproxy/wmsMap?layers=%(cache)s'),
+    ),
+    'DfCWebLogster': (
+        ('web', 'GET', '/login?service=dfc'),
+        ('cosmo', 'POST', '/dfc/cosmo-print'),
+        ('cosmo', 'GET', '/dfc/dfcmapproxy/wmsMap?layers=%(cache)s'),
+        ('cosmo', 'POST', '/dfc/cosmo-my-maps'),
+        ('cosmo', 'GET', '/dfc/cosmo-get-my-map?id=%(user)s'),
+    ),
+    'DfSWebLogster': (
+        ('cosmo', 'POST', '/submit-login'),
+        ('cosmo', 'POST', '/dfs/cosmo-print'),
+        ('cosmo', 'GET', '/dfs/dfsmapproxy/wmsMap?layers=%(cache)s'),
+        ('cosmo', 'POST', '/dfs/cosmo-my-maps'),
+        ('cosmo', 'GET', '/dfs/cosmo-get-my-map?id=%(user)s'),
+    ),
+}
+APACHE_REQUESTS['DfSMapLogster'] = APACHE_REQUESTS['DMMapLogster']
+
+# Requests that none of the parsers above is interested in.
+APACHE_NOISE = (
+    ('map', 'GET', '/static/css/site-%(user)s.css'),
+    ('map', 'GET', '/images/logo.png'),
+    ('web', 'GET', '/help/faq.html'),
+    ('cosmo', 'HEAD', '/'),
+)
+
+
+def fields(rng):
+    return {
+        'collection': rng.choice(COLLECTIONS),
+        'product': rng.choice(PRODUCTS),
+        'cache': rng.choice(CACHES),
+        'user': rng.randint(1, 100000),
+    }
+
+
+def apache_line(rng, matching, parser=None):
+    """The Apache access logs written by the Digimap servers.  Matching lines
+    are requests that parser, or any of the Digimap parsers, is interested
+    in.  SampleLogster and ApacheLogster count every request, so for them
+    the other lines are timed out connections that made no request."""
+    code = rng.choice(CODES)
+    size = rng.randint(100, 200000)
+    usec = rng.randint(500, 5000000)
+    if parser in APACHE_REQUESTS or parser is None:
+        requests = APACHE_NOISE
+        if matching:
+            requests = APACHE_REQUESTS.get(parser) or rng.choice(list(APACHE_REQUESTS.values()))
+        layout, method, path = rng.choice(requests)
+        request = '%s %s HTTP/1.1' % (method, path % fields(rng))
+    elif matching:
+        method, path = rng.choice(APACHE_NOISE)[1:]
+        layout, request = 'map', '%s %s HTTP/1.1' % (method, path % fields(rng))
+    else:
+        layout, request, code, size = 'map', '-', '408', 0
+
+    if layout == 'web':
+        return '%s - - [%s] "%s" %s %d "-" "Mozilla/5.0" %d %s -\n' % (
+            ip(rng), apache_time(rng), request, code, size, usec, 'dm-web')
+    if layout == 'cosmo':
+        return '%s %d %s - - [%s] "%s" %s %d "-" "Mozilla/5.0"\n' % (
+            ip(rng), usec, ip(rng), apache_time(rng), request, code, size)
+    return 'dm-%s.edina.ac.uk %s - - [%s] "%s" %s %d Response: %d\n' % (
+        rng.choice(('map', 'tiles', 'www')), ip(rng), apache_time(rng), request, code, size, usec)
+
+
+def squid_line(rng, matching, parser=None):
+    """Squid's native access log."""
+    if not matching:
+        return '%s| WARNING: Forwarding loop detected for:\n' % clock(rng)
+    result = rng.choice(('TCP_MISS', 'TCP_HIT', 'TCP_MEM_HIT', 'TCP_REFRESH_HIT', 'TCP_DENIED'))
+    return '%d.%03d %6d %s %s/%s %d GET http://example.com/%d - DIRECT/%s text/html\n' % (
+        rng.randint(1700000000, 1800000000), rng.randint(0, 999), rng.randint(0, 5000), ip(rng),
+        result, rng.choice(CODES), rng.randint(100, 200000), rng.randint(1, 1000), ip(rng))
+
+
+def postfix_line(rng, matching, parser=None):
+    """The Postfix mail log."""
+    stamp = '%s %2d %s mail' % (rng.choice(MONTHS), rng.randint(1, 28), clock(rng))
+    queue_id = '%010X' % rng.randint(0, 0xffffffffff)
+    if not matching:
+        return '%s postfix/smtpd[%d]: connect from unknown[%s]\n' % (stamp, rng.randint(100, 99999), ip(rng))
+    return ('%s postfix/smtp[%d]: %s: to=<user%d@example.com>, relay=mx.example.com[%s]:25, '
+            'delay=%.2f, delays=0.1/0/0.2/0.3, dsn=2.0.0, status=%s (250 ok)\n') % (
+        stamp, rng.randint(100, 99999), queue_id, rng.randint(1, 1000), ip(rng),
+        rng.uniform(0, 30), rng.choice(('sent', 'sent', 'sent', 'deferred', 'bounced')))
+
+
+def log4j_line(rng, matching, parser=None):
+    """A log4j log with a %d{HH:mm:ss.SSS} %p pattern."""
+    if not matching and rng.randint(0, 1):
+        return '\tat com.example.service.Handler.handle(Handler.java:%d)\n' % rng.randint(1, 500)
+    # Log4jLogster counts WARN, ERROR and FATAL by default.
+    level = matching and rng.choice(('WARN', 'ERROR', 'FATAL')) or rng.choice(('INFO', 'DEBUG'))
+    return '%s.%03d %s [worker-%d] com.example.service.Handler - request %d took %dms\n' % (
+        clock(rng), rng.randint(0, 999), level, rng.randint(1, 32), rng.randint(1, 100000), rng.randint(1, 5000))
+
+
+def error_log_line(rng, matching, parser=None):
+    """Apache's error_log."""
+    if not matching:
+        return 'PHP Warning:  Undefined variable $id in /var/www/index.php on line %d\n' % rng.randint(1, 500)
+    return '[%s %s %02d %s 2026] [%s] [client %s] File does not exist: /var/www/%d\n' % (
+        rng.choice(DAYS), rng.choice(MONTHS), rng.randint(1, 28), clock(rng),
+        rng.choice(('notice', 'warn', 'error', 'crit', 'debug')), ip(rng), rng.randint(1, 1000))
+
+
+def metric_line(rng, matching, parser=None):
+    """Application logs with METRIC_COUNT and METRIC_TIME lines."""
+    stamp = '2026-%02d-%02d %s' % (rng.randint(1, 12), rng.randint(1, 28), clock(rng))
+    if not matching:
+        return '%s INFO request handled for user %d\n' % (stamp, rng.randint(1, 100000))
+    if rng.randint(0, 1):
+        return '%s INFO METRIC_COUNT metric=jobs.%s value=%d \n' % (
+            stamp, rng.choice(('done', 'failed', 'queued')), rng.randint(1, 10))
+    return '%s INFO METRIC_TIME metric=db.%s value=%.1f ms\n' % (
+        stamp, rng.choice(('select', 'insert', 'update')), rng.uniform(0.1, 500))
+
+
+# Each format's line function, and the parsers that read it.
+FORMATS = {
+    'apache': (apache_line, ('SampleLogster', 'ApacheLogster', 'DMWebLogster', 'DMMapLogster',
+                             'DMMapProxyLogster', 'DMMapServerLogster', 'DMTileLogster', 'DMEdiAuthLogster',
+                             'DfCMapLogster', 'DfCWebLogster', 'DfSMapLogster', 'DfSWebLogster')),
+    'squid': (squid_line, ('SquidLogster',)),
+    'postfix': (postfix_line, ('PostfixLogster',)),
+    'log4j': (log4j_line, ('Log4jLogster',)),
+    'error_log': (error_log_line, ('ErrorLogLogster',)),
+    'metric': (metric_line, ('MetricLogster',)),
+}
+
+
+def generate(format, count, match_ratio, seed=0, parser=None):
+    """Return count lines of the named format, of which about match_ratio
+    are lines that parser (or any of the format's parsers) is interested
+    in."""
+    line = FORMATS[format][0]
+    rng = random.Random(seed)
+    return [line(rng, rng.random() < match_ratio, parser) for i in range(count)]
@@ -0,0 +1,187 @@
+###
+###  Parser throughput benchmarks.
+###
+###  Runs every bundled parser over synthetic logs of its format at several
+###  shares of matching lines, measuring lines parsed per second and the
+###  memory used, and writes the results as JSON so that runs from
+###  different commits can be compared:
+###
+###      $ python -m benchmarks.run --output before.json
+###      ... change something ...
+###      $ python -m benchmarks.run --output after.json
+###      $ python -m benchmarks.run --compare before.json after.json
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import optparse
+import subprocess
+import multiprocessing
+
+from logster.logster_helper import parse_lines
+from logster.registry import load_parser_class
+from logster.run_stats import RunStats
+from benchmarks.generators import FORMATS, generate
+
+
+def measure(args):
+    """Time one parser over one synthetic log. Run in a fresh worker process
+    so that its peak memory is its own."""
+    name, format, count, match_ratio, repeat = args
+    lines = generate(format, count, match_ratio, parser=name)
+    parser_class = load_parser_class(name)
+
+    # Count what the parser made of the lines, then time it without the
+    # counting getting in the way.
+    stats = RunStats()
+    stats.parse_lines(parser_class(), lines)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = None
+    for i in range(repeat):
+        parser = parser_class()
+        started = time.time()
+        parse_lines(parser, lines)
+        parser.get_state(60)
+        elapsed = time.time() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        'parser': name,
+        'format': format,
+        'match_ratio': match_ratio,
+        'lines': count,
+        'lines_matched': stats.lines_matched,
+        'lines_skipped': stats.lines_skipped,
+        'parse_exceptions': stats.parse_exceptions,
+        'seconds': best,
+        'lines_per_second': best and count / best or 0.0,
+        # ru_maxrss is in kilobytes on Linux.
+        'peak_memory_kb': rss_after,
+        'parse_memory_kb': rss_after - rss_before,
+    }
+
+
+def commit():
+    """The commit being benchmarked, if this is a git checkout."""
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, cwd=os.path.dirname(os.path.abspath(__file__)))
+        out = process.communicate()[0]
+    except OSError:
+        return None
+    if process.returncode != 0:
+        return None
+    return out.decode('ascii').strip()
+
+
+def run(parsers, ratios, count, repeat):
+    jobs = []
+    for format in sorted(FORMATS):
+        for name in FORMATS[format][1]:
+            if parsers and name not in parsers:
+                continue
+            for ratio in ratios:
+                jobs.append((name, format, count, ratio, repeat))
+
+    results = []
+    for job in jobs:
+        pool = multiprocessing.Pool(1)
+        try:
+            result = pool.apply(measure, (job,))
+        finally:
+            pool.terminate()
+            pool.join()
+        sys.stderr.write('%-20s %-10s %4.2f %12.0f lines/s %8d kB\n' % (
+            result['parser'], result['format'], result['match_ratio'], result['lines_per_second'],
+            result['peak_memory_kb']))
+        results.append(result)
+    return results
+
+
+def compare(old_file, new_file):
+    """Print the change in throughput of each benchmark between two runs."""
+    old = json.load(open(old_file))
+    new = json.load(open(new_file))
+    before = dict(((r['parser'], r['match_ratio']), r) for r in old['results'])
+    print('%-20s %6s %14s %14s %8s' % ('parser', 'ratio', old.get('commit') or old_file,
+                                        new.get('commit') or new_file, 'change'))
+    for result in new['results']:
+        key = (result['parser'], result['match_ratio'])
+        if key not in before:
+            continue
+        was = before[key]['lines_per_second']
+        now = result['lines_per_second']
+        change = was and 100.0 * (now - was) / was or 0.0
+        print('%-20s %6.2f %14.0f %14.0f %+7.1f%%' % (key[0], key[1], was, now, change))
+
+
+def main():
+    cmdline = optparse.OptionParser(usage='usage: %prog [options] [parser...]',
+                                    description='Benchmark the throughput of the logster parsers.')
+    cmdline.add_option('--lines', type='int', default=100000,
+                       help='Lines in each synthetic log. Default is %default.')
+    cmdline.add_option('--ratios', default='0.1,0.5,0.9',
+                       help='Comma-separated shares of lines that the parser is interested in. Default is %default.')
+    cmdline.add_option('--repeat', type='int', default=3,
+                       help='Times to parse each log, keeping the fastest. Default is %default.')
+    cmdline.add_option('--output', '-o',
+                       help='File to write the results to as JSON. Default is benchmarks/results/<commit>.json.')
+    cmdline.add_option('--compare', nargs=2, metavar='OLD NEW',
+                       help='Compare two results files instead of running the benchmarks.')
+    options, parsers = cmdline.parse_args()
+
+    if options.compare:
+        compare(*options.compare)
+        return
+
+    ratios = [float(ratio) for ratio in options.ratios.split(',')]
+    revision = commit()
+    report = {
+        'commit': revision,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'lines': options.lines,
+        'results': run(parsers, ratios, options.lines, options.repeat),
+    }
+
+    output = options.output
+    if not output:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        output = os.path.join(directory, '%s.json' % (revision or 'latest'))
+    f = open(output, 'w')
+    try:
+        json.dump(report, f, indent=2, sort_keys=True)
+    finally:
+        f.close()
+    sys.stderr.write('Wrote %s\n' % output)
+
+
+if __name__ == '__main__':
+    main()
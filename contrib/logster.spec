@@ -13,7 +13,7 @@ BuildRoot:      %{_tmppath}/%{name}-%{version}-%{release}-root-%(%{__id_u} -n)
 
 BuildArch:      noarch
 BuildRequires:  python-devel
-Requires:       logcheck,python
+Requires:       python
 
 %description
 Logster is a utility for reading log files and generating metrics in Graphite
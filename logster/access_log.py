@@ -0,0 +1,284 @@
+###
+###  Splitting Apache access log lines into their fields.
+###
+###  The parsers of the Digimap access logs each pull the same few fields
+###  (the request, status, size and response time) out of every line with
+###  their own regular expressions, most of which start with '.*' and so
+###  backtrack over the whole line.  parse() splits a line into an
+###  AccessRecord in one pass, with str.split() and str.partition() rather
+###  than regular expressions, honouring the quotes around the request,
+###  referer and user agent and the brackets around the time.
+###
+###  Parsers that work on records subclass AccessLogParser and implement
+###  parse_record().  When several of them are run over the same log, each
+###  line is only split once and the record is shared between them.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+from logster.logster_helper import LogsterParser
+
+# Marks the response time in the logs of the map servers.
+RESPONSE_MARKER = 'Response:'
+
+# Marks the fields of an AccessRecord that have not been picked out yet.
+UNSET = object()
+
+
+def split_quoted(line):
+    """Split a line at its double quotes, so that the odd-numbered parts are
+    the quoted fields.  Apache escapes a quote inside a field as \\", so a
+    quote after an odd number of backslashes does not end the field."""
+    parts = line.split('"')
+    if '\\"' not in line:
+        return parts
+    joined = [parts[0]]
+    for part in parts[1:]:
+        last = joined[-1]
+        if len(joined) % 2 == 0 and (len(last) - len(last.rstrip('\\'))) % 2:
+            joined[-1] = last + '"' + part
+        else:
+            joined.append(part)
+    return joined
+
+
+def _split_unquoted(segment, fields):
+    """Add the fields of a part of a line outside quotes to fields, taking
+    anything in brackets as a single field."""
+    while '[' in segment:
+        before, bracket, rest = segment.partition('[')
+        inside, bracket, segment = rest.partition(']')
+        fields.extend(before.split())
+        fields.append(inside)
+    fields.extend(segment.split())
+
+
+def _fields(parts):
+    """The fields of a line split by split_quoted(), and the index of the
+    first quoted one, or None if there is none."""
+    fields = []
+    first_quoted = None
+    for i, part in enumerate(parts):
+        if i % 2:
+            if first_quoted is None:
+                first_quoted = len(fields)
+            if i == len(parts) - 1:
+                # An unterminated quote runs to the end of the line.
+                part = part.rstrip('\n')
+            fields.append(part)
+        else:
+            _split_unquoted(part, fields)
+    return fields, first_quoted
+
+
+def tokenize(line):
+    """Split a line into its fields, returning (fields, index of the first
+    quoted field, or None if there is none).  Fields are separated by
+    whitespace, except inside double quotes or brackets, which are
+    removed."""
+    return _fields(split_quoted(line))
+
+
+class AccessRecord(object):
+    """The fields of one access log line.
+
+    The request is the first quoted field, and the status and size are the
+    two fields after it.  The response time, in microseconds, is found in
+    whichever of the Digimap layouts the line is in:
+
+        map:    vhost host - - [time] "request" status size Response: usec
+        web:    host - - [time] "request" status size "referer" "agent" usec session -
+        cosmo:  host usec host - - [time] "request" status size "referer" "agent"
+
+    The layout is the name of the one the response time was found in, tried
+    in that order.  Every field is kept as the string found in the line, and
+    is None if the line does not have it; a line without a status has no
+    response time or layout either.  The line is only split at its quotes when the record is made;
+    the request, the status and the other fields are each picked out when
+    first used, so that parsers only pay for what they look at.  Records
+    may be shared between parsers, so must not be changed."""
+
+    __slots__ = ('parts', '_method', '_path', '_query', '_protocol', '_status', '_size', '_response',
+                 '_layout', '_params', '_fields')
+
+    def __init__(self, parts):
+        self.parts = parts
+        self._path = self._status = self._params = self._fields = UNSET
+
+    def __repr__(self):
+        return '<AccessRecord %s %s %s>' % (self.method, self.path, self.status)
+
+    def _split_request(self):
+        self._method = self._path = self._query = self._protocol = None
+        request = self.parts[1]
+        if len(self.parts) == 2:
+            # The line was cut short in the request.
+            request = request.rstrip('\n')
+        request = request.split(' ')
+        if len(request) in (2, 3):
+            self._method, target = request[:2]
+            if len(request) == 3:
+                self._protocol = request[2]
+            path, question, query = target.partition('?')
+            self._path = path
+            if question:
+                self._query = query
+
+    def _split_status(self):
+        self._status = self._size = self._response = self._layout = None
+        parts = self.parts
+        after = len(parts) > 2 and parts[2].split()
+        if not after or len(after) < 2:
+            return
+        self._status, self._size = after[0], after[1]
+        if len(after) > 3 and after[2] == RESPONSE_MARKER:
+            self._response, self._layout = after[3], 'map'
+            return
+        rest = len(parts) > 6 and parts[6].split()
+        if rest and rest[0].isdigit():
+            self._response, self._layout = rest[0], 'web'
+            return
+        before = parts[0].split(None, 2)
+        if len(before) > 2 and before[1].isdigit():
+            self._response, self._layout = before[1], 'cosmo'
+
+    @property
+    def method(self):
+        if self._path is UNSET:
+            self._split_request()
+        return self._method
+
+    @property
+    def path(self):
+        """The path requested, without the query string."""
+        if self._path is UNSET:
+            self._split_request()
+        return self._path
+
+    @property
+    def query(self):
+        if self._path is UNSET:
+            self._split_request()
+        return self._query
+
+    @property
+    def protocol(self):
+        if self._path is UNSET:
+            self._split_request()
+        return self._protocol
+
+    @property
+    def status(self):
+        if self._status is UNSET:
+            self._split_status()
+        return self._status
+
+    @property
+    def size(self):
+        if self._status is UNSET:
+            self._split_status()
+        return self._size
+
+    @property
+    def response(self):
+        """The response time in microseconds."""
+        if self._status is UNSET:
+            self._split_status()
+        return self._response
+
+    @property
+    def layout(self):
+        """'map', 'web' or 'cosmo', the layout of the line, or None if the
+        line has no response time."""
+        if self._status is UNSET:
+            self._split_status()
+        return self._layout
+
+    @property
+    def fields(self):
+        """All of the fields of the line, as split by tokenize()."""
+        if self._fields is UNSET:
+            self._fields = _fields(self.parts)
+        return self._fields[0]
+
+    @property
+    def request_index(self):
+        """The index of the request in fields."""
+        if self._fields is UNSET:
+            self._fields = _fields(self.parts)
+        return self._fields[1]
+
+    def params(self):
+        """The query string as a dict, keeping the first value given for
+        each key.  Values are not unescaped."""
+        if self._params is UNSET:
+            params = {}
+            if self.query:
+                for pair in self.query.split('&'):
+                    key, equals, value = pair.partition('=')
+                    if key not in params:
+                        params[key] = value
+            self._params = params
+        return self._params
+
+    def param(self, key, default=None, ignore_case=False):
+        """The value of a query string parameter.  With ignore_case, the
+        first parameter whose key matches in any case is taken, as for the
+        parameters of OGC requests such as WMS."""
+        params = self.params()
+        if key in params or not ignore_case:
+            return params.get(key, default)
+        key = key.lower()
+        for name in params:
+            if name.lower() == key:
+                return params[name]
+        return default
+
+    def response_msec(self):
+        """The response time in milliseconds, or None if there is none."""
+        response = self.response
+        if response is None or not response.isdigit():
+            return None
+        return int(response) / float(1000)
+
+
+def parse(line):
+    """Return the AccessRecord for a line, or None if it has no request."""
+    parts = split_quoted(line)
+    if len(parts) < 2:
+        return None
+    return AccessRecord(parts)
+
+
+class AccessLogParser(LogsterParser):
+    """Base class for parsers of access logs that work on AccessRecords
+    rather than lines.  Subclasses implement parse_record(), which, like
+    parse_line(), returns False if the line was of no interest.  Lines
+    without a request are skipped."""
+
+    tokenizer = staticmethod(parse)
+
+    def parse_line(self, line):
+        record = self.tokenizer(line)
+        if record is None:
+            return False
+        return self.parse_record(record)
+
+    def parse_record(self, record):
+        """Take an AccessRecord and do any parsing we need to do."""
+        raise RuntimeError("Implement me!")
@@ -0,0 +1,81 @@
+###
+###  Limits on how much of a log one run will read.
+###
+###  A run that stops because it has used up its budget leaves the rest of
+###  the log for the next run, which keeps each run short enough to finish
+###  before the next one is started, instead of one huge run holding the
+###  lock while the runs after it fail.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import time
+
+# Lines parsed between checks of the clock.
+CHECK_LINES = 1000
+
+
+class ReadBudget(object):
+    """A limit on the bytes read and the seconds spent parsing in one run.
+    Either limit may be None for no limit."""
+
+    def __init__(self, max_bytes=None, max_seconds=None):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.started = time.time()
+        self.used = 0
+        self.exhausted = False
+
+    def expired(self):
+        """True if the time allowed has run out."""
+        return self.max_seconds is not None and time.time() - self.started >= self.max_seconds
+
+    def spend(self, length):
+        """Count length bytes as read, returning False once the budget has
+        been used up."""
+        self.used += length
+        if self.max_bytes is not None and self.used >= self.max_bytes:
+            self.exhausted = True
+        return not self.exhausted
+
+    def lines(self, lines):
+        """Pass lines through until the budget is used up.  The budget is
+        checked after each line has been parsed, before the next is read,
+        so that the reader is left just past the last line parsed."""
+        count = 0
+        try:
+            for line in lines:
+                yield line
+                count += 1
+                if not self.spend(len(line)):
+                    break
+                if count % CHECK_LINES == 0 and self.expired():
+                    self.exhausted = True
+                    break
+        finally:
+            # Let the reader record where it stopped before this returns.
+            close = getattr(lines, 'close', None)
+            if close is not None:
+                close()
+
+    def fraction(self, unread):
+        """The fraction of the data that was there to read that was read,
+        given the number of bytes left unread."""
+        if not self.exhausted or self.used + unread == 0:
+            return 1.0
+        return float(self.used) / (self.used + unread)
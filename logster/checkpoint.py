@@ -0,0 +1,134 @@
+###
+###  Checkpoints of a long parse, so that a run that dies part way through
+###  a large backlog can be resumed rather than started again.
+###
+###  Every so often while the log is being parsed, the position of the
+###  tailer and the parser itself are pickled together into a checkpoint
+###  file beside the state file.  A later run that starts from the same
+###  state file picks up the parser and carries on reading from the saved
+###  position.  The state file is only written when a run completes, so
+###  the duration the metrics are calculated over still runs from the end
+###  of the last complete run.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import time
+import logging
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from logster.tailer import TailState
+
+logger = logging.getLogger('logster')
+
+# Lines parsed between checks of the clock.
+CHECK_LINES = 1000
+
+
+def state_key(state):
+    if state is None:
+        return None
+    return (state.inode, state.offset, state.fingerprint)
+
+
+class Checkpoint(object):
+    """A checkpoint file for the parse of one log.
+
+    key identifies the parsers and their options; a checkpoint written with
+    a different key, or from a different starting state, is ignored."""
+
+    def __init__(self, path, key, interval=60):
+        self.path = path
+        self.key = key
+        self.interval = interval
+        self.start = None
+        self.saved_at = time.time()
+
+    def restore(self, tailer):
+        """Start tracking a parse by tailer.  If there is a usable checkpoint,
+        move tailer to its position and return its parser, otherwise return
+        None."""
+        self.start = state_key(tailer.state)
+        self.saved_at = time.time()
+        try:
+            f = open(self.path, 'rb')
+        except IOError:
+            return None
+        try:
+            try:
+                checkpoint = pickle.load(f)
+            except Exception as e:
+                logger.warning("Ignoring unreadable checkpoint %s: %s" % (self.path, e))
+                return None
+        finally:
+            f.close()
+
+        if checkpoint.get('key') != self.key or checkpoint.get('start') != self.start:
+            logger.info("Ignoring checkpoint %s left by a different run" % self.path)
+            return None
+        tailer.state = TailState(*checkpoint['position'])
+        logger.info("Resuming from checkpoint %s at offset %s" % (self.path, tailer.state.offset))
+        return checkpoint['parser']
+
+    def save(self, tailer, parser):
+        """Atomically replace the checkpoint with the parser and the position
+        of tailer."""
+        checkpoint = {
+            'key': self.key,
+            'start': self.start,
+            'position': state_key(tailer.position()),
+            'parser': parser,
+        }
+        tmp_path = '%s.tmp' % self.path
+        f = open(tmp_path, 'wb')
+        try:
+            pickle.dump(checkpoint, f, 2)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        os.rename(tmp_path, self.path)
+        self.saved_at = time.time()
+
+    def due(self):
+        return self.interval > 0 and time.time() - self.saved_at >= self.interval
+
+    def lines(self, lines, tailer, parser):
+        """Pass lines read by tailer through, saving a checkpoint between
+        lines every interval seconds.  Each line must have been parsed by the
+        time the next one is asked for."""
+        count = 0
+        for line in lines:
+            yield line
+            # Back here, the line has been parsed and the tailer is just
+            # past it.
+            count += 1
+            if count % CHECK_LINES == 0 and self.due():
+                self.save(tailer, parser)
+
+    def remove(self):
+        """Remove the checkpoint once the run it belongs to is complete."""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
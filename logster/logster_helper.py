@@ -19,26 +19,765 @@
 ###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
 ###
 
+import logging
+import math
+import optparse
+from array import array
+from collections import OrderedDict
+from numbers import Number
 from time import time
 
+# Value of LogsterParser.literals asking for them to be worked out from the
+# parser's compiled patterns: a line containing none of the literals that
+# each pattern requires cannot match any of them, so is skipped.
+DERIVE_LITERALS = 'derive'
+
 class MetricObject(object):
-    """General representation of a metric that can be used in many contexts"""
-    def __init__(self, name, value, units='', type='float', timestamp=int(time())):
+    """General representation of a metric that can be used in many contexts.
+    The timestamp defaults to the time the metric is created."""
+
+    __slots__ = ('name', 'value', 'units', 'type', 'timestamp')
+
+    def __init__(self, name, value, units='', type='float', timestamp=None):
         self.name = name
         self.value = value
         self.units = units
         self.type = type
+        if timestamp is None:
+            timestamp = int(time())
         self.timestamp = timestamp
 
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, MetricObject) and self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'MetricObject(%r, %r, %r, %r, %r)' % self.__getstate__()
+
+
+class MetricBatch(object):
+    """Metrics held as parallel lists of names, values, units, types and
+    timestamps, so that the outputs can format a whole batch at once.
+
+    Iterating over a batch yields a MetricObject for each metric."""
+
+    __slots__ = ('names', 'values', 'units', 'types', 'timestamps', '_published')
+
+    def __init__(self, metrics=()):
+        self.names = []
+        self.values = []
+        self.units = []
+        self.types = []
+        self.timestamps = []
+        self._published = {}
+        self.extend(metrics)
+
+    @classmethod
+    def of(cls, metrics):
+        """Return metrics as a MetricBatch, converting a list if need be."""
+        if isinstance(metrics, cls):
+            return metrics
+        return cls(metrics)
+
+    def append(self, name, value, units='', type='float', timestamp=None):
+        if timestamp is None:
+            timestamp = int(time())
+        self.names.append(name)
+        self.values.append(value)
+        self.units.append(units)
+        self.types.append(type)
+        self.timestamps.append(timestamp)
+        self._published.clear()
+
+    def extend(self, metrics):
+        """Add a batch, or any iterable of MetricObjects, to this batch."""
+        if isinstance(metrics, MetricBatch):
+            self.names.extend(metrics.names)
+            self.values.extend(metrics.values)
+            self.units.extend(metrics.units)
+            self.types.extend(metrics.types)
+            self.timestamps.extend(metrics.timestamps)
+        else:
+            for metric in metrics:
+                self.names.append(metric.name)
+                self.values.append(metric.value)
+                self.units.append(metric.units)
+                self.types.append(metric.type)
+                self.timestamps.append(metric.timestamp)
+        self._published.clear()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for row in zip(self.names, self.values, self.units, self.types, self.timestamps):
+            yield MetricObject(*row)
+
+    def __getstate__(self):
+        return (self.names, self.values, self.units, self.types, self.timestamps)
+
+    def __setstate__(self, state):
+        self.names, self.values, self.units, self.types, self.timestamps = state
+        self._published = {}
+
+    def published_names(self, prefix='', suffix=None, separator='.'):
+        """The names with prefix and suffix added. They are worked out once
+        for each prefix and suffix, and the batch itself is left alone."""
+        key = (prefix, suffix, separator)
+        names = self._published.get(key)
+        if names is None:
+            names = self.names
+            if prefix:
+                start = prefix + separator
+                names = [start + name for name in names]
+            if suffix is not None:
+                end = separator + suffix
+                names = [name + end for name in names]
+            self._published[key] = names
+        return names
+
+    def format(self, template, columns):
+        """Format every metric with template, which takes one field from
+        each of columns in turn, e.g. format('%s %s\\n', (names, values)).
+        The batch is formatted in a single operation, rather than a string
+        being built for each metric and then joined."""
+        count = len(self.names)
+        if not count:
+            return ''
+        # Interleave the columns into the fields of the one format.
+        fields = [None] * (count * len(columns))
+        for i, column in enumerate(columns):
+            fields[i::len(columns)] = column
+        return (template * count) % tuple(fields)
+
+
+# The count and average of each (series, code) as the Digimap parsers name
+# them, for KeyedAggregator.metrics().
+RESPONSE_STATS = (
+    ('count', '%(series)s_count.%(code)s', 'Responses per minute'),
+    ('mean', '%(series)s_response.%(code)s', 'Avg Response Time per minute'),
+)
+
+# The percentiles and bucket counts of the response times of each (series,
+# code), for KeyedAggregators with LatencyBuckets.
+HISTOGRAM_STATS = (
+    ('p50', '%(series)s_response_p50.%(code)s', 'Median Response Time per minute'),
+    ('p95', '%(series)s_response_p95.%(code)s', '95th Percentile Response Time per minute'),
+    ('p99', '%(series)s_response_p99.%(code)s', '99th Percentile Response Time per minute'),
+    ('buckets', '%(series)s_response_le_%(bucket)s.%(code)s', 'Responses per minute'),
+)
+
+
+class LatencyBuckets(object):
+    """The bounds of a histogram of response times, in milliseconds: a
+    bucket for up to lowest, one for each factor above that, and one for
+    anything longer than the last of them. The default runs from 1ms to a
+    bucket for over 65s."""
+
+    def __init__(self, lowest=1.0, factor=2.0, count=18):
+        self.lowest = lowest
+        self.factor = factor
+        self.log_factor = math.log(factor)
+        self.bounds = [lowest * factor ** i for i in range(count - 1)] + [float('inf')]
+        self.labels = ['%g' % bound for bound in self.bounds]
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __eq__(self, other):
+        return isinstance(other, LatencyBuckets) and self.bounds == other.bounds
+
+    def __ne__(self, other):
+        return not self == other
+
+    def index(self, value):
+        """The index of the bucket value falls in."""
+        if value <= self.lowest:
+            return 0
+        index = int(math.ceil(math.log(value / self.lowest) / self.log_factor))
+        if index >= len(self.bounds):
+            return len(self.bounds) - 1
+        if value <= self.bounds[index - 1]:
+            # Rounding put a value on a bound into the bucket above.
+            index -= 1
+        return index
+
+    def percentile(self, counts, percentile, minimum, maximum):
+        """Estimate a percentile from the counts in each bucket, taking the
+        values in the bucket it falls in to be spread evenly between its
+        bounds, or the minimum and maximum if they are closer."""
+        target = percentile / 100.0 * sum(counts)
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= target:
+                lower = max(index and self.bounds[index - 1] or 0.0, minimum)
+                upper = min(self.bounds[index], maximum)
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+        return maximum
+
+
+class SeriesGuard(object):
+    """Bounds the number of series a parser keeps when their names come
+    from the log, such as virtual hosts, layers or metric names, so that a
+    flood of odd requests cannot use up memory or create thousands of
+    Graphite series.
+
+    It keeps at most max_series series, picked with the Space-Saving
+    algorithm: each series has a count of its values, and a new series
+    arriving when the guard is full takes the place of the series with the
+    lowest count, inheriting that count plus one.  Any series with more
+    than 1/max_series of the values is therefore never dropped.  The values
+    of a dropped series are folded into the other series by the parser,
+    and dropped counts how many times that has happened.
+
+    The series are also kept in buckets by count, in the order they reached
+    it, so that finding the one to drop takes constant time however many
+    there are.  Of the series with the lowest count, the one that reached
+    it last is dropped, sparing those that have held it longer.
+
+    name, given by the guard's owner, leads the name of the dropped_series
+    metric, so that parsers run together report theirs apart."""
+
+    def __init__(self, max_series, other='other', name=None):
+        if max_series < 1:
+            raise ValueError("max_series must be at least 1, not %r" % max_series)
+        self.max_series = max_series
+        self.other = other
+        self.name = name
+        self.hits = {}
+        self.by_hits = {}
+        self.min_hits = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __contains__(self, series):
+        return series in self.hits
+
+    def _move(self, series, count):
+        """Put series in the bucket for count, taking it out of the one for
+        count - 1."""
+        self.hits[series] = count
+        if count > 1:
+            below = self.by_hits[count - 1]
+            del below[series]
+            if not below:
+                del self.by_hits[count - 1]
+                if self.min_hits == count - 1:
+                    self.min_hits = count
+        if count not in self.by_hits:
+            self.by_hits[count] = OrderedDict()
+        self.by_hits[count][series] = None
+
+    def hit(self, series):
+        """Count a value for series, returning the series whose values
+        must be folded into other to make room for it, or None."""
+        count = self.hits.get(series)
+        if count is not None:
+            self._move(series, count + 1)
+            return None
+        if series == self.other:
+            return None
+        if len(self.hits) < self.max_series:
+            self.min_hits = 1
+            self._move(series, 1)
+            return None
+        # Space-Saving: a series with the lowest count makes way.
+        count = self.min_hits
+        dropped, none = self.by_hits[count].popitem()
+        del self.hits[dropped]
+        self.by_hits[count][series] = None
+        self._move(series, count + 1)
+        self.dropped += 1
+        return dropped
+
+    def _rebuild(self, order):
+        self.by_hits = {}
+        for series in order:
+            count = self.hits[series]
+            if count not in self.by_hits:
+                self.by_hits[count] = OrderedDict()
+            self.by_hits[count][series] = None
+        self.min_hits = self.by_hits and min(self.by_hits) or 0
+
+    def merge(self, other):
+        """Add in the counts of another guard.  The merged guard may hold
+        too many series until trim() is called."""
+        for series, count in other.hits.items():
+            self.hits[series] = self.hits.get(series, 0) + count
+        self.dropped += other.dropped
+        self._rebuild(sorted(self.hits))
+
+    def trim(self):
+        """Drop the series with the lowest counts until there are no more
+        than max_series, returning those that must be folded into other."""
+        excess = len(self.hits) - self.max_series
+        if excess <= 0:
+            return []
+        order = sorted(self.hits, key=self.hits.get)
+        dropped = order[:excess]
+        for series in dropped:
+            del self.hits[series]
+        self._rebuild(order[excess:])
+        self.dropped += excess
+        return dropped
+
+    def fold(self, state, series):
+        """Fold what a dict of parser state holds for series into what it
+        holds for other, with merge_values()."""
+        if series not in state:
+            return
+        value = state.pop(series)
+        if self.other in state:
+            value = merge_values(state[self.other], value)
+        state[self.other] = value
+
+    def metrics(self):
+        name = 'dropped_series'
+        if self.name:
+            name = self.name + '.' + name
+        return [MetricObject(name, self.dropped, 'Series folded into ' + self.other)]
+
+
+class KeyedAggregator(object):
+    """Counts values, such as response times, by series and code, keeping
+    the count, sum, minimum and maximum of each (series, code) in parallel
+    arrays rather than in a dict of floats for each statistic.  Given
+    LatencyBuckets, it also keeps a histogram of the values of each
+    (series, code), in one more array.  Given max_series, a SeriesGuard
+    bounds the number of series, folding the values of those it drops
+    into its other series, and reporting under name.  Series may be tuples, such as (route, key), in
+    which case each group of series sharing all but their last item has an
+    other series of its own.
+
+    Usage:
+
+        responses = KeyedAggregator()
+        responses.add('ms_os', '200', 12.5)
+        ...
+        metrics = responses.metrics(RESPONSE_STATS)
+    """
+
+    STATS = ('count', 'sum', 'mean', 'min', 'max')
+
+    def __init__(self, buckets=None, max_series=None, name=None):
+        self.buckets = buckets
+        self.guard = None
+        if max_series:
+            self.guard = SeriesGuard(max_series, name=name)
+        self.histograms = array('l')
+        self.slots = {}
+        self.keys = []
+        # The slots of each series, and slots left by folded series.
+        self.series = {}
+        self.free = []
+        self.counts = array('l')
+        self.sums = array('d')
+        self.mins = array('d')
+        self.maxs = array('d')
+
+    def _slot(self, key):
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+            self.counts[slot] = 0
+            self.sums[slot] = 0.0
+            self.mins[slot] = float('inf')
+            self.maxs[slot] = float('-inf')
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            self.counts.append(0)
+            self.sums.append(0.0)
+            self.mins.append(float('inf'))
+            self.maxs.append(float('-inf'))
+            if self.buckets is not None:
+                self.histograms.extend([0] * len(self.buckets))
+        self.slots[key] = slot
+        self.series.setdefault(key[0], []).append(slot)
+        return slot
+
+    def add(self, series, code, value=0.0, guard=True):
+        """Count value under series and code.  Without guard, series is not
+        counted by the guard, for series that are not named by the log."""
+        if guard and self.guard is not None and series != self.other_series(series):
+            dropped = self.guard.hit(series)
+            if dropped is not None:
+                self.fold(dropped, self.other_series(dropped))
+        try:
+            slot = self.slots[series, code]
+        except KeyError:
+            slot = self._slot((series, code))
+        self.counts[slot] += 1
+        self.sums[slot] += value
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+        if self.buckets is not None:
+            self.histograms[slot * len(self.buckets) + self.buckets.index(value)] += 1
+
+    def _combine(self, slot, other, theirs):
+        """Add slot theirs of aggregator other into slot."""
+        if self.buckets is not None:
+            width = len(self.buckets)
+            for bucket in range(width):
+                self.histograms[slot * width + bucket] += other.histograms[theirs * width + bucket]
+        self.counts[slot] += other.counts[theirs]
+        self.sums[slot] += other.sums[theirs]
+        self.mins[slot] = min(self.mins[slot], other.mins[theirs])
+        self.maxs[slot] = max(self.maxs[slot], other.maxs[theirs])
+
+    def other_series(self, series):
+        """The series that the values of series are folded into if the
+        guard drops it."""
+        if isinstance(series, tuple):
+            return series[:-1] + (self.guard.other,)
+        return self.guard.other
+
+    def fold(self, series, into):
+        """Move the values counted under series, for every code, to the
+        series into."""
+        if series == into:
+            return
+        for slot in self.series.pop(series, ()):
+            code = self.keys[slot][1]
+            target = self.slots.get((into, code))
+            if target is None:
+                target = self._slot((into, code))
+            self._combine(target, self, slot)
+            del self.slots[series, code]
+            self.keys[slot] = None
+            if self.buckets is not None:
+                width = len(self.buckets)
+                self.histograms[slot * width:(slot + 1) * width] = array('l', [0] * width)
+            self.free.append(slot)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def count(self, series, code):
+        """The number of values counted under series and code."""
+        slot = self.slots.get((series, code))
+        if slot is None:
+            return 0
+        return self.counts[slot]
+
+    def mean(self, series, code):
+        """The mean of the values counted under series and code, or None if
+        there are none."""
+        slot = self.slots.get((series, code))
+        if slot is None:
+            return None
+        return self.sums[slot] / float(self.counts[slot])
+
+    def histogram(self, series, code):
+        """The number of values in each bucket for series and code."""
+        slot = self.slots.get((series, code))
+        if slot is None or self.buckets is None:
+            return None
+        return self._histogram(slot)
+
+    def percentile(self, series, code, percentile):
+        """Estimate a percentile of the values counted under series and
+        code from their histogram."""
+        slot = self.slots.get((series, code))
+        if slot is None or self.buckets is None:
+            return None
+        return self.buckets.percentile(self._histogram(slot), percentile, self.mins[slot], self.maxs[slot])
+
+    def _histogram(self, slot):
+        width = len(self.buckets)
+        return self.histograms[slot * width:(slot + 1) * width]
+
+    def _slots(self):
+        for slot, key in enumerate(self.keys):
+            if key is not None:
+                yield slot, key
+
+    def items(self):
+        """Yield (series, code, count, sum, min, max) for each key."""
+        for slot, (series, code) in self._slots():
+            yield series, code, self.counts[slot], self.sums[slot], self.mins[slot], self.maxs[slot]
+
+    def merge(self, other):
+        """Fold in the values counted by another aggregator."""
+        if self.buckets != other.buckets:
+            raise ValueError("Cannot merge aggregators with different buckets")
+        for theirs, key in other._slots():
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self._slot(key)
+            self._combine(slot, other, theirs)
+        if self.guard is not None and other.guard is not None:
+            self.guard.merge(other.guard)
+            for series in self.guard.trim():
+                self.fold(series, self.other_series(series))
+
+    def metrics(self, stats, labels=None):
+        """Return MetricObjects for every (series, code), in one pass. stats
+        is a list of (stat, name, units) giving a metric for each key, where
+        stat is one of STATS and name and units are formatted with the
+        series, the code and, if labels is given, labels[series] as label.
+
+        With buckets, stat may also be a percentile estimated from the
+        histogram, such as 'p95', or 'buckets' for a metric per bucket
+        holding its count, whose name is also formatted with the bucket's
+        upper bound as bucket.  These stats are left out for aggregators
+        without buckets, so that parsers can ask for them unconditionally.
+        stats may also be a dict giving the list of stats of each series.
+        With a guard, the number of series it dropped is reported too."""
+        by_series = isinstance(stats, dict)
+        if self.buckets is None:
+            if by_series:
+                stats = dict((series, [stat for stat in listed if stat[0] in self.STATS])
+                             for series, listed in stats.items())
+            else:
+                stats = [stat for stat in stats if stat[0] in self.STATS]
+        metrics = []
+        listed = stats
+        for slot, (series, code) in self._slots():
+            if by_series:
+                listed = stats[series]
+            count, total, minimum, maximum = self.counts[slot], self.sums[slot], self.mins[slot], self.maxs[slot]
+            values = {'count': count, 'sum': total, 'mean': total / float(count), 'min': minimum, 'max': maximum}
+            fields = {'series': series, 'code': code}
+            if labels is not None:
+                fields['label'] = labels.get(series, series)
+            for stat, name, units in listed:
+                if stat in values:
+                    metrics.append(MetricObject(name % fields, values[stat], units % fields))
+                elif stat == 'buckets':
+                    for label, bucket_count in zip(self.buckets.labels, self._histogram(slot)):
+                        fields['bucket'] = label
+                        metrics.append(MetricObject(name % fields, bucket_count, units % fields))
+                else:
+                    value = self.buckets.percentile(self._histogram(slot), float(stat[1:]), minimum, maximum)
+                    metrics.append(MetricObject(name % fields, value, units % fields))
+        if self.guard is not None:
+            metrics += self.guard.metrics()
+        return metrics
+
+
+def response_options(optparser):
+    """Add the options of response_aggregator() to an OptionParser, for
+    parsers that have options of their own."""
+    optparser.add_option('--histogram', dest='histogram', action='store_true', default=False,
+                        help='Keep a histogram of response times, reporting percentiles and bucket counts')
+    optparser.add_option('--max-series', dest='max_series', type='int', default=None,
+                        help='Keep at most this many series, folding the rest into "other"')
+
+
+def response_aggregator(option_string=None, opts=None, name=None):
+    """Make the KeyedAggregator for the response times counted by a parser
+    taking no options but --histogram, which asks for LatencyBuckets, and
+    --max-series, which bounds the number of series.  Parsers with options
+    of their own give opts, parsed by an OptionParser given
+    response_options(), instead.  name, usually the parser's, names the
+    series guard's metric."""
+    if opts is None:
+        if option_string:
+            options = option_string.split(' ')
+        else:
+            options = []
+
+        optparser = optparse.OptionParser()
+        response_options(optparser)
+        opts, args = optparser.parse_args(args=options)
+
+    buckets = None
+    if opts.histogram:
+        buckets = LatencyBuckets()
+    return KeyedAggregator(buckets, opts.max_series, name)
+
+
 class LogsterParser(object):
     """Base class for logster parsers"""
+
+    # Names of attributes that hold configuration rather than parsed state,
+    # and so are left alone by merge().
+    merge_ignore = ()
+
+    # Substrings, at least one of which a line must contain for the parser
+    # to be interested in it. Lines containing none of them are skipped
+    # without parse_line() being called. DERIVE_LITERALS works them out from
+    # the parser's compiled patterns, which suits parsers that ignore any
+    # line that none of their patterns match. None passes every line.
+    literals = None
+
+    # Whether lines are checked for the literals listed ignoring case.
+    literals_ignore_case = False
+
+    # A function turning a line into the record handed to parse_record(), or
+    # None if the line is of no interest, for parsers that work on records
+    # rather than lines. Parsers run together over the same log that have
+    # the same tokenizer are given the same record for each line.
+    tokenizer = None
+
     def parse_line(self, line):
-        """Take a line and do any parsing we need to do. Required for parsers"""
-        raise RuntimeError, "Implement me!"
+        """Take a line and do any parsing we need to do. Required for parsers.
+        Return False if the line was of no interest, so that it is counted
+        as skipped rather than matched."""
+        raise RuntimeError("Implement me!")
 
     def get_state(self, duration):
         """Run any calculations needed and return list of metric objects"""
-        raise RuntimeError, "Implement me!"
+        raise RuntimeError("Implement me!")
+
+    def get_prefilter(self):
+        """Return a Prefilter for the lines this parser may be interested
+        in, or None if every line has to be passed to parse_line()."""
+        if self.literals is None:
+            return None
+        from logster.prefilter import Prefilter
+        return Prefilter.for_parser(self)
+
+    def merge(self, other):
+        """Fold in the state of another instance of this parser that has
+        parsed a different part of the log, as if this instance had parsed
+        those lines too. Used when a large backlog is parsed in parallel.
+
+        The default merges every attribute with merge_values(), which adds
+        up numbers, merges dicts key by key and concatenates lists. Parsers
+        that keep their state in some other form should override this."""
+        for name, value in other.__dict__.items():
+            if name in self.merge_ignore:
+                continue
+            if name in self.__dict__:
+                value = merge_values(self.__dict__[name], value)
+            setattr(self, name, value)
+
+
+def merge_values(mine, theirs):
+    """Merge two pieces of parser state: numbers are added, dicts are merged
+    key by key, lists and arrays are concatenated, objects with a merge()
+    method, such as aggregators, merge themselves and anything else
+    (compiled regular expressions, strings, options) is taken from mine."""
+    if isinstance(mine, bool):
+        return mine
+    if isinstance(mine, Number) and isinstance(theirs, Number):
+        return mine + theirs
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+        for key, value in theirs.items():
+            if key in mine:
+                mine[key] = merge_values(mine[key], value)
+            else:
+                mine[key] = value
+        return mine
+    if isinstance(mine, (list, array)) and type(mine) is type(theirs):
+        return mine + theirs
+    if type(mine) is type(theirs) and hasattr(mine, 'merge'):
+        # Aggregators and sketches merge themselves.
+        mine.merge(theirs)
+        return mine
+    return mine
+
+
+class LogsterParserGroup(LogsterParser):
+    """Runs several parsers over a single read of the same log.
+
+    Each line is handed to every parser in turn, and the metrics of all of
+    them are returned together from get_state. A parser is not given the
+    lines its prefilter turns away. Parsers with a tokenizer are given the
+    record it makes of the line, which is only made once for each line."""
+    def __init__(self, parsers):
+        self.parsers = parsers
+        self.prefilters = [parser.get_prefilter() for parser in parsers]
+        self.tokenizers = [parser.tokenizer for parser in parsers]
+
+    def parse_line(self, line):
+        """Pass the line to every parser. A parsing exception raised by one
+        parser does not stop the line reaching the others; the first one
+        raised is re-raised once they have all seen the line. The line is
+        skipped if every parser skipped it."""
+        error = None
+        skipped = True
+        records = {}
+        for parser, prefilter, tokenizer in zip(self.parsers, self.prefilters, self.tokenizers):
+            if prefilter is not None and not prefilter.accepts(line):
+                continue
+            try:
+                if tokenizer is None:
+                    result = parser.parse_line(line)
+                else:
+                    if tokenizer in records:
+                        record = records[tokenizer]
+                    else:
+                        record = records[tokenizer] = tokenizer(line)
+                    if record is None:
+                        continue
+                    result = parser.parse_record(record)
+                if result is not False:
+                    skipped = False
+            except LogsterParsingException as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+        if skipped:
+            return False
+
+    def get_prefilter(self):
+        """A prefilter passing the lines that any of the parsers' prefilters
+        pass, or None if one of them has none."""
+        if not self.prefilters or None in self.prefilters:
+            return None
+        prefilter = self.prefilters[0]
+        for other in self.prefilters[1:]:
+            prefilter = prefilter.combine(other)
+        return prefilter
+
+    def get_state(self, duration):
+        """Return the metrics of all the parsers."""
+        metrics = []
+        for parser in self.parsers:
+            metrics.extend(parser.get_state(duration))
+        return metrics
+
+    def merge(self, other):
+        """Merge each parser with its counterpart in the other group."""
+        for parser, other_parser in zip(self.parsers, other.parsers):
+            parser.merge(other_parser)
+
+
+def create_parser(parser_classes, option_string=None):
+    """Instantiate the parsers, grouping them if there is more than one so
+    that they all share a single read of the log."""
+    parsers = [parser_class(option_string=option_string) for parser_class in parser_classes]
+    if len(parsers) == 1:
+        return parsers[0]
+    return LogsterParserGroup(parsers)
+
+
+def parse_lines(parser, lines):
+    """Feed each line that gets past the parser's prefilter to the parser."""
+    logger = logging.getLogger('logster')
+    prefilter = parser.get_prefilter()
+    if prefilter is not None:
+        lines = prefilter.filter(lines)
+    for line in lines:
+        try:
+            parser.parse_line(line)
+        except LogsterParsingException as e:
+            # This should only catch recoverable exceptions (of which there
+            # aren't any at the moment).
+            logger.debug("Parsing exception caught: %s" % e)
 
 
 class LogsterParsingException(Exception):
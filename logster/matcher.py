@@ -0,0 +1,87 @@
+###
+###  Matching a line against several patterns in one go.
+###
+###  Parsers that look for several kinds of line usually try a regular
+###  expression for each kind in turn, each of them scanning the line from
+###  the start.  A Matcher joins a list of named rules into one expression,
+###  so that a line is matched against all of them by a single call into
+###  the regular expression engine, which stops at the first rule that
+###  matches.  The result is the same as trying the rules one by one, in
+###  order, and taking the first that matches.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import re
+
+GROUP_NAME = re.compile(r'\(\?P<(\w+)>')
+GROUP_REFERENCE = re.compile(r'\(\?P=(\w+)\)')
+NUMBERED_REFERENCE = re.compile(r'(?<!\\)(\\\\)*\\[1-9]')
+
+
+class Matcher(object):
+    r"""Matches lines against a list of (name, pattern) rules at once.
+
+    Usage:
+
+        matcher = Matcher([('login', r'.*GET /login.* (?P<code>\d+) .*'),
+                           ('print', r'.*POST /print.* (?P<code>\d+) .*')])
+        match = matcher.match(line)
+        if match is not None:
+            rule, groups = match      # e.g. ('print', {'code': '200'})
+
+    Every rule is matched at the start of the line, as re.match() does, and
+    the rules are tried in the order given. All rules share the same flags.
+    The named groups of each rule are kept to that rule, so rules may use
+    the same group names; numbered back references are not supported."""
+
+    def __init__(self, rules, flags=0):
+        self.rules = []
+        parts = []
+        for i, (name, pattern) in enumerate(rules):
+            if NUMBERED_REFERENCE.search(pattern):
+                raise ValueError("Rule %s uses a numbered back reference" % name)
+            # Check each rule on its own, so that errors name the rule.
+            self.rules.append((name, re.compile(pattern, flags)))
+            prefix = '_%d_' % i
+            pattern = GROUP_NAME.sub(lambda m: '(?P<%s%s>' % (prefix, m.group(1)), pattern)
+            pattern = GROUP_REFERENCE.sub(lambda m: '(?P=%s%s)' % (prefix, m.group(1)), pattern)
+            parts.append('(?P<_%d>%s)' % (i, pattern))
+        self.regex = re.compile('|'.join(parts), flags)
+
+        # The group wrapping each rule closes after any group inside it, so
+        # it is the lastindex of a match of that rule.
+        self.dispatch = {}
+        for i, (name, compiled) in enumerate(self.rules):
+            names = tuple(sorted(compiled.groupindex, key=compiled.groupindex.get))
+            indexes = tuple(self.regex.groupindex['_%d_%s' % (i, group)] for group in names)
+            self.dispatch[self.regex.groupindex['_%d' % i]] = (name, names, indexes)
+
+    def match(self, line):
+        """Return (rule name, dict of the rule's named groups) for the first
+        rule that matches line, or None if none of them do."""
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        name, names, indexes = self.dispatch[match.lastindex]
+        # Asking for group 0 as well always gives a tuple back.
+        return name, dict(zip(names, match.group(0, *indexes)[1:]))
+
+    def patterns(self):
+        """The compiled pattern of each rule."""
+        return [compiled for name, compiled in self.rules]
@@ -0,0 +1,461 @@
+###
+###  Output sinks that logster sends metrics to.
+###
+###  Each sink is created once per run (or once for the life of a daemon) and
+###  is handed the whole list of metrics from a parser with send().  Sinks
+###  work out the prefixed and suffixed name of each metric for themselves,
+###  leaving the metric objects untouched, so several outputs can be used at
+###  once.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import re
+import sys
+import time
+import struct
+import logging
+import threading
+
+from logster.logster_helper import MetricBatch
+
+logger = logging.getLogger('logster')
+
+
+class MetricSink(object):
+    """Base class for the places metrics are sent"""
+
+    # Name of the output, as given to --output.
+    name = None
+
+    # Placed between the prefix or suffix and the name of each metric.
+    separator = '.'
+
+    # Seconds a send() may take before send_all() gives up waiting for it.
+    deadline = 30.0
+
+    # Whether metrics that could not be sent are worth sending later.
+    spoolable = False
+
+    def __init__(self, prefix='', suffix=None, dry_run=False, separator=None, deadline=None):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.dry_run = dry_run
+        if separator is not None:
+            self.separator = separator
+        if deadline is not None:
+            self.deadline = deadline
+        self.sending = None
+
+    def metric_name(self, metric):
+        """The name the metric is published under by this sink."""
+        name = metric.name
+        if self.prefix:
+            name = self.prefix + self.separator + name
+        if self.suffix is not None:
+            name = name + self.separator + self.suffix
+        return name
+
+    def metric_names(self, batch):
+        """The names the metrics in a MetricBatch are published under."""
+        return batch.published_names(self.prefix, self.suffix, self.separator)
+
+    def send(self, metrics):
+        """Publish a MetricBatch, or a list of MetricObjects."""
+        raise RuntimeError("Implement me!")
+
+    def not_sent(self, metrics):
+        """Called with a MetricBatch that was not handed to send() because
+        the sink was still busy with an earlier one.  Sinks that can keep
+        metrics for later do so; the default drops them."""
+        pass
+
+    def close(self):
+        """Release any resources held between calls to send()."""
+        pass
+
+
+class StdoutSink(MetricSink):
+    """Print metrics as "name value" lines."""
+    name = 'stdout'
+    separator = '_'
+
+    def send(self, metrics):
+        metrics = MetricBatch.of(metrics)
+        sys.stdout.write(metrics.format('%s %s\n', (self.metric_names(metrics), metrics.values)))
+        sys.stdout.flush()
+
+
+class GmetricSink(MetricSink):
+    """Send metrics to Ganglia by running gmetric once per metric."""
+    name = 'ganglia'
+    separator = '_'
+
+    def __init__(self, gmetric, gmetric_options, **kwargs):
+        MetricSink.__init__(self, **kwargs)
+        self.gmetric = gmetric
+        self.gmetric_options = gmetric_options
+
+    def send(self, metrics):
+        metrics = MetricBatch.of(metrics)
+        for name, value, type, units in zip(self.metric_names(metrics), metrics.values,
+                                            metrics.types, metrics.units):
+            gmetric_cmd = "%s %s --name %s --value %s --type %s --units \"%s\"" % (
+                self.gmetric, self.gmetric_options, name, value, type, units)
+            logger.debug("Submitting Ganglia metric: %s" % gmetric_cmd)
+
+            if not self.dry_run:
+                os.system(gmetric_cmd)
+            else:
+                sys.stdout.write("%s\n" % gmetric_cmd)
+
+
+class XDRPacker(object):
+    """Just enough XDR (RFC 4506) to build gmetric packets."""
+    def __init__(self):
+        self.parts = []
+
+    def pack_int(self, value):
+        self.parts.append(struct.pack('>i', value))
+
+    def pack_uint(self, value):
+        self.parts.append(struct.pack('>I', value))
+
+    def pack_string(self, value):
+        if not isinstance(value, bytes):
+            value = value.encode('utf-8')
+        self.parts.append(struct.pack('>I', len(value)))
+        self.parts.append(value + b'\0' * (-len(value) % 4))
+
+    def get_buffer(self):
+        return b''.join(self.parts)
+
+
+def read_gmond_channel(conf_file):
+    """Return (host, port, is_multicast) for the first udp_send_channel in a
+    gmond.conf, or None if there isn't one."""
+    try:
+        f = open(conf_file)
+    except IOError:
+        return None
+    try:
+        conf = re.sub(r'(#|//).*', '', f.read())
+    finally:
+        f.close()
+
+    channel = re.search(r'udp_send_channel\s*\{([^}]*)\}', conf)
+    if not channel:
+        return None
+    settings = dict(re.findall(r'(\w+)\s*=\s*"?([^\s"]+)"?', channel.group(1)))
+    port = int(settings.get('port', GangliaSink.default_port))
+    if 'mcast_join' in settings:
+        return settings['mcast_join'], port, True
+    if 'host' in settings:
+        return settings['host'], port, False
+    return None
+
+
+class GangliaSink(MetricSink):
+    """Send metrics straight to gmond as gmetric packets over UDP.
+
+    For each metric a metadata packet and a value packet are encoded in the
+    Ganglia 3.1+ wire format and sent on a single socket, instead of running
+    the gmetric binary once per metric."""
+    name = 'ganglia'
+    separator = '_'
+
+    default_port = 8649
+
+    # Packet types, from ganglia's gm_protocol.x
+    GMETADATA_FULL = 128
+    GMETRIC_STRING = 133
+
+    def __init__(self, host, port=default_port, multicast=False, ttl=1, tmax=60,
+                 dmax=0, slope='both', group='logster', spoof=None, **kwargs):
+        # socket is imported by the outputs that need it, rather than by
+        # every run.
+        import socket
+        MetricSink.__init__(self, **kwargs)
+        self.address = (host, port)
+        self.tmax = tmax
+        self.dmax = dmax
+        self.slope = {'zero': 0, 'positive': 1, 'negative': 2, 'both': 3}[slope]
+        self.group = group
+        self.spoof = spoof
+        self.hostname = spoof or socket.gethostname()
+        self.sock = None
+        self.multicast = multicast
+        self.ttl = ttl
+
+    @classmethod
+    def from_gmetric_options(cls, gmetric_options, host=None, **kwargs):
+        """Create a sink from the options that would have been passed to
+        gmetric (-c, -d, -x, -g and -S are understood), sending to host
+        ("host:port") if given or else to the send channel in gmond.conf."""
+        import optparse
+        import shlex
+
+        def error(message):
+            raise ValueError("Cannot use --gmetric-options '%s': %s" % (gmetric_options, message))
+
+        parser = optparse.OptionParser()
+        parser.error = error
+        parser.add_option('--conf', '-c', default='/etc/ganglia/gmond.conf')
+        parser.add_option('--dmax', '-d', type='int', default=0)
+        parser.add_option('--tmax', '-x', type='int', default=60)
+        parser.add_option('--group', '-g', default='logster')
+        parser.add_option('--spoof', '-S', default=None)
+        parser.add_option('--slope', '-s', default='both')
+        opts, args = parser.parse_args(shlex.split(gmetric_options or ''))
+
+        if host:
+            hostname, port = host.rsplit(':', 1)
+            channel = (hostname, int(port), False)
+        else:
+            channel = read_gmond_channel(opts.conf)
+            if channel is None:
+                raise ValueError("No udp_send_channel found in %s; use --ganglia-host" % opts.conf)
+        return cls(channel[0], channel[1], multicast=channel[2], tmax=opts.tmax, dmax=opts.dmax,
+                   slope=opts.slope, group=opts.group, spoof=opts.spoof, **kwargs)
+
+    def packets(self, name, value, type='float', units=''):
+        """Encode the metadata and value packets for a metric published as
+        name."""
+        spoof = self.spoof is not None and 1 or 0
+
+        meta = XDRPacker()
+        meta.pack_int(self.GMETADATA_FULL)
+        meta.pack_string(self.hostname)
+        meta.pack_string(name)
+        meta.pack_int(spoof)
+        meta.pack_string(type)
+        meta.pack_string(name)
+        meta.pack_string(units)
+        meta.pack_int(self.slope)
+        meta.pack_uint(self.tmax)
+        meta.pack_uint(self.dmax)
+        meta.pack_int(1)
+        meta.pack_string('GROUP')
+        meta.pack_string(self.group)
+
+        packet = XDRPacker()
+        packet.pack_int(self.GMETRIC_STRING)
+        packet.pack_string(self.hostname)
+        packet.pack_string(name)
+        packet.pack_int(spoof)
+        packet.pack_string('%s')
+        packet.pack_string(str(value))
+
+        return meta.get_buffer(), packet.get_buffer()
+
+    def send(self, metrics):
+        metrics = MetricBatch.of(metrics)
+        names = self.metric_names(metrics)
+        if self.dry_run:
+            address = ('%s:%s' % self.address).replace('%', '%%')
+            sys.stdout.write(metrics.format(address + ' %s %s\n', (names, metrics.values)))
+            return
+
+        import socket
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.multicast:
+                self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+        for name, value, type, units in zip(names, metrics.values, metrics.types, metrics.units):
+            logger.debug("Submitting Ganglia metric: %s %s" % (name, value))
+            for packet in self.packets(name, value, type, units):
+                self.sock.sendto(packet, self.address)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class GraphiteSink(MetricSink):
+    """Send metrics to a Graphite (carbon) collector over TCP.
+
+    All of the metrics given to send() go out in a single sendall(), either
+    as plaintext lines or as a carbon pickle.  The connection is kept open
+    between calls to send(), so a daemon holds a single connection; if it
+    breaks it is reopened, backing off exponentially while the collector
+    stays unreachable.  Connecting and sending are both subject to timeout
+    so that a slow collector cannot stall parsing indefinitely."""
+    name = 'graphite'
+
+    # Graphite metrics carry their own timestamps, so late ones still count.
+    spoolable = True
+
+    host_reg = re.compile(r'^[\w\.\-]+:\d+$')
+
+    def __init__(self, host, protocol='plaintext', timeout=10.0,
+                 min_backoff=1.0, max_backoff=300.0, **kwargs):
+        MetricSink.__init__(self, **kwargs)
+        if not self.host_reg.match(host):
+            raise ValueError("Invalid host:port found for Graphite: '%s'" % host)
+        if protocol not in ('plaintext', 'pickle'):
+            raise ValueError("Unknown Graphite protocol: '%s'" % protocol)
+        self.host = host
+        hostname, port = host.rsplit(':', 1)
+        self.address = (hostname, int(port))
+        self.protocol = protocol
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0
+        self.retry_at = 0
+        self.sock = None
+
+    def format(self, metrics):
+        """Encode a MetricBatch in the wire format of the protocol in use."""
+        names = self.metric_names(metrics)
+        if self.protocol == 'pickle':
+            try:
+                import cPickle as pickle
+            except ImportError:
+                import pickle
+            payload = pickle.dumps(list(zip(names, zip(metrics.timestamps, metrics.values))), 2)
+            return struct.pack('!L', len(payload)) + payload
+        return metrics.format('%s %s %s\n', (names, metrics.values, metrics.timestamps)).encode('utf-8')
+
+    def connect(self):
+        """Open the connection, unless we are backing off after a failure."""
+        import socket
+        now = time.time()
+        if now < self.retry_at:
+            raise socket.error("Not reconnecting to Graphite %s for another %.0f seconds"
+                               % (self.host, self.retry_at - now))
+        try:
+            self.sock = socket.create_connection(self.address, self.timeout)
+        except socket.error:
+            self.failed()
+            raise
+        self.sock.settimeout(self.timeout)
+        self.backoff = 0
+
+    def failed(self):
+        """Drop the connection and wait longer before trying it again."""
+        self.close()
+        self.backoff = min(max(self.backoff * 2, self.min_backoff), self.max_backoff)
+        self.retry_at = time.time() + self.backoff
+
+    def send(self, metrics):
+        metrics = MetricBatch.of(metrics)
+        if logger.isEnabledFor(logging.DEBUG):
+            for name, value, timestamp in zip(self.metric_names(metrics), metrics.values, metrics.timestamps):
+                logger.debug("Submitting Graphite metric: %s %s %s" % (name, value, timestamp))
+
+        if self.dry_run:
+            sys.stdout.write(metrics.format(self.host.replace('%', '%%') + ' %s %s %s\n',
+                                            (self.metric_names(metrics), metrics.values, metrics.timestamps)))
+            return
+
+        import socket
+        data = self.format(metrics)
+        reused = self.sock is not None
+        if not reused:
+            self.connect()
+        try:
+            self.sock.sendall(data)
+        except socket.error:
+            if not reused:
+                self.failed()
+                raise
+            # The collector may have closed a connection that sat idle since
+            # the last flush, so try once more on a fresh one.
+            self.close()
+            self.connect()
+            try:
+                self.sock.sendall(data)
+            except socket.error:
+                self.failed()
+                raise
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+
+class SinkResult(object):
+    """The outcome of sending a batch of metrics to one sink"""
+    def __init__(self, sink):
+        self.sink = sink
+        self.name = sink.name
+        self.ok = False
+        self.error = None
+        self.elapsed = 0.0
+
+    def __str__(self):
+        if self.ok:
+            return "%s ok in %.3fs" % (self.name, self.elapsed)
+        return "%s failed after %.3fs: %s" % (self.name, self.elapsed, self.error)
+
+
+def _send(sink, metrics, result):
+    start = time.time()
+    try:
+        sink.send(metrics)
+        result.ok = True
+    except Exception as e:
+        result.error = e
+    result.elapsed = time.time() - start
+
+
+def send_all(sinks, metrics):
+    """Send metrics to all the sinks at once, each in its own thread, and
+    return a SinkResult for each of them.
+
+    A sink that raises doesn't affect the others, and one that is still
+    sending after its deadline is reported as failed and left to finish in
+    the background; it is skipped by later calls until it does, and given
+    the metrics it was not sent with not_sent().
+
+    The metrics are put into a single MetricBatch shared by all the sinks."""
+    metrics = MetricBatch.of(metrics)
+    start = time.time()
+    running = []
+    results = []
+    for sink in sinks:
+        result = SinkResult(sink)
+        results.append(result)
+        if sink.sending is not None and sink.sending.is_alive():
+            result.error = "still busy with an earlier batch"
+            try:
+                sink.not_sent(metrics)
+            except Exception as e:
+                result.error = "%s, and could not keep this one: %s" % (result.error, e)
+            continue
+        thread = threading.Thread(target=_send, args=(sink, metrics, result),
+                                  name='logster-%s' % sink.name)
+        thread.daemon = True
+        sink.sending = thread
+        thread.start()
+        running.append((thread, result))
+
+    for thread, result in running:
+        thread.join(max(start + result.sink.deadline - time.time(), 0))
+        if thread.is_alive():
+            result.elapsed = time.time() - start
+            result.error = "timed out after %ss" % result.sink.deadline
+        else:
+            result.sink.sending = None
+    return results
@@ -0,0 +1,115 @@
+###
+###  Parse a large backlog of a log file in parallel.
+###
+###  The unread part of the log is split into chunks on line boundaries, each
+###  chunk is parsed in a worker process by its own instance of the parser,
+###  and the workers' parsers are then merged (see LogsterParser.merge) into
+###  the parser that get_state is called on.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import multiprocessing
+
+from logster.logster_helper import create_parser, parse_lines
+from logster.tailer import iter_lines, decode_line
+from logster.run_stats import RunStats
+
+# Chunks handed out per worker, so that a slow chunk doesn't hold up the rest.
+CHUNKS_PER_WORKER = 4
+
+
+def parse_chunk(args):
+    """Parse the lines of log_file between start and end with a new parser,
+    returning the parser, and RunStats for the chunk if counted is set. Run
+    in a worker process."""
+    parser_classes, option_string, log_file, inode, start, end, counted = args
+    parser = create_parser(parser_classes, option_string)
+    stats = None
+    fd = open(log_file, 'rb')
+    try:
+        if os.fstat(fd.fileno()).st_ino != inode:
+            raise IOError("%s was replaced while being parsed" % log_file)
+        lines = (decode_line(line) for line in iter_lines(fd, start, end))
+        if counted:
+            stats = RunStats()
+            stats.parse_lines(parser, lines)
+        else:
+            parse_lines(parser, lines)
+    finally:
+        fd.close()
+    return parser, stats
+
+
+def parse_parallel(parser, parser_classes, option_string, tailer, fd, workers, checkpoint=None, budget=None,
+                   stats=None):
+    """Parse the unread part of the log opened by tailer.open() with a pool
+    of workers, merging their state into parser in log order, and advance the
+    tailer past the data parsed.  If a checkpoint is given, it is saved when
+    due as chunks are merged.  If a budget is given, only as much of the log
+    as it allows is parsed.  If stats are given, the workers' counts and
+    timings are added to them."""
+    try:
+        # Whatever is left of a rotated log is read here first, to keep the
+        # lines in order.
+        rotated = tailer.read_rotated()
+        if budget is not None:
+            rotated = budget.lines(rotated)
+        if stats is not None:
+            stats.parse_lines(parser, rotated)
+        else:
+            parse_lines(parser, rotated)
+        if budget is not None and budget.exhausted:
+            return
+        limit = None
+        if budget is not None and budget.max_bytes is not None:
+            limit = budget.max_bytes - budget.used
+            if limit < tailer.pending():
+                budget.exhausted = True
+        chunks = tailer.split(fd, workers * CHUNKS_PER_WORKER, limit)
+    finally:
+        fd.close()
+    if not chunks:
+        return
+
+    jobs = [(parser_classes, option_string, tailer.log_file, tailer.inode, start, end, stats is not None)
+            for start, end in chunks]
+    pool = multiprocessing.Pool(workers)
+    try:
+        for i, (chunk_parser, chunk_stats) in enumerate(pool.imap(parse_chunk, jobs)):
+            start, end = chunks[i]
+            parser.merge(chunk_parser)
+            if stats is not None:
+                stats.add(chunk_stats)
+            tailer.advance(end)
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(tailer, parser)
+            if budget is not None:
+                budget.spend(end - start)
+                if budget.expired() and i + 1 < len(chunks):
+                    # Leave the rest for the next run.
+                    budget.exhausted = True
+                    pool.terminate()
+                    break
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -27,17 +27,36 @@
 
 import time
 import re
+import optparse
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, SeriesGuard, DERIVE_LITERALS
 from logster.logster_helper import LogsterParsingException
 
 class ApacheLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
         self.requests = {}
 
+        if option_string:
+            options = option_string.split(' ')
+        else:
+            options = []
+
+        optparser = optparse.OptionParser()
+        optparser.add_option('--max-series', dest='max_series', type='int', default=None,
+                            help='Keep at most this many series, folding the rest into "other"')
+
+        opts, args = optparser.parse_args(args=options)
+
+        # Virtual hosts come from the log, so may be bounded.
+        self.guard = None
+        if opts.max_series:
+            self.guard = SeriesGuard(opts.max_series, name=self.__class__.__name__)
+
         # Regular expression for matching lines we are interested in, and capturing
         # fields from the line.
         self.requestsRegex = re.compile('.*?(?P<host>dm-.*?) .*HTTP/\d.\d" (?P<code>\d+) .*')
@@ -54,6 +73,11 @@ class ApacheLogster(LogsterParser):
           host = linebits['host']
           code = linebits['code']
 
+          if self.guard is not None:
+            dropped = self.guard.hit(host)
+            if dropped is not None:
+              self.guard.fold(self.requests, dropped)
+
           if host not in self.requests:
             self.requests[host] = {}
 
@@ -61,7 +85,15 @@ class ApacheLogster(LogsterParser):
             self.requests[host][code] += 1
           else:
             self.requests[host][code] = 1
-        # ignore non-matching lines
+        else:
+          # ignore non-matching lines
+          return False
+
+    def merge(self, other):
+        LogsterParser.merge(self, other)
+        if self.guard is not None:
+            for host in self.guard.trim():
+                self.guard.fold(self.requests, host)
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
@@ -71,5 +103,7 @@ class ApacheLogster(LogsterParser):
         for host_key, host in self.requests.items():
           for code, count in self.requests[host_key].items():
             metricObjects.append( MetricObject( host_key + ".requests_count." + code, count, "Requests per minute" ) )
+        if self.guard is not None:
+          metricObjects += self.guard.metrics()
 
         return metricObjects
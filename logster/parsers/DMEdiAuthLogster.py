@@ -27,14 +27,16 @@
 
 import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, KeyedAggregator, DERIVE_LITERALS
 
 class DMEdiAuthLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.logins = {}
+        self.logins = KeyedAggregator()
 
         # Regular expression for matching lines we are interested in, and capturing
         # fields from the line.
@@ -48,20 +50,13 @@ class DMEdiAuthLogster(LogsterParser):
         reg_login_match = self.reg_login.match(line)
 
         if reg_login_match:
-            linebits = reg_login_match.groupdict()
-            code = linebits['code']
-            if code in self.logins:
-                self.logins[code] += 1
-            else:
-                self.logins[code] = 1
-        # ignore non-matching lines
+            self.logins.add("ediauth", reg_login_match.group('code'))
+        else:
+            # ignore non-matching lines
+            return False
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
 
-        metric_objects = []
-        for code, count in self.logins.items():
-            metric_objects.append(MetricObject("ediauth_count." + code, count, "Logins per minute"))
-
-        return metric_objects
+        return self.logins.metrics([('count', '%(series)s_count.%(code)s', 'Logins per minute')])
@@ -32,69 +32,44 @@
 import time
 import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, RESPONSE_STATS, HISTOGRAM_STATS, response_aggregator
 from logster.logster_helper import LogsterParsingException
+from logster.access_log import AccessLogParser
 
-class DMMapProxyLogster(LogsterParser):
+# Names of caches, which lead the layers parameter.
+CACHE_NAME = re.compile(r'[\w-]+')
+
+class DMMapProxyLogster(AccessLogParser):
+
+    # Only lines containing this, in any case, can be mapproxy requests.
+    literals = ('/mapproxy/service',)
+    literals_ignore_case = True
 
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.tile_maps = {}
-        self.tile_resp = {}
-        self.wms_maps = {}
-        self.wms_resp = {}
-
-        # Regular expression for matching lines we are interested in, and capturing
-        # fields from the line.
-        self.reg = re.compile('(?=.*tiled=true).*/mapproxy/service.*layers=(?P<cache>[\w-]+).* (?P<code>\d+) \d+ Response: (?P<response>\d+).*', re.IGNORECASE)
-        self.wmsreg = re.compile('(?!.*tiled=true).*/mapproxy/service.*layers=(?P<cache>[\w-]+).* (?P<code>\d+) \d+ Response: (?P<response>\d+).*', re.IGNORECASE)
+        self.caches = response_aggregator(option_string, name=self.__class__.__name__)
 
-    def parse_line(self, line):
-        '''This function should digest the contents of one line at a time, updating
-        object's state variables. Takes a single argument, the line to be parsed.'''
+    def parse_record(self, record):
+        '''This function should digest the fields of one line at a time, updating
+        object's state variables. Takes a single argument, the AccessRecord of the
+        line to be parsed.'''
 
-        # Apply regular expression to each line and extract interesting bits.
-        regMatch = self.reg.match(line)
-        regWmsMatch = self.wmsreg.match(line)
+        cache = None
+        if record.path and '/mapproxy/service' in record.path.lower():
+            cache = CACHE_NAME.match(record.param('layers', '', ignore_case=True))
+        response = record.response_msec()
 
-        if regMatch:
-            linebits = regMatch.groupdict()
-            self.populate(self.tile_maps, self.tile_resp, linebits, "mp_")
-        elif regWmsMatch:
-            linebits = regWmsMatch.groupdict()
-            self.populate(self.wms_maps, self.wms_resp, linebits, "mpwms_")
-        # ignore non-matching lines since our apache log is full of crap
-
-    def populate(self, countDict, responseDict, linebits, cacheName):
-        cache_name = cacheName + linebits['cache']
-        code = linebits['code']
-        response = int(linebits['response']) / float(1000) # convert usec to msec
-        if cache_name in countDict and code in countDict[cache_name]:
-            countDict[cache_name][code] += 1
-            responseDict[cache_name][code] += response
+        # Only lines in the layout of the map servers' logs are counted.
+        if not cache or response is None or record.layout != 'map' or not record.status.isdigit():
+            # ignore non-matching lines since our apache log is full of crap
+            return False
+        if record.param('tiled', '', ignore_case=True).lower() == 'true':
+            self.caches.add("mp_" + cache.group(0), record.status, response)
         else:
-            if cache_name not in countDict:
-                countDict[cache_name] = {}
-                responseDict[cache_name] = {}
-            countDict[cache_name][code] = 1
-            responseDict[cache_name][code] = response
+            self.caches.add("mpwms_" + cache.group(0), record.status, response)
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
-        metricObjects = []
-        self.record_metric(metricObjects, self.tile_maps, self.tile_resp)
-        self.record_metric(metricObjects, self.wms_maps, self.wms_resp)
-
-        return metricObjects
-
-    def record_metric(self, metricObjects, countDict, responseDict):
-        for cache, code_key in countDict.items():
-            for code, count in countDict[cache].items():
-                metricObjects.append( MetricObject( cache + "_count." + code, count, "Responses per minute" ) )
-        for cache, code_key in responseDict.items():
-            for code, response in responseDict[cache].items():
-                count = countDict[cache][code]
-                avg_response = response / float(count)
-                metricObjects.append( MetricObject( cache + "_response." + code, avg_response, "Avg Response Time per minute" ) )
+        return self.caches.metrics(RESPONSE_STATS + HISTOGRAM_STATS)
@@ -30,58 +30,46 @@
 ###
 
 import time
-import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, RESPONSE_STATS, HISTOGRAM_STATS, response_aggregator
 from logster.logster_helper import LogsterParsingException
+from logster.access_log import AccessLogParser
 
-class DMMapServerLogster(LogsterParser):
+# Where the mapfiles are kept, as given in the map parameter.
+MAPFILES = '/etc/mapserver/mapfiles/'
+
+class DMMapServerLogster(AccessLogParser):
+
+    # Only lines containing this, in any case, can be mapserver requests.
+    literals = ('mapserv',)
+    literals_ignore_case = True
 
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.mapserver_maps = {}
-        self.mapserver_resp = {}
-
-        # Regular expression for matching lines we are interested in, and capturing
-        # fields from the line.
-        self.reg = re.compile('.*mapserv.*map=/etc/mapserver/mapfiles/(?P<mapcollection>.*)\.map.* (?P<code>\d+) \d+ Response: (?P<response>\d+).*', re.IGNORECASE)
+        self.mapserver = response_aggregator(option_string, name=self.__class__.__name__)
 
-    def parse_line(self, line):
-        '''This function should digest the contents of one line at a time, updating
-        object's state variables. Takes a single argument, the line to be parsed.'''
+    def parse_record(self, record):
+        '''This function should digest the fields of one line at a time, updating
+        object's state variables. Takes a single argument, the AccessRecord of the
+        line to be parsed.'''
 
-        # Apply regular expression to each line and extract interesting bits.
-        regMatch = self.reg.match(line)
+        # The collection is the path of the mapfile under MAPFILES.  Paths
+        # are compared ignoring case, as the old patterns were, and only
+        # lines in the layout of the map servers' logs are counted.
+        mapfile = record.path and 'mapserv' in record.path.lower() and record.param('map', '', ignore_case=True)
+        lowered = mapfile and mapfile.lower()
+        response = record.response_msec()
 
-        # FIXME don't like this duplicated code
-        if regMatch:
-            linebits = regMatch.groupdict()
-            map_collection = "ms_" + linebits['mapcollection'].replace("/","-")
-            code = linebits['code']
-            response = int(linebits['response']) / float(1000) # convert usec to msec
-
-            if map_collection in self.mapserver_maps and code in self.mapserver_maps[map_collection]:
-              self.mapserver_maps[map_collection][code] += 1
-              self.mapserver_resp[map_collection][code] += response
-            else:
-              if map_collection not in self.mapserver_maps:
-                self.mapserver_maps[map_collection] = {}
-                self.mapserver_resp[map_collection] = {}
-              self.mapserver_maps[map_collection][code] = 1
-              self.mapserver_resp[map_collection][code] = response
+        if (mapfile and lowered.startswith(MAPFILES) and '.map' in lowered[len(MAPFILES):]
+                and response is not None and record.layout == 'map' and record.status.isdigit()):
+            map_collection = "ms_" + mapfile[len(MAPFILES):lowered.rindex('.map')].replace("/","-")
+            self.mapserver.add(map_collection, record.status, response)
+        else:
+            # ignore non-matching lines
+            return False
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
-        metricObjects = []
-        for product, code_key in self.mapserver_maps.items():
-          for code, count in self.mapserver_maps[product].items():
-            metricObjects.append( MetricObject( product + "_count." + code, count, "Responses per minute" ) )
-        for product, code_key in self.mapserver_resp.items():
-          for code, response in self.mapserver_resp[product].items():
-            count = self.mapserver_maps[product][code]
-            avg_response = response / float(count)
-            metricObjects.append( MetricObject( product + "_response." + code, avg_response, "Avg Response Time per minute" ) )
-
-        return metricObjects
+        return self.mapserver.metrics(RESPONSE_STATS + HISTOGRAM_STATS)
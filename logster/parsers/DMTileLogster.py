@@ -32,16 +32,18 @@
 import time
 import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, DERIVE_LITERALS, RESPONSE_STATS, HISTOGRAM_STATS
+from logster.logster_helper import response_aggregator
 from logster.logster_helper import LogsterParsingException
 
 class DMTileLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.tile_maps = {}
-        self.tile_resp = {}
+        self.tile_caches = response_aggregator(option_string, name=self.__class__.__name__)
 
         # Regular expression for matching lines we are interested in, and capturing
         # fields from the line.
@@ -56,32 +58,13 @@ class DMTileLogster(LogsterParser):
 
         if regMatch:
             linebits = regMatch.groupdict()
-            cache_name = "tc_" + linebits['cache']
-            code = linebits['code']
             response = int(linebits['response']) / float(1000) # convert usec to msec
-
-            if cache_name in self.tile_maps and code in self.tile_maps[cache_name]:
-              self.tile_maps[cache_name][code] += 1
-              self.tile_resp[cache_name][code] += response
-            else:
-              if cache_name not in self.tile_maps:
-                self.tile_maps[cache_name] = {}
-                self.tile_resp[cache_name] = {}
-              self.tile_maps[cache_name][code] = 1
-              self.tile_resp[cache_name][code] = response
-        # ignore non-matching lines since our apache log is full of crap
+            self.tile_caches.add("tc_" + linebits['cache'], linebits['code'], response)
+        else:
+            # ignore non-matching lines since our apache log is full of crap
+            return False
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
-        metricObjects = []
-        for cache, code_key in self.tile_maps.items():
-          for code, count in self.tile_maps[cache].items():
-            metricObjects.append( MetricObject( cache + "_count." + code, count, "Responses per minute" ) )
-        for cache, code_key in self.tile_resp.items():
-          for code, response in self.tile_resp[cache].items():
-            count = self.tile_maps[cache][code];
-            avg_response = response / float(count)
-            metricObjects.append( MetricObject( cache + "_response." + code, avg_response, "Avg Response Time per minute" ) )
-
-        return metricObjects
+        return self.tile_caches.metrics(RESPONSE_STATS + HISTOGRAM_STATS)
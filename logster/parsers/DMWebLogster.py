@@ -28,107 +28,79 @@
 import time
 import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, DERIVE_LITERALS, HISTOGRAM_STATS
+from logster.logster_helper import response_aggregator
 from logster.logster_helper import LogsterParsingException
+from logster.matcher import Matcher
+
+# The series each rule counts under, and what it counts.
+SERIES = {
+    'login': 'logins', # logins via EdiAuth/Digimap
+    'loginApi': 'logins_api', # logins via the schools API(DataNation)
+    'register': 'registrations',
+    'downloads': 'download_submit',
+    'mapproxy': 'mapproxy',
+    'mapproxyWms': 'mapproxy_wms',
+    'schoolsV1Mapproxy': 'schools_v1_mapproxy',
+}
+LABELS = {
+    'logins': 'Logins per minute',
+    'logins_api': 'API Logins per minute',
+    'registrations': 'Registrations per minute',
+    'download_submit': 'Download Submits per minute',
+    'mapproxy': 'Mapproxy tiles per minute',
+    'mapproxy_wms': 'Mapproxy WMS requests per minute',
+    'schools_v1_mapproxy': 'Schools V1 Mapproxy tiles per minute',
+}
+STATS = (
+    ('count', '%(series)s_count.%(code)s', '%(label)s'),
+    ('mean', '%(series)s_response.%(code)s', 'Avg Response %(label)s'),
+) + HISTOGRAM_STATS
 
 class DMWebLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.logins = {} # logins via EdiAuth/Digimap
-        self.loginsResponse = {}
-        self.loginsApi = {} # logins via the schools API(DataNation)
-        self.loginsApiResponse = {}
-        self.registrations = {}
-        self.registrationsResponse = {}
-        self.downloads = {}
-        self.downloadsResponse = {}
-        self.mapproxy = {}
-        self.mapproxyResponse = {}
-        self.mapproxyWms = {}
-        self.mapproxyWmsResponse = {}
+        # Counts and response times by series and code.
+        self.responses = response_aggregator(option_string, name=self.__class__.__name__)
 
-        self.schoolsV1Mapproxy = {}
-        self.schoolsV1MapproxyResponse = {}
-
-        # Regular expression for matching lines we are interested in, and capturing
-        # fields from the line.
-        self.regLogin = re.compile('.*GET /login.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$')
-        self.regLoginApi = re.compile('.*POST /roam/api/schools/login.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$')
-        self.regRegister = re.compile('.*PUT /api/user/register HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$')
-        self.regDownloads = re.compile('.*POST (/roam/api/download/orders|/datadownload/submitorder).* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$')
-        self.regMapproxy = re.compile('.*GET /mapproxy/wmsMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d|-]+ .$')
-        self.regMapproxyWms = re.compile('.*GET /mapproxy/wms/.*GetMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$')
-        self.regSchoolsV1Mapproxy = re.compile('.*GET /dfsmapproxy/wmsMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d|-]+ .$')
+        # Regular expressions for matching lines we are interested in, and capturing
+        # fields from the line, tried in this order.
+        rules = [
+            ('login', '.*GET /login.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$'),
+            ('loginApi', '.*POST /roam/api/schools/login.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$'),
+            ('register', '.*PUT /api/user/register HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$'),
+            ('downloads', '.*POST (/roam/api/download/orders|/datadownload/submitorder).* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$'),
+            ('mapproxy', '.*GET /mapproxy/wmsMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d|-]+ .$'),
+            ('mapproxyWms', '.*GET /mapproxy/wms/.*GetMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d-]+ .$'),
+            ('schoolsV1Mapproxy', '.*GET /dfsmapproxy/wmsMap.* HTTP/\d.\d" (?P<code>\d+) .* (?P<response>\d+) [\w\d|-]+ .$'),
+        ]
+        self.matcher = Matcher(rules)
+        # Logins by the monitoring and through the IdP are not counted.
+        self.matcherNoLogin = Matcher(rules[1:])
 
     def parse_line(self, line):
         '''This function should digest the contents of one line at a time, updating
         object's state variables. Takes a single argument, the line to be parsed.'''
 
-        # Apply regular expression to each line and extract interesting bits.
-        regLoginMatch = False
+        # Apply the regular expressions to each line and extract interesting bits.
         if "MONITOR" not in line and "idp.edina.ac.uk" not in line:
-          regLoginMatch = self.regLogin.match(line)
-        regLoginApiMatch = self.regLoginApi.match(line)
-        regRegisterMatch = self.regRegister.match(line)
-        regDownloadMatch = self.regDownloads.match(line)
-        regMapproxyMatch = self.regMapproxy.match(line)
-        regMapproxyWmsMatch = self.regMapproxyWms.match(line)
-        regSchoolsV1MapproxyMatch = self.regSchoolsV1Mapproxy.match(line)
+          match = self.matcher.match(line)
+        else:
+          match = self.matcherNoLogin.match(line)
 
-        if regLoginMatch:
-          linebits = regLoginMatch.groupdict()
-          self.populate(self.logins, self.loginsResponse, linebits)
-        elif regLoginApiMatch:
-          linebits = regLoginApiMatch.groupdict()
-          self.populate(self.loginsApi, self.loginsApiResponse, linebits)
-        elif regRegisterMatch:
-          linebits = regRegisterMatch.groupdict()
-          self.populate(self.registrations, self.registrationsResponse, linebits)
-        elif regDownloadMatch:
-          linebits = regDownloadMatch.groupdict()
-          self.populate(self.downloads, self.downloadsResponse, linebits)
-        elif regMapproxyMatch:
-          linebits = regMapproxyMatch.groupdict()
-          self.populate(self.mapproxy, self.mapproxyResponse, linebits)
-        elif regMapproxyWmsMatch:
-          linebits = regMapproxyWmsMatch.groupdict()
-          self.populate(self.mapproxyWms, self.mapproxyWmsResponse, linebits)
-        elif regSchoolsV1MapproxyMatch:
-          linebits = regSchoolsV1MapproxyMatch.groupdict()
-          self.populate(self.schoolsV1Mapproxy, self.schoolsV1MapproxyResponse, linebits)
-        # ignore non-matching lines
+        if match is None:
+          # ignore non-matching lines
+          return False
 
-    def populate(self, countDict, responseDict, linebits):
-        code = linebits['code']
+        rule, linebits = match
         response = int(linebits['response']) / float(1000) # convert usec to msec
-        if code in countDict:
-            countDict[code] += 1
-            responseDict[code] += response
-        else:
-            countDict[code] = 1
-            responseDict[code] = response
+        self.responses.add(SERIES[rule], linebits['code'], response)
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
-
-        metricObjects = []
-        self.record_metric(metricObjects, self.logins, self.loginsResponse, "logins", "Logins per minute")
-        self.record_metric(metricObjects, self.loginsApi, self.loginsApiResponse, "logins_api", "API Logins per minute")
-        self.record_metric(metricObjects, self.registrations, self.registrationsResponse, "registrations", "Registrations per minute")
-        self.record_metric(metricObjects, self.downloads, self.downloadsResponse, "download_submit", "Download Submits per minute")
-        self.record_metric(metricObjects, self.mapproxy, self.mapproxyResponse, "mapproxy", "Mapproxy tiles per minute")
-        self.record_metric(metricObjects, self.mapproxyWms, self.mapproxyWmsResponse, "mapproxy_wms", "Mapproxy WMS requests per minute")
-        self.record_metric(metricObjects, self.schoolsV1Mapproxy, self.schoolsV1MapproxyResponse, "schools_v1_mapproxy", "Schools V1 Mapproxy tiles per minute")
-
-        return metricObjects
-
-    def record_metric(self, metricObjects, countDict, responseDict, metricName, description):
-        for code, count in countDict.items():
-            metricObjects.append( MetricObject( metricName + "_count." + code, count, description ) )
-        for code, responseTotal in responseDict.items():
-            count = countDict[code]
-            response = responseTotal / float(count)
-            metricObjects.append( MetricObject( metricName + "_response." + code, response, "Avg Response " + description ) )
+        return self.responses.metrics(STATS, LABELS)
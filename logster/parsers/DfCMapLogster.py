@@ -32,22 +32,23 @@
 import time
 import re
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, DERIVE_LITERALS, HISTOGRAM_STATS
+from logster.logster_helper import response_aggregator
 from logster.logster_helper import LogsterParsingException
 
+# The series are counted without a code.
+NO_CODE_HISTOGRAM_STATS = [(stat, name.replace('.%(code)s', ''), units) for stat, name, units in HISTOGRAM_STATS]
+
 class DfCMapLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
-        self.mapserverMaps = {}
-        self.mapserverResp = {}
-        
-        self.clivePrints = 0
-        self.clivePrintRespTimes = 0
-        self.mapstreamWMSs = 0
-        self.mapstreamWMSRespTimes = 0
-        
+        # Response times by series, without a code.
+        self.responses = response_aggregator(option_string, name=self.__class__.__name__)
+
         # Regular expression for matching lines we are interested in, and capturing
         # fields from the line.
         self.mapservReg = re.compile('.*mapserv.*map=mapfiles(/|%2F)(?P<mapcollection>\w+)(/|%2F).*\.map.*Response: (?P<response>\d+).*', re.IGNORECASE)
@@ -64,45 +65,34 @@ class DfCMapLogster(LogsterParser):
         cliveRegMatch = self.cliveReg.match(line)
         mapstreamRegMatch = self.mapstreamReg.match(line)
 
-        # FIXME don't like this duplicated code
         if mapservRegMatch:
             linebits = mapservRegMatch.groupdict()
-            mapCollection = "ms_" + linebits['mapcollection']
             response = int(linebits['response']) / float(1000) # convert usec to msec
-
-            if mapCollection in self.mapserverMaps:
-              self.mapserverMaps[mapCollection] += 1
-              self.mapserverResp[mapCollection] += response
-            else:
-              self.mapserverMaps[mapCollection] = 1
-              self.mapserverResp[mapCollection] = response
+            self.responses.add("ms_" + linebits['mapcollection'], '', response)
         elif cliveRegMatch:
-          self.clivePrints += 1
-          linebits = cliveRegMatch.groupdict()
-          self.clivePrintRespTimes += int(linebits['response']) / float(1000)
+            self.responses.add("clive_print", '', int(cliveRegMatch.group('response')) / float(1000))
         elif mapstreamRegMatch:
-          self.mapstreamWMSs += 1
-          linebits = mapstreamRegMatch.groupdict()
-          self.mapstreamWMSRespTimes += int(linebits['response']) / float(1000)
-        # ignore non-matching lines since our apache log is full of crap
+            self.responses.add("mapstream_wms", '', int(mapstreamRegMatch.group('response')) / float(1000))
+        else:
+            # ignore non-matching lines since our apache log is full of crap
+            return False
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
         and return a list of metric objects.'''
         metricObjects = []
-        for product, count in self.mapserverMaps.items():
-          metricObjects.append( MetricObject( product + "_count", count, "Responses per minute" ) )
-        for product, response in self.mapserverResp.items():
-          count = self.mapserverMaps[product];
-          avg_response = response / float(count)
-          metricObjects.append( MetricObject( product + "_response", avg_response, "Avg Response Time per minute" ) )
+        for series, code, count, total, minimum, maximum in self.responses.items():
+            if series.startswith("ms_"):
+                metricObjects.append( MetricObject( series + "_count", count, "Responses per minute" ) )
+                metricObjects.append( MetricObject( series + "_response", total / float(count), "Avg Response Time per minute" ) )
 
-        metricObjects.append( MetricObject( "clive_print_count", self.clivePrints, "Clive Prints per minute" ) )
-        metricObjects.append( MetricObject( "mapstream_wms_count", self.mapstreamWMSs, "Mapstream WMSs per minute" ) )
+        # Prints and WMS requests are counted even when there are none.
+        for series, description in (("clive_print", "Clive Prints per minute"), ("mapstream_wms", "Mapstream WMSs per minute")):
+            metricObjects.append( MetricObject( series + "_count", self.responses.count(series, ''), description ) )
+        for series in ("clive_print", "mapstream_wms"):
+            if (series, '') in self.responses:
+                metricObjects.append( MetricObject( series + "_response", self.responses.mean(series, ''), "Avg Response Time per minute" ) )
 
-        if self.clivePrints > 0:
-          metricObjects.append( MetricObject( "clive_print_response", self.clivePrintRespTimes / float(self.clivePrints), "Avg Response Time per minute" ) )
-        if self.mapstreamWMSs > 0:
-          metricObjects.append( MetricObject( "mapstream_wms_response", self.mapstreamWMSRespTimes / float(self.mapstreamWMSs), "Avg Response Time per minute" ) )
+        metricObjects += self.responses.metrics(NO_CODE_HISTOGRAM_STATS)
 
         return metricObjects
@@ -25,107 +25,22 @@
 ###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
 ###
 
-import time
-import re
-
-from logster.logster_helper import MetricObject, LogsterParser
-from logster.logster_helper import LogsterParsingException
-
-class DfCWebLogster(LogsterParser):
-
-    def __init__(self, option_string=None):
-        '''Initialize any data structures or variables needed for keeping track
-        of the tasty bits we find in the log we are parsing.'''
-        self.cosmoLogins = {}
-        self.cosmoPrints = {}
-        self.cosmoMapproxies = {}
-        self.cosmoSaveBMs = {}
-        self.cosmoLoadBMs = {}
-
-        self.printRespTimes = {};
-        self.mapproxyRespTimes = {};
-
-        # Regular expression for matching lines we are interested in, and capturing
-        # fields from the line.
-        self.regCosmoLogin = re.compile('.*GET /login.*')
-        self.regCosmoPrint = re.compile('.*\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3} (?P<response>\d+) \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}.*POST /dfc/cosmo-print.* HTTP/\d.\d" (?P<code>\d+) .*')
-        self.regCosmoMapproxy = re.compile('.*\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3} (?P<response>\d+) \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}.*/dfcmapproxy/wmsMap.* HTTP/\d.\d" (?P<code>\d+) .*')
-        self.regCosmoSaveBMs = re.compile('.*\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3} (?P<response>\d+) \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}.*POST /dfc/cosmo-my-maps.* HTTP/\d.\d" (?P<code>\d+) .*')
-        self.regCosmoLoadBMs = re.compile('.*\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3} (?P<response>\d+) \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}.*GET /dfc/cosmo-get-my-map.* HTTP/\d.\d" (?P<code>\d+) .*')
-
-
-    def parse_line(self, line):
-        '''This function should digest the contents of one line at a time, updating
-        object's state variables. Takes a single argument, the line to be parsed.'''
-
-        # Apply regular expression to each line and extract interesting bits.
-        regCosmoLoginMatch = self.regCosmoLogin.match(line)
-        regCosmoPrintMatch = self.regCosmoPrint.match(line)
-        regCosmoMapproxiesMatch = self.regCosmoMapproxy.match(line)
-        regCosmoSaveBMsMatch = self.regCosmoSaveBMs.match(line)
-        regCosmoLoadBMsMatch = self.regCosmoLoadBMs.match(line)
-
-        if regCosmoLoginMatch:
-          linebits = regCosmoLoginMatch.groupdict()
-          #code = linebits['code']
-          code = "200" # FIXME: Hardcoded code as the /login line is greater than 1024 characters and the code, which is at the end gets truncated
-          if code in self.cosmoLogins:
-            self.cosmoLogins[code] += 1
-          else:
-            self.cosmoLogins[code] = 1
-        elif regCosmoPrintMatch:
-          linebits = regCosmoPrintMatch.groupdict()
-          code = linebits['code']
-
-          if code in self.cosmoPrints:
-            self.cosmoPrints[code] += 1
-            self.printRespTimes[code] += int(linebits['response']) / float(1000)
-          else:
-            self.cosmoPrints[code] = 1
-            self.printRespTimes[code] = int(linebits['response']) / float(1000)
-        elif regCosmoMapproxiesMatch:
-          linebits = regCosmoMapproxiesMatch.groupdict()
-          code = linebits['code']
-
-          if code in self.cosmoMapproxies:
-            self.cosmoMapproxies[code] += 1
-            self.mapproxyRespTimes[code] += int(linebits['response']) / float(1000)
-          else:
-            self.cosmoMapproxies[code] = 1
-            self.mapproxyRespTimes[code] = int(linebits['response']) / float(1000)
-        elif regCosmoSaveBMsMatch:
-          linebits = regCosmoSaveBMsMatch.groupdict()
-          code = linebits['code']
-          if code in self.cosmoSaveBMs:
-            self.cosmoSaveBMs[code] += 1
-          else:
-            self.cosmoSaveBMs[code] = 1
-        elif regCosmoLoadBMsMatch:
-          linebits = regCosmoLoadBMsMatch.groupdict()
-          code = linebits['code']
-          if code in self.cosmoLoadBMs:
-            self.cosmoLoadBMs[code] += 1
-          else:
-            self.cosmoLoadBMs[code] = 1
-        # ignore non-matching lines
-
-    def get_state(self, duration):
-        '''Run any necessary calculations on the data collected from the logs
-        and return a list of metric objects.'''
-
-        metricObjects = []
-        for code, count in self.cosmoLogins.items():
-            metricObjects.append( MetricObject( "logins_count." + code, count, "Colleges Logins per minute" ) )
-        for code, count in self.cosmoPrints.items():
-            metricObjects.append( MetricObject( "prints_count." + code, count, "Colleges Prints per minute" ) )
-            metricObjects.append( MetricObject( "prints_response." + code, self.printRespTimes[code] / float(count), "Avg Response Time per minute" ) )
-        for code, count in self.cosmoMapproxies.items():
-            metricObjects.append( MetricObject( "mapproxies_count." + code, count, "Colleges Mapproxy Requests per minute" ) )
-            metricObjects.append( MetricObject( "mapproxies_response."+code, self.mapproxyRespTimes[code] / float(count), "Avg Response Time per minute" ) )
-        for code, count in self.cosmoSaveBMs.items():
-            metricObjects.append( MetricObject( "bookmarks_save_count." + code, count, "Colleges Save Bookmark Requests per minute" ) )
-        for code, count in self.cosmoLoadBMs.items():
-            metricObjects.append( MetricObject( "bookmarks_load_count." + code, count, "Colleges Load Bookmark Requests per minute" ) )
-
-
-        return metricObjects
+from logster.parsers.RouteLogster import RouteLogster
+
+class DfCWebLogster(RouteLogster):
+
+    # Logins are counted from lines in any layout, the rest only from lines
+    # in the layout of the cosmo servers' logs.
+    route_table = [
+        # FIXME: Hardcoded code as the /login line is greater than 1024 characters and the code, which is at the end gets truncated
+        {'prefix': '/login', 'method': 'GET', 'status': '200',
+         'metric': 'logins', 'count_units': 'Colleges Logins per minute'},
+        {'prefix': '/dfc/cosmo-print', 'method': 'POST', 'response': True, 'layout': 'cosmo',
+         'metric': 'prints', 'count_units': 'Colleges Prints per minute'},
+        {'contains': '/dfcmapproxy/wmsMap', 'response': True, 'layout': 'cosmo',
+         'metric': 'mapproxies', 'count_units': 'Colleges Mapproxy Requests per minute'},
+        {'prefix': '/dfc/cosmo-my-maps', 'method': 'POST', 'layout': 'cosmo',
+         'metric': 'bookmarks_save', 'count_units': 'Colleges Save Bookmark Requests per minute'},
+        {'prefix': '/dfc/cosmo-get-my-map', 'method': 'GET', 'layout': 'cosmo',
+         'metric': 'bookmarks_load', 'count_units': 'Colleges Load Bookmark Requests per minute'},
+    ]
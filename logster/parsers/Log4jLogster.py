@@ -33,7 +33,10 @@ from logster.logster_helper import MetricObject, LogsterParser
 from logster.logster_helper import LogsterParsingException
 
 class Log4jLogster(LogsterParser):
-    
+
+    # The tracked levels are options, not parsed state.
+    merge_ignore = ('levels',)
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
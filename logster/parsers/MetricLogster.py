@@ -34,14 +34,20 @@
 
 import re
 import optparse
+from array import array
 
 from logster.parsers import stats_helper
 
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, SeriesGuard, DERIVE_LITERALS
 from logster.logster_helper import LogsterParsingException
 
 class MetricLogster(LogsterParser):
 
+    literals = DERIVE_LITERALS
+
+    # The tracked percentiles and the sketch settings are options, not parsed state.
+    merge_ignore = ('percentiles', 'sketch', 'sketch_error')
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
@@ -57,10 +63,26 @@ class MetricLogster(LogsterParser):
         optparser = optparse.OptionParser()
         optparser.add_option('--percentiles', '-p', dest='percentiles', default='90',
                             help='Comma-separated list of integer percentiles to track: (default: "90")')
+        optparser.add_option('--sketch', '-s', dest='sketch', action='store_true', default=False,
+                            help='Estimate the median and percentiles of times in bounded memory, rather than keeping every value')
+        optparser.add_option('--sketch-error', dest='sketch_error', type='float', default=0.01,
+                            help='Relative error of the estimates made with --sketch: (default: 0.01)')
+        optparser.add_option('--max-series', dest='max_series', type='int', default=None,
+                            help='Keep at most this many series, folding the rest into "other"')
 
         opts, args = optparser.parse_args(args=options)
 
         self.percentiles = opts.percentiles.split(',')
+        self.sketch = opts.sketch
+        self.sketch_error = opts.sketch_error
+        if self.sketch:
+            # Fail now rather than on the first time.
+            stats_helper.QuantileSketch(self.sketch_error)
+
+        # Metric names come from the log, so may be bounded.
+        self.guard = None
+        if opts.max_series:
+            self.guard = SeriesGuard(opts.max_series, name=self.__class__.__name__)
 
         # General regular expressions, expecting the metric name to be included in the log file.
 
@@ -75,17 +97,47 @@ class MetricLogster(LogsterParser):
         if count_match:
             countbits = count_match.groupdict()
             count_name = countbits['count_name']
-            if not self.counts.has_key(count_name):
+            if self.guard is not None:
+                self.guard_series(count_name)
+            if count_name not in self.counts:
                 self.counts[count_name] = 0.0
             self.counts[count_name] += float(countbits['count_value']);
 
         time_match = self.time_reg.match(line)
         if time_match:
             time_name = time_match.groupdict()['time_name']
-            if not self.times.has_key(time_name):
+            if self.guard is not None:
+                self.guard_series(time_name)
+            if time_name not in self.times:
                 unit = time_match.groupdict()['time_unit']
-                self.times[time_name] = {'unit': unit, 'values': []};
-            self.times[time_name]['values'].append(float(time_match.groupdict()['time_value']))
+                if self.sketch:
+                    values = stats_helper.QuantileSketch(self.sketch_error)
+                else:
+                    values = array('d')
+                self.times[time_name] = {'unit': unit, 'values': values};
+            values = self.times[time_name]['values']
+            if self.sketch:
+                values.add(float(time_match.groupdict()['time_value']))
+            else:
+                values.append(float(time_match.groupdict()['time_value']))
+
+        if not count_match and not time_match:
+            return False
+
+    def guard_series(self, name):
+        '''Count a value for a metric name with the guard, folding the counts
+        and times of any name it drops into other.'''
+        dropped = self.guard.hit(name)
+        if dropped is not None:
+            self.guard.fold(self.counts, dropped)
+            self.guard.fold(self.times, dropped)
+
+    def merge(self, other):
+        LogsterParser.merge(self, other)
+        if self.guard is not None:
+            for name in self.guard.trim():
+                self.guard.fold(self.counts, name)
+                self.guard.fold(self.times, name)
 
     def get_state(self, duration):
         '''Run any necessary calculations on the data collected from the logs
@@ -96,8 +148,16 @@ class MetricLogster(LogsterParser):
         for time_name in self.times:
             values = self.times[time_name]['values']
             unit = self.times[time_name]['unit']
-            metrics.append(MetricObject(time_name+'.mean', stats_helper.find_mean(values), unit))
-            metrics.append(MetricObject(time_name+'.median', stats_helper.find_median(values), unit))
-            metrics += [MetricObject('%s.%sth_percentile' % (time_name,percentile), stats_helper.find_percentile(values,int(percentile)), unit) for percentile in self.percentiles]
+            if self.sketch:
+                metrics.append(MetricObject(time_name+'.mean', values.mean(), unit))
+                metrics.append(MetricObject(time_name+'.median', values.median(), unit))
+                metrics += [MetricObject('%s.%sth_percentile' % (time_name,percentile), values.percentile(int(percentile)), unit) for percentile in self.percentiles]
+                continue
+            summary = stats_helper.summarize(values, [50] + [int(percentile) for percentile in self.percentiles])
+            metrics.append(MetricObject(time_name+'.mean', summary['mean'], unit))
+            metrics.append(MetricObject(time_name+'.median', summary['percentiles'][50], unit))
+            metrics += [MetricObject('%s.%sth_percentile' % (time_name,percentile), summary['percentiles'][int(percentile)], unit) for percentile in self.percentiles]
+        if self.guard is not None:
+            metrics += self.guard.metrics()
 
         return metrics
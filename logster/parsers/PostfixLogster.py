@@ -22,11 +22,13 @@
 import time
 import re
         
-from logster.logster_helper import MetricObject, LogsterParser
+from logster.logster_helper import MetricObject, LogsterParser, DERIVE_LITERALS
 from logster.logster_helper import LogsterParsingException
         
 class PostfixLogster(LogsterParser):
         
+    literals = DERIVE_LITERALS
+
     def __init__(self, option_string=None):
         '''Initialize any data structures or variables needed for keeping track
         of the tasty bits we find in the log we are parsing.'''
@@ -57,6 +59,8 @@ class PostfixLogster(LogsterParser):
                   self.numDeferred += 1
                elif (linebits['status'] == 'bounced'):
                   self.numBounced += 1
+            else:
+               return False
 
         except Exception, e:
             raise LogsterParsingException, "regmatch or contents failed with %s" % e
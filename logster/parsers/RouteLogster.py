@@ -0,0 +1,131 @@
+###  A logster parser that counts the requests in an Apache access log for
+###  the paths listed in a route table, by status, and averages their
+###  response times.  See logster/routes.py for what a route table holds.
+###
+###  The table is read from an INI file given with --routes, or subclasses
+###  give it as a list of dicts in route_table.
+###
+###  For example:
+###  sudo ./logster --output=stdout RouteLogster /var/log/httpd/access_log --parser-options '--routes /etc/logster/dfc.ini'
+###
+###
+###  Copyright 2011, Etsy, Inc., 2013 University of Edinburgh
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import optparse
+
+from logster.logster_helper import HISTOGRAM_STATS, response_aggregator, response_options
+from logster.access_log import AccessLogParser
+from logster.routes import RouteError, RouteTable, make_routes, load_routes
+
+
+def route_stats(route):
+    '''The stats reported for the requests taking a route, for
+    KeyedAggregator.metrics(), named after the route's metric name as label.'''
+    stats = []
+    if route.count:
+        stats.append(('count', '%(label)s_count.%(code)s', route.count_units.replace('%', '%%')))
+    if route.response:
+        stats.append(('mean', '%(label)s_response.%(code)s', route.response_units.replace('%', '%%')))
+        stats.extend((stat, name.replace('%(series)s', '%(label)s'), units) for stat, name, units in HISTOGRAM_STATS)
+    return stats
+
+
+class RouteLogster(AccessLogParser):
+
+    # The route table, for subclasses that have one built in.
+    route_table = None
+
+    # The routes are options, not parsed state.
+    merge_ignore = ('routes', 'table', 'stats', 'literals', 'literals_ignore_case')
+
+    def __init__(self, option_string=None):
+        '''Initialize any data structures or variables needed for keeping track
+        of the tasty bits we find in the log we are parsing.'''
+        if option_string:
+            options = option_string.split(' ')
+        else:
+            options = []
+
+        optparser = optparse.OptionParser()
+        optparser.add_option('--routes', '-r', dest='routes', default=None,
+                            help='INI file holding the route table')
+        response_options(optparser)
+
+        opts, args = optparser.parse_args(args=options)
+
+        table = self.route_table
+        if opts.routes:
+            table = load_routes(opts.routes)
+        if not table:
+            raise RouteError("%s needs a route table, given with --routes" % self.__class__.__name__)
+
+        # Counts and response times, by (route, key) and status.  The keys
+        # of routes naming one come from the log, so may be bounded with
+        # --max-series, folding the rest into the route's other key.
+        self.requests = response_aggregator(opts=opts, name=self.__class__.__name__)
+
+        self.routes = make_routes(table)
+        self.table = RouteTable(self.routes)
+        self.stats = [route_stats(route) for route in self.routes]
+
+        # Only lines containing the prefix, or the string that the path
+        # contains, of one of the routes can take it.
+        self.literals = self.table.literals()
+        self.literals_ignore_case = self.table.ignore_case
+
+    def parse_record(self, record):
+        '''This function should digest the fields of one line at a time, updating
+        object's state variables. Takes a single argument, the AccessRecord of the
+        line to be parsed.'''
+        if record.path is None:
+            return False
+
+        # The routes are tried in the order of the table.
+        for index, route in self.table.lookup(record.path):
+            key = route.key(record)
+            if key is None:
+                continue
+            code = route.status or record.status
+            if code is None or not code.isdigit():
+                continue
+            response = 0.0
+            if route.response:
+                response = record.response_msec()
+                if response is None:
+                    continue
+            if route.skip:
+                return False
+
+            self.requests.add((index, key), code, response, guard=route.keyed)
+            return
+
+        # ignore non-matching lines since our apache log is full of crap
+        return False
+
+    def get_state(self, duration):
+        '''Run any necessary calculations on the data collected from the logs
+        and return a list of metric objects.'''
+        stats = {}
+        labels = {}
+        for series in self.requests.series:
+            index, key = series
+            route = self.routes[index]
+            stats[series] = self.stats[index]
+            labels[series] = route.head + key + route.tail
+        return self.requests.metrics(stats, labels)
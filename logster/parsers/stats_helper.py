@@ -3,6 +3,18 @@
 ###  A helper to assist with the calculation of statistical functions. This has probably been done better elsewhere but I wanted an easy import.
 ###
 ###  Percentiles are calculated with linear interpolation between points.
+###
+###  summarize() works out all of the statistics of a series at once, with NumPy if it is installed.
+###
+###  QuantileSketch estimates percentiles in bounded memory, for series too long to keep every value of.
+
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 def find_median(numbers):
     return find_percentile(numbers,50)
@@ -10,6 +22,9 @@ def find_median(numbers):
 
 def find_percentile(numbers,percentile):
     numbers.sort()
+    return _sorted_percentile(numbers,percentile)
+
+def _sorted_percentile(numbers,percentile):
     if len(numbers) == 0:
         return None
     if len(numbers) == 1:
@@ -27,3 +42,157 @@ def find_mean(numbers):
         return None
     else:
         return sum(numbers,0.0) / len(numbers)
+
+def summarize(numbers, percentiles):
+    """Return a dict of the count, min, max, mean, stddev (of the population)
+    and percentiles of numbers, the last a dict by percentile, sorting or
+    partitioning the numbers only once and leaving them as they were.
+    Percentiles are interpolated as find_percentile() does."""
+    if len(numbers) == 0:
+        return {'count': 0, 'min': None, 'max': None, 'mean': None, 'stddev': None,
+                'percentiles': dict((percentile, None) for percentile in percentiles)}
+    if numpy is not None:
+        return _summarize_numpy(numbers, percentiles)
+    mean = find_mean(numbers)
+    ordered = sorted(numbers)
+    # Squares of the deviations, as E[x^2] - mean^2 cancels for large values.
+    variance = sum([(number - mean) ** 2 for number in ordered], 0.0) / len(ordered)
+    return {'count': len(ordered), 'min': ordered[0], 'max': ordered[-1], 'mean': mean,
+            'stddev': math.sqrt(variance),
+            'percentiles': dict((percentile, _sorted_percentile(ordered, percentile)) for percentile in percentiles)}
+
+def _summarize_numpy(numbers, percentiles):
+    if not isinstance(numbers, array) or numbers.typecode != 'd':
+        numbers = array('d', numbers)
+    values = numpy.frombuffer(numbers, dtype=numpy.float64)
+    # numpy.percentile partitions a copy around the ranks it needs, and
+    # interpolates linearly between them by default.
+    found = numpy.percentile(values, [float(percentile) for percentile in percentiles])
+    return {'count': len(values), 'min': float(values.min()), 'max': float(values.max()),
+            'mean': float(values.mean()), 'stddev': float(values.std()),
+            'percentiles': dict(zip(percentiles, [float(value) for value in found]))}
+
+
+class QuantileSketch(object):
+    """Estimates percentiles of a stream of numbers without keeping them.
+
+    Values are counted in buckets whose bounds grow geometrically, so that
+    every value in a bucket is within relative_error of the bucket's middle
+    and any percentile is estimated to within relative_error of the value
+    the exact calculation would give. Values whose magnitude is below
+    MIN_VALUE are counted as zero. The count, sum, minimum and maximum are
+    exact. If there are ever more than max_buckets buckets either side of
+    zero, the buckets nearest zero are combined, losing accuracy for the
+    smallest values first. Sketches with the same relative_error can be
+    merged, so the parts of a log can be parsed separately."""
+
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_error=0.01, max_buckets=2048):
+        if not 0 < relative_error < 1:
+            raise ValueError("relative_error must be between 0 and 1, not %r" % relative_error)
+        self.relative_error = relative_error
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def _bucket(self, magnitude):
+        return int(math.ceil(math.log(magnitude) / self.log_gamma))
+
+    def _collapse(self, buckets):
+        keys = sorted(buckets)
+        lowest = keys[len(keys) - self.max_buckets]
+        for key in keys[:len(keys) - self.max_buckets]:
+            buckets[lowest] += buckets.pop(key)
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value > self.MIN_VALUE:
+            buckets, key = self.positive, self._bucket(value)
+        elif value < -self.MIN_VALUE:
+            buckets, key = self.negative, self._bucket(-value)
+        else:
+            self.zeros += 1
+            return
+        buckets[key] = buckets.get(key, 0) + 1
+        if len(buckets) > self.max_buckets:
+            self._collapse(buckets)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with relative errors %r and %r"
+                             % (self.relative_error, other.relative_error))
+        if not other.count:
+            return
+        for buckets, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                buckets[key] = buckets.get(key, 0) + count
+            if len(buckets) > self.max_buckets:
+                self._collapse(buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+    def _value(self, sign, key):
+        value = sign * 2 * self.gamma ** key / (self.gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def _value_at(self, rank):
+        """The estimate of the value at rank, counting from 0, in sorted
+        order."""
+        if rank == 0:
+            return self.min
+        if rank == self.count - 1:
+            return self.max
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if rank < seen:
+                return self._value(-1, key)
+        seen += self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if rank < seen:
+                return self._value(1, key)
+        return self.max
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.sum / self.count
+
+    def median(self):
+        return self.percentile(50)
+
+    def percentile(self, percentile):
+        """Estimate a percentile, interpolating as find_percentile does."""
+        if self.count == 0:
+            return None
+        position = (float(percentile) / 100) * (self.count - 1)
+        left_index = int(position)
+        number_one = self._value_at(left_index)
+        if position % 1 == 0:
+            return number_one
+        number_two = self._value_at(left_index + 1)
+        return number_one + (number_two - number_one) * (position % 1)
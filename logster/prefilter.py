@@ -0,0 +1,174 @@
+###
+###  Rejecting lines before any regular expression is run on them.
+###
+###  Most lines of a busy log are of no interest to a given parser, yet the
+###  parser's patterns, which mostly start with '.*', scan and backtrack over
+###  the whole of each of them.  A Prefilter holds substrings, at least one
+###  of which any line the parser is interested in must contain, and turns
+###  away the lines that contain none of them with a plain substring test.
+###
+###  Parsers declare the substrings in their literals attribute, or set it
+###  to DERIVE_LITERALS to have them worked out from their compiled
+###  patterns.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import re
+import logging
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from logster.logster_helper import DERIVE_LITERALS
+from logster.matcher import Matcher
+
+logger = logging.getLogger('logster')
+
+PATTERN_TYPE = type(re.compile(''))
+
+# Shorter literals turn away too few lines to be worth testing for.
+MIN_LITERAL_LENGTH = 3
+
+REPEATS = ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+
+
+def _requirements(parsed):
+    """List, in the order they appear, the requirements of a parsed
+    pattern: each a list of literals, at least one of which every match
+    contains."""
+    requirements = []
+    run = []
+    for op, av in parsed:
+        op = str(op).upper()
+        if op == 'LITERAL' and av < 128:
+            run.append(chr(av))
+            continue
+        if run:
+            requirements.append([''.join(run)])
+            run = []
+        if op == 'SUBPATTERN':
+            requirements.extend(_requirements(av[-1]))
+        elif op == 'ATOMIC_GROUP':
+            requirements.extend(_requirements(av))
+        elif op in REPEATS and av[0] >= 1:
+            requirements.extend(_requirements(av[2]))
+        elif op == 'BRANCH':
+            # Every alternative has to give a literal for the branch to count.
+            alternatives = [_first(_requirements(branch)) for branch in av[1]]
+            if None not in alternatives:
+                requirements.append([literal for literals in alternatives for literal in literals])
+    if run:
+        requirements.append([''.join(run)])
+    return requirements
+
+
+def _first(requirements):
+    """The first requirement whose literals are all long enough to be worth
+    testing for.  The first one is preferred to the longest, as patterns
+    usually pick out the part of the line they are after before the parts
+    that every line has in common."""
+    for literals in requirements:
+        if min(len(literal) for literal in literals) >= MIN_LITERAL_LENGTH:
+            return literals
+    return None
+
+
+def pattern_literals(pattern):
+    """Return a list of literals, at least one of which is contained in
+    any string that the compiled pattern matches, or None if there are no
+    such literals worth testing for.  Literals of case-insensitive patterns
+    are returned in lower case."""
+    literals = _first(_requirements(sre_parse.parse(pattern.pattern, pattern.flags)))
+    if literals is not None and pattern.flags & re.IGNORECASE:
+        literals = [literal.lower() for literal in literals]
+    return literals
+
+
+class Prefilter(object):
+    """Passes lines containing at least one of a set of literals"""
+
+    def __init__(self, literals, ignore_case=False):
+        self.ignore_case = ignore_case
+        if ignore_case:
+            literals = [literal.lower() for literal in literals]
+        # Keep the order given, as the likeliest are usually listed first.
+        unique = []
+        for literal in literals:
+            if literal not in unique:
+                unique.append(literal)
+        self.literals = tuple(unique)
+
+    @classmethod
+    def for_parser(cls, parser):
+        """Build the prefilter described by parser.literals, or return None
+        if the parser's lines cannot be prefiltered."""
+        if parser.literals != DERIVE_LITERALS:
+            return cls(parser.literals, parser.literals_ignore_case)
+
+        patterns = []
+        for name, value in sorted(vars(parser).items()):
+            if isinstance(value, PATTERN_TYPE):
+                patterns.append((name, value))
+            elif isinstance(value, Matcher):
+                patterns.extend(('%s.%s' % (name, rule), compiled) for rule, compiled in value.rules)
+
+        literals = []
+        ignore_case = False
+        for name, pattern in patterns:
+            found = pattern_literals(pattern)
+            if found is None:
+                logger.debug("No literals found in %s.%s, not prefiltering"
+                             % (parser.__class__.__name__, name))
+                return None
+            literals.extend(found)
+            ignore_case = ignore_case or bool(pattern.flags & re.IGNORECASE)
+        if not literals:
+            return None
+        return cls(literals, ignore_case)
+
+    def combine(self, other):
+        """A prefilter passing the lines that either of two prefilters pass."""
+        return Prefilter(self.literals + other.literals, self.ignore_case or other.ignore_case)
+
+    def accepts(self, line):
+        if self.ignore_case:
+            line = line.lower()
+        for literal in self.literals:
+            if literal in line:
+                return True
+        return False
+
+    def filter(self, lines):
+        """Yield the lines that contain one of the literals."""
+        literals = self.literals
+        if self.ignore_case:
+            for line in lines:
+                lowered = line.lower()
+                for literal in literals:
+                    if literal in lowered:
+                        yield line
+                        break
+        else:
+            for line in lines:
+                for literal in literals:
+                    if literal in line:
+                        yield line
+                        break
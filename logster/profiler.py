@@ -0,0 +1,188 @@
+###
+###  Profiling of a parse, for finding out where a parser spends its time.
+###
+###  ParseProfiler runs the parse under cProfile and, to break the cost down
+###  further than the profiler can, temporarily swaps every compiled regular
+###  expression held by the parser, or by the routes of its route table, for
+###  a ProfiledPattern, which counts the calls made to it, how many of them
+###  matched, and the time they took.
+###  Parsers need no changes for this.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import re
+import pstats
+import cProfile
+from timeit import default_timer
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from logster.logster_helper import LogsterParserGroup
+from logster.matcher import Matcher
+from logster.routes import Route
+
+PATTERN_TYPE = type(re.compile(''))
+
+# Pattern methods that are counted as matching when they return a match.
+MATCHING_METHODS = ('match', 'search', 'fullmatch')
+
+# Other pattern methods that are timed.
+TIMED_METHODS = ('findall', 'finditer', 'sub', 'subn', 'split')
+
+# Attributes of a Route that may hold compiled patterns.
+ROUTE_PATTERNS = ('search', 'pattern')
+
+# Functions listed from the profiler's own report.
+PROFILE_LINES = 40
+
+
+class ProfiledPattern(object):
+    """Stands in for a compiled pattern, timing the calls made to it"""
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.compiled = pattern
+        self.calls = 0
+        self.matches = 0
+        self.elapsed = 0.0
+        for method in MATCHING_METHODS + TIMED_METHODS:
+            if hasattr(pattern, method):
+                setattr(self, method, self._timed(getattr(pattern, method), method in MATCHING_METHODS))
+
+    def _timed(self, method, matching):
+        def timed(*args, **kwargs):
+            started = default_timer()
+            result = method(*args, **kwargs)
+            self.elapsed += default_timer() - started
+            self.calls += 1
+            if matching and result is not None:
+                self.matches += 1
+            return result
+        return timed
+
+    def __getattr__(self, name):
+        # Anything else, such as groupindex or flags, comes from the pattern.
+        if name.startswith('__') or name == 'compiled':
+            raise AttributeError(name)
+        return getattr(self.compiled, name)
+
+
+def instrument_patterns(parser):
+    """Replace each compiled pattern held as an attribute of parser, or of
+    the parsers in a group, the combined pattern of each Matcher, and the
+    patterns of each Route in a list of routes, with a ProfiledPattern.
+    Returns a list of (object, attribute, ProfiledPattern) for
+    restore_patterns()."""
+    if isinstance(parser, LogsterParserGroup):
+        replaced = []
+        for member in parser.parsers:
+            replaced.extend(instrument_patterns(member))
+        return replaced
+
+    replaced = []
+    for name, value in sorted(vars(parser).items()):
+        if isinstance(value, PATTERN_TYPE):
+            profiled = ProfiledPattern('%s.%s' % (parser.__class__.__name__, name), value)
+            setattr(parser, name, profiled)
+            replaced.append((parser, name, profiled))
+        elif isinstance(value, Matcher):
+            profiled = ProfiledPattern('%s.%s' % (parser.__class__.__name__, name), value.regex)
+            value.regex = profiled
+            replaced.append((value, 'regex', profiled))
+        elif isinstance(value, list):
+            for route in value:
+                if not isinstance(route, Route):
+                    continue
+                for attribute in ROUTE_PATTERNS:
+                    pattern = getattr(route, attribute)
+                    if isinstance(pattern, PATTERN_TYPE):
+                        profiled = ProfiledPattern('%s.%s[%s].%s' % (parser.__class__.__name__, name, route.metric,
+                                                                    attribute), pattern)
+                        setattr(route, attribute, profiled)
+                        replaced.append((route, attribute, profiled))
+    return replaced
+
+
+def restore_patterns(replaced):
+    """Put back the patterns replaced by instrument_patterns()."""
+    for owner, name, profiled in replaced:
+        setattr(owner, name, profiled.compiled)
+
+
+def format_patterns(patterns):
+    """A table of the patterns, most expensive first."""
+    patterns = sorted(patterns, key=lambda p: p.elapsed, reverse=True)
+    total = sum(p.elapsed for p in patterns)
+    lines = ['%-50s %10s %10s %8s %10s %10s %6s' %
+             ('pattern', 'calls', 'matches', 'match%', 'seconds', 'us/call', 'time%')]
+    for p in patterns:
+        match_rate = p.calls and 100.0 * p.matches / p.calls or 0.0
+        per_call = p.calls and 1e6 * p.elapsed / p.calls or 0.0
+        share = total and 100.0 * p.elapsed / total or 0.0
+        lines.append('%-50s %10d %10d %8.1f %10.3f %10.2f %6.1f' %
+                     (p.name, p.calls, p.matches, match_rate, p.elapsed, per_call, share))
+    return '\n'.join(lines) + '\n'
+
+
+class ParseProfiler(object):
+    """Profiles the parsing done by a parser.
+
+    Usage:
+
+        profiler = ParseProfiler(parser)
+        profiler.runcall(parse_lines, parser, lines)
+        profiler.save(path)
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.profile = cProfile.Profile()
+        self.patterns = []
+
+    def runcall(self, func, *args, **kwargs):
+        """Call func under the profiler, with the parser's patterns timed."""
+        replaced = instrument_patterns(self.parser)
+        try:
+            return self.profile.runcall(func, *args, **kwargs)
+        finally:
+            restore_patterns(replaced)
+            self.patterns.extend(profiled for owner, name, profiled in replaced)
+
+    def report(self):
+        """The per-pattern table followed by the profiler's report."""
+        out = StringIO()
+        out.write('Regular expressions, by time spent (including the cost of timing them):\n\n')
+        out.write(format_patterns(self.patterns))
+        out.write('\nFunctions, by cumulative time:\n\n')
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return out.getvalue()
+
+    def save(self, path):
+        """Write the report to path + '.txt', and the raw profile, for use
+        with pstats and other tools, to path + '.prof'."""
+        f = open(path + '.txt', 'w')
+        try:
+            f.write(self.report())
+        finally:
+            f.close()
+        self.profile.dump_stats(path + '.prof')
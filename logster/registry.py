@@ -0,0 +1,138 @@
+###
+###  Finding parser classes by name.
+###
+###  The bundled parsers are listed here, so that finding one costs no more
+###  than importing its module.  Parsers from other packages are found
+###  through the 'logster.parsers' entry point group, which is only looked
+###  at for names that are not bundled, or can be named directly as
+###  'package.module:ClassName' (or 'package.module.ClassName').
+###
+###  A package providing parsers registers them in its setup.py with:
+###
+###      entry_points={
+###          'logster.parsers': [
+###              'MyLogster = mypackage.parsers:MyLogster',
+###          ],
+###      }
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import sys
+
+ENTRY_POINT_GROUP = 'logster.parsers'
+
+# The bundled parsers, each in a module of the same name.
+BUILTIN_PARSERS = dict((name, 'logster.parsers.%s:%s' % (name, name)) for name in (
+    'ApacheLogster',
+    'DMEdiAuthLogster',
+    'DMMapLogster',
+    'DMMapProxyLogster',
+    'DMMapServerLogster',
+    'DMTileLogster',
+    'DMWebLogster',
+    'DfCMapLogster',
+    'DfCWebLogster',
+    'DfSMapLogster',
+    'DfSWebLogster',
+    'ErrorLogLogster',
+    'Log4jLogster',
+    'MetricLogster',
+    'PostfixLogster',
+    'RouteLogster',
+    'SampleLogster',
+    'SquidLogster',
+))
+
+
+class ParserNotFoundError(Exception):
+    """Raised when no parser of the given name can be found."""
+    pass
+
+
+def load_target(target):
+    """Import and return the object named by 'module:attribute', or by
+    'module.attribute'."""
+    module_name, attribute = target, None
+    if ':' in target:
+        module_name, attribute = target.split(':', 1)
+    elif '.' in target:
+        module_name, attribute = target.rsplit('.', 1)
+    if not module_name or not attribute:
+        raise ParserNotFoundError("'%s' is not of the form module:ClassName" % target)
+    __import__(module_name)
+    obj = sys.modules[module_name]
+    for name in attribute.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def entry_points():
+    """The entry points registered in ENTRY_POINT_GROUP, by name."""
+    try:
+        from importlib.metadata import entry_points as find
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return {}
+        return dict((ep.name, ep) for ep in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+    found = find()
+    if hasattr(found, 'select'):
+        found = found.select(group=ENTRY_POINT_GROUP)
+    else:
+        found = found.get(ENTRY_POINT_GROUP, ())
+    return dict((ep.name, ep) for ep in found)
+
+
+def available_parsers():
+    """The names of the bundled and registered parsers."""
+    return sorted(set(BUILTIN_PARSERS) | set(entry_points()))
+
+
+def load_parser_class(name):
+    """Return the parser class called name: a bundled parser, one
+    registered under ENTRY_POINT_GROUP, 'module:ClassName', or a parser
+    dropped into logster/parsers in a module of the same name."""
+    if name in BUILTIN_PARSERS:
+        return load_target(BUILTIN_PARSERS[name])
+
+    registered = entry_points()
+    if name in registered:
+        return registered[name].load()
+
+    if ':' in name or '.' in name:
+        try:
+            return load_target(name)
+        except (ImportError, AttributeError) as e:
+            raise ParserNotFoundError("Cannot load parser %s: %s" % (name, e))
+
+    try:
+        return load_target('logster.parsers.%s:%s' % (name, name))
+    except (ImportError, AttributeError) as e:
+        # A module that is there but fails to import is worth hearing about.
+        if isinstance(e, AttributeError) or name not in str(e):
+            raise ParserNotFoundError("Cannot load parser %s: %s" % (name, e))
+
+    raise ParserNotFoundError("Unknown parser %s. Available parsers are: %s"
+                              % (name, ', '.join(available_parsers())))
+
+
+def load_parser_classes(names):
+    """Return the parser classes for a comma-separated list of names."""
+    return [load_parser_class(name) for name in names.split(',')]
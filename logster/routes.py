@@ -0,0 +1,302 @@
+###
+###  Route tables for parsers of access logs.
+###
+###  Many parsers of the Digimap access logs do the same thing for different
+###  URLs: count the requests for a few paths by status, and maybe average
+###  their response times.  A route table describes this declaratively: each
+###  route names a path prefix (or a string the path contains), optionally
+###  the method, a query parameter whose value is part of the metric name and
+###  conditions on the other parameters, and the metrics to record.  The
+###  prefixes are compiled into a PrefixTrie, so that finding the routes for
+###  a request costs one walk down the trie rather than one regular
+###  expression per route.
+###
+###  Route tables are lists of dicts, or INI files with a section per route:
+###
+###      [prints]
+###      prefix = /dfc/cosmo-print
+###      method = POST
+###      response = yes
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import re
+
+try:
+    from ConfigParser import RawConfigParser
+except ImportError:
+    from configparser import RawConfigParser
+
+BOOLEAN_OPTIONS = ('count', 'response', 'lower', 'ignore_case', 'skip')
+
+
+class RouteError(Exception):
+    """Raised for a route table that cannot be used."""
+    pass
+
+
+class TrieNode(object):
+    """A node of a PrefixTrie: the values stored under the prefix it stands
+    for, and its children by the first character of their edge."""
+    def __init__(self):
+        self.values = []
+        self.children = {}
+
+
+class PrefixTrie(object):
+    """Stores values under string prefixes, and finds the values stored
+    under every prefix of a string.  Edges are labelled with strings rather
+    than single characters, so a lookup takes one step for each stored
+    prefix along the way."""
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def add(self, prefix, value):
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            edge = node.children.get(prefix[i])
+            if edge is None:
+                child = TrieNode()
+                node.children[prefix[i]] = (prefix[i:], child)
+                node = child
+                break
+            label, child = edge
+            common = 1
+            while common < len(label) and i + common < len(prefix) and label[common] == prefix[i + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the prefix leaves it.
+                middle = TrieNode()
+                middle.children[label[common]] = (label[common:], child)
+                node.children[prefix[i]] = (label[:common], middle)
+                child = middle
+            node = child
+            i += common
+        node.values.append(value)
+
+    def find(self, string):
+        """Return the lists of values stored under prefixes of string, the
+        longest prefix first."""
+        found = []
+        node = self.root
+        if node.values:
+            found.append(node.values)
+        i = 0
+        length = len(string)
+        while i < length:
+            edge = node.children.get(string[i])
+            if edge is None or not string.startswith(edge[0], i):
+                break
+            i += len(edge[0])
+            node = edge[1]
+            if node.values:
+                found.append(node.values)
+        found.reverse()
+        return found
+
+
+class Route(object):
+    """A route of a route table.
+
+    A request takes the route if its path starts with prefix, or contains
+    contains, in any case if ignore_case is set, its method is method (if
+    given), and each of the parameters in where, given as
+    'key=value&key=value', has the value given, ignoring case.  If search is
+    given, the query string must contain a match of it, ignoring case.  If
+    query is given, the request must have that parameter, and its value (or,
+    if pattern is given, the first group of pattern or else all of the match
+    of pattern at the start of the value) is the key of the request;
+    otherwise the first group of search, if it has one, is.  The key is put
+    in the metric name in place of %(key)s, in lower case if lower is set.
+    Query parameters are looked up ignoring the case of their names.  If
+    layout is given, the line must be in that layout ('map', 'web' or
+    'cosmo', as AccessRecord.layout gives it).
+
+    Requests taking the route are counted by status in <metric>_count.<status>
+    if count is set, and their average response time, in milliseconds, is
+    kept in <metric>_response.<status> if response is set; requests without
+    a response time then do not take the route.  status, if given, is used
+    in place of the status of every request.  Requests taking a route with
+    skip set are not counted at all, nor tried against later routes."""
+
+    def __init__(self, prefix=None, metric=None, method=None, query=None, pattern=None, where=None, lower=False,
+                 status=None, count=True, response=False,
+                 count_units='Responses per minute', response_units='Avg Response Time per minute',
+                 contains=None, ignore_case=False, search=None, skip=False, layout=None):
+        if not metric:
+            raise RouteError("Route for %s has no metric" % (prefix or contains))
+        if bool(prefix) == bool(contains):
+            raise RouteError("Route %s needs either a prefix or a string the path contains" % metric)
+        self.search = search and re.compile(search, re.IGNORECASE)
+        if '%(key)s' in metric and not query and not (self.search and self.search.groups):
+            raise RouteError("Route %s names a key but has no query parameter" % metric)
+        self.prefix = prefix
+        self.contains = contains
+        self.ignore_case = ignore_case
+        self.skip = skip
+        self.layout = layout
+        self.metric = metric
+        # The metric name either side of the key.
+        self.head, key, self.tail = metric.partition('%(key)s')
+        self.keyed = bool(key)
+        self.method = method
+        self.query = query
+        self.pattern = pattern and re.compile(pattern, re.IGNORECASE)
+        self.where = []
+        if where:
+            for condition in where.split('&'):
+                key, equals, value = condition.partition('=')
+                self.where.append((key, value.lower()))
+        self.lower = lower
+        self.status = status
+        self.count = count
+        self.response = response
+        self.count_units = count_units
+        self.response_units = response_units
+
+    def name(self, record):
+        """The metric name for a request for a path this route is found
+        for, or None if the request does not take this route."""
+        key = self.key(record)
+        if key is None:
+            return None
+        return self.head + key + self.tail
+
+    def key(self, record):
+        """The key of a request for a path this route is found for, '' if
+        the metric names no key, or None if the request does not take this
+        route."""
+        if self.method is not None and record.method != self.method:
+            return None
+        if self.layout is not None and record.layout != self.layout:
+            return None
+        for key, value in self.where:
+            if record.param(key, '', ignore_case=True).lower() != value:
+                return None
+        key = None
+        if self.search is not None:
+            match = record.query and self.search.search(record.query)
+            if not match:
+                return None
+            if self.search.groups:
+                key = match.group(1)
+        if self.query is not None:
+            key = record.param(self.query, ignore_case=True)
+            if key and self.pattern is not None:
+                match = self.pattern.match(key)
+                key = match and match.group(self.pattern.groups and 1 or 0)
+            if not key:
+                return None
+        if not self.keyed:
+            return ''
+        if not key:
+            return None
+        if self.lower:
+            key = key.lower()
+        return key
+
+
+def make_routes(table):
+    """Make Routes from a list of dicts of their arguments."""
+    routes = []
+    for arguments in table:
+        try:
+            routes.append(Route(**arguments))
+        except TypeError as e:
+            raise RouteError("Bad route %s: %s" % (arguments.get('metric'), e))
+        except re.error as e:
+            raise RouteError("Bad pattern in route %s: %s" % (arguments.get('metric'), e))
+    return routes
+
+
+def load_routes(path):
+    """Read a route table from an INI file with a section for each route,
+    in order.  The metric name defaults to the name of the section."""
+    config = RawConfigParser()
+    if not config.read(path):
+        raise RouteError("Cannot read route table %s" % path)
+    table = []
+    for section in config.sections():
+        arguments = {'metric': section}
+        for option in config.options(section):
+            if option in BOOLEAN_OPTIONS:
+                arguments[option] = config.getboolean(section, option)
+            else:
+                arguments[option] = config.get(section, option)
+        table.append(arguments)
+    return table
+
+
+class RouteTable(object):
+    """The routes of a route table, by the paths they may be taken for.
+    Prefixes are kept in one PrefixTrie, and prefixes compared ignoring case
+    in another, in lower case; routes on a string the path contains are
+    checked one by one.  The routes found for up to CACHE_SIZE paths are
+    kept."""
+
+    CACHE_SIZE = 1024
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.trie = PrefixTrie()
+        self.lower_trie = PrefixTrie()
+        self.contains = []
+        self.ignore_case = False
+        for index, route in enumerate(routes):
+            if route.ignore_case:
+                self.ignore_case = True
+            if route.contains is not None:
+                needle = route.ignore_case and route.contains.lower() or route.contains
+                self.contains.append((needle, route.ignore_case, (index, route)))
+            elif route.ignore_case:
+                self.lower_trie.add(route.prefix.lower(), (index, route))
+            else:
+                self.trie.add(route.prefix, (index, route))
+        self.cache = {}
+
+    def literals(self):
+        """Strings, at least one of which a line for any of the routes
+        contains, in some case if ignore_case is set."""
+        return tuple(route.prefix or route.contains for route in self.routes)
+
+    def lookup(self, path):
+        """Return (index, route) for each route that a request for path may
+        take, in the order of the table."""
+        found = self.cache.get(path)
+        if found is not None:
+            return found
+        if len(self.cache) >= self.CACHE_SIZE:
+            self.cache.clear()
+        self.cache[path] = found = self.find(path)
+        return found
+
+    def find(self, path):
+        """lookup() without the cache."""
+        found = [value for values in self.trie.find(path) for value in values]
+        lowered = path
+        if self.ignore_case:
+            lowered = path.lower()
+            found.extend(value for values in self.lower_trie.find(lowered) for value in values)
+        for needle, ignore_case, value in self.contains:
+            if needle in (ignore_case and lowered or path):
+                found.append(value)
+        found.sort(key=lambda value: value[0])
+        return found
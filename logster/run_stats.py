@@ -0,0 +1,120 @@
+###
+###  Metrics about logster itself.
+###
+###  RunStats counts the lines read, skipped and rejected by the parser in a
+###  run, and how long was spent reading, parsing and submitting, so that
+###  they can be sent alongside the parser's own metrics.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import logging
+from time import time
+
+from logster.logster_helper import MetricObject, LogsterParsingException
+
+logger = logging.getLogger('logster')
+
+
+if str is bytes:
+    def byte_length(line):
+        return len(line)
+else:
+    def byte_length(line):
+        """The length of a line as read from the log.  The tailer decodes
+        lines as UTF-8, replacing bad bytes, so this is exact for logs that
+        are UTF-8."""
+        return len(line.encode('utf-8'))
+
+
+class RunStats(object):
+    """Counts and timings for one run, or one flush in daemon mode"""
+
+    counters = ('bytes_read', 'lines_read', 'lines_skipped', 'parse_exceptions')
+    timers = ('read_time', 'parse_time', 'submit_time')
+
+    def __init__(self):
+        for name in self.counters:
+            setattr(self, name, 0)
+        for name in self.timers:
+            setattr(self, name, 0.0)
+
+    @property
+    def lines_matched(self):
+        """The lines neither skipped nor raising a parsing exception.  The
+        base class does not require parse_line() to return False for lines
+        it ignores, so for parsers that do not, as the bundled ones do, this
+        counts every line that got past the prefilter."""
+        return self.lines_read - self.lines_skipped - self.parse_exceptions
+
+    def add(self, other):
+        """Add the counts and timings of another RunStats to these."""
+        for name in self.counters + self.timers:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def parse_lines(self, parser, lines):
+        """Feed each line to the parser, as parse_lines() does, counting the
+        lines and timing the reading and parsing of them.  A line is counted
+        as skipped if the parser's prefilter turns it away or parse_line()
+        returns False."""
+        prefilter = parser.get_prefilter()
+        accepts = prefilter is not None and prefilter.accepts or None
+        lines = iter(lines)
+        read_time = parse_time = 0.0
+        started = time()
+        while True:
+            try:
+                line = next(lines)
+            except StopIteration:
+                read_time += time() - started
+                break
+            read = time()
+            read_time += read - started
+            self.lines_read += 1
+            self.bytes_read += byte_length(line)
+            try:
+                if accepts is not None and not accepts(line):
+                    self.lines_skipped += 1
+                elif parser.parse_line(line) is False:
+                    self.lines_skipped += 1
+            except LogsterParsingException as e:
+                self.parse_exceptions += 1
+                logger.debug("Parsing exception caught: %s" % e)
+            started = time()
+            parse_time += started - read
+        self.read_time += read_time
+        self.parse_time += parse_time
+
+    def get_metrics(self, prefix):
+        """Return the stats as metrics named under prefix."""
+        busy = self.read_time + self.parse_time
+        lines_per_second = 0.0
+        if busy > 0:
+            lines_per_second = self.lines_read / busy
+        values = [
+            ('bytes_read', self.bytes_read, 'Bytes'),
+            ('lines_read', self.lines_read, 'Lines'),
+            ('lines_matched', self.lines_matched, 'Lines'),
+            ('lines_skipped', self.lines_skipped, 'Lines'),
+            ('parse_exceptions', self.parse_exceptions, 'Lines'),
+            ('read_seconds', self.read_time, 'Seconds'),
+            ('parse_seconds', self.parse_time, 'Seconds'),
+            ('submit_seconds', self.submit_time, 'Seconds'),
+            ('lines_per_second', lines_per_second, 'Lines per second'),
+        ]
+        return [MetricObject('%s.%s' % (prefix, name), value, units) for name, value, units in values]
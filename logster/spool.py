@@ -0,0 +1,217 @@
+###
+###  An on-disk spool for metrics that could not be delivered.
+###
+###  When an output fails, the batch of metrics it was given is appended to
+###  a spool file under the state directory, and the next run sends what is
+###  in the spool before its own metrics.  Records are length-prefixed and
+###  compressed, and are read back one at a time, so an outage costs neither
+###  a re-read of the logs nor unbounded memory.  The spool is capped in both
+###  size and age; the oldest records are dropped first.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import time
+import threading
+import zlib
+import struct
+import logging
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from logster.logster_helper import MetricBatch
+
+logger = logging.getLogger('logster')
+
+# Each record is: payload length, time spooled, CRC32 of the payload.
+RECORD_HEADER = struct.Struct('!IdI')
+
+
+def encode_metrics(metrics):
+    metrics = MetricBatch.of(metrics)
+    fields = list(zip(metrics.names, metrics.values, metrics.units, metrics.types, metrics.timestamps))
+    return zlib.compress(pickle.dumps(fields, 2))
+
+
+def decode_metrics(payload):
+    metrics = MetricBatch()
+    fields = pickle.loads(zlib.decompress(payload))
+    if fields:
+        (metrics.names, metrics.values, metrics.units,
+         metrics.types, metrics.timestamps) = [list(column) for column in zip(*fields)]
+    return metrics
+
+
+class MetricSpool(object):
+    """A file of batches of metrics waiting to be sent"""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def append(self, metrics):
+        """Add a batch of metrics to the end of the spool."""
+        payload = encode_metrics(metrics)
+        f = open(self.path, 'ab')
+        try:
+            f.write(RECORD_HEADER.pack(len(payload), time.time(), zlib.crc32(payload) & 0xffffffff))
+            f.write(payload)
+        finally:
+            f.close()
+        if os.path.getsize(self.path) > self.max_bytes:
+            self._trim()
+
+    def records(self, f):
+        """Yield (offset, spooled time, metrics) for each record in f,
+        stopping at the end of the file or at a damaged record."""
+        while True:
+            offset = f.tell()
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, spooled, crc = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) & 0xffffffff != crc:
+                logger.warning("Discarding damaged records at offset %s of %s" % (offset, self.path))
+                return
+            yield offset, spooled, payload
+
+    def _rewrite(self, f, offset):
+        """Replace the spool with its records from offset onwards."""
+        f.seek(offset)
+        tmp_path = '%s.tmp' % self.path
+        out = open(tmp_path, 'wb')
+        try:
+            for record_offset, spooled, payload in self.records(f):
+                out.write(RECORD_HEADER.pack(len(payload), spooled, zlib.crc32(payload) & 0xffffffff))
+                out.write(payload)
+        finally:
+            out.close()
+        if os.path.getsize(tmp_path) == 0:
+            os.unlink(tmp_path)
+            os.unlink(self.path)
+        else:
+            os.rename(tmp_path, self.path)
+
+    def _trim(self):
+        """Drop the oldest records until the spool fits in max_bytes."""
+        f = open(self.path, 'rb')
+        try:
+            excess = os.path.getsize(self.path) - self.max_bytes
+            keep_from = None
+            for offset, spooled, payload in self.records(f):
+                if offset >= excess:
+                    keep_from = offset
+                    break
+            if keep_from is None:
+                keep_from = os.path.getsize(self.path)
+            logger.warning("Spool %s is full, dropping %s bytes of the oldest metrics" % (self.path, keep_from))
+            self._rewrite(f, keep_from)
+        finally:
+            f.close()
+
+    def replay(self, send):
+        """Pass each batch in the spool, oldest first, to send(), removing
+        those that were sent. Batches older than max_age are dropped. If
+        send() raises, the batches not yet sent are kept and the exception
+        is re-raised. Returns the number of batches sent."""
+        if not os.path.exists(self.path):
+            return 0
+        sent = 0
+        expired = 0
+        f = open(self.path, 'rb')
+        try:
+            oldest = time.time() - self.max_age
+            for offset, spooled, payload in self.records(f):
+                if spooled < oldest:
+                    expired += 1
+                    continue
+                try:
+                    send(decode_metrics(payload))
+                except Exception:
+                    self._rewrite(f, offset)
+                    raise
+                sent += 1
+            os.unlink(self.path)
+        finally:
+            f.close()
+            if expired:
+                logger.warning("Dropped %s batches of metrics older than %s seconds from %s"
+                               % (expired, self.max_age, self.path))
+        return sent
+
+
+class SpooledSink(object):
+    """Wraps an output so that metrics it fails to send, or is too busy to
+    be sent, are spooled, and spooled metrics are sent ahead of new ones.
+    Batches arriving while a send is replaying the spool are spooled once
+    it has finished, so that the replay does not remove them unsent."""
+
+    def __init__(self, sink, spool):
+        self.sink = sink
+        self.spool = spool
+        self.lock = threading.Lock()
+        self.busy = False
+        self.waiting = []
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+    def __setattr__(self, name, value):
+        if name in ('sink', 'spool', 'lock', 'busy', 'waiting'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.sink, name, value)
+
+    def send(self, metrics):
+        with self.lock:
+            self.busy = True
+        failed = None
+        try:
+            replayed = self.spool.replay(self.sink.send)
+            if replayed:
+                logger.info("Sent %s spooled batches of metrics to %s" % (replayed, self.sink.name))
+            self.sink.send(metrics)
+        except Exception:
+            failed = metrics
+            raise
+        finally:
+            with self.lock:
+                self.busy = False
+                waiting, self.waiting = self.waiting, []
+                if failed is not None:
+                    waiting.insert(0, failed)
+                for batch in waiting:
+                    self._append(batch)
+
+    def not_sent(self, metrics):
+        with self.lock:
+            if self.busy:
+                self.waiting.append(metrics)
+            else:
+                self._append(metrics)
+
+    def _append(self, metrics):
+        if metrics:
+            self.spool.append(metrics)
+            logger.info("Spooled %s metrics for %s in %s" % (len(metrics), self.sink.name, self.spool.path))
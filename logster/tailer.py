@@ -0,0 +1,391 @@
+###
+###  A built-in replacement for the logtail2 utility.
+###
+###  LogTailer keeps a cursor on a log file in a state file and returns only
+###  the lines appended since the last run, reading them directly from the
+###  file in large blocks.  The state file is compatible with the offset file
+###  written by logtail2 (inode on the first line, byte offset on the second),
+###  with an optional third line holding a fingerprint of the head of the
+###  file so that a truncated or replaced log is noticed even if the inode
+###  is reused.  A log that has been rotated away, whether moved, copied or
+###  compressed, is found again and finished before the new log is read.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import hashlib
+
+# Size of the reads made against the log file.
+BLOCK_SIZE = 1024 * 1024
+
+# Number of bytes at the head of the file used to fingerprint it.
+FINGERPRINT_SIZE = 256
+
+# Number of the most recently modified files named after a log that are
+# checked when looking for the log after it has been rotated.
+ROTATED_CANDIDATES = 5
+
+
+def fingerprint(head, offset):
+    """Fingerprint a log from its first bytes, covering no more than the
+    offset read up to, since only that much is known not to change."""
+    length = min(offset, FINGERPRINT_SIZE)
+    if length == 0:
+        return None
+    return hashlib.md5(head[:length]).hexdigest()
+
+
+def decode_line(line):
+    """Lines are read as bytes, but parsers expect native strings."""
+    if str is not bytes:
+        return line.decode('utf-8', 'replace')
+    return line
+
+
+def iter_lines(fd, start, end, block_size=BLOCK_SIZE, final=False):
+    """Yield the complete lines of fd between the byte offsets start and end
+    (end of file if None) as bytes, reading block_size bytes at a time.
+    A trailing partial line is only yielded if final is set."""
+    fd.seek(start)
+    position = start
+    remainder = b''
+    while end is None or position < end:
+        size = block_size
+        if end is not None:
+            size = min(size, end - position)
+        block = fd.read(size)
+        if not block:
+            break
+        position += len(block)
+        lines = (remainder + block).split(b'\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if final and remainder:
+        yield remainder
+
+
+def next_line_end(fd, position, end, block_size=BLOCK_SIZE):
+    """Return the offset just past the first newline at or after position,
+    or end if there is none before it."""
+    fd.seek(position)
+    while position < end:
+        block = fd.read(min(block_size, end - position))
+        if not block:
+            break
+        index = block.find(b'\n')
+        if index >= 0:
+            return position + index + 1
+        position += len(block)
+    return end
+
+
+def last_line_end(fd, start, end, block_size=BLOCK_SIZE):
+    """Return the offset just past the last newline between start and end,
+    or start if there is none."""
+    position = end
+    while position > start:
+        size = min(block_size, position - start)
+        fd.seek(position - size)
+        block = fd.read(size)
+        index = block.rfind(b'\n')
+        if index >= 0:
+            return position - size + index + 1
+        position -= size
+    return start
+
+
+def open_rotated(path):
+    """Open a rotated log, which may have been compressed with gzip."""
+    if path.endswith('.gz'):
+        # Only imported when there is a compressed log to read.
+        import gzip
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class TailState(object):
+    """The cursor stored in a state file"""
+    def __init__(self, inode=None, offset=0, fingerprint=None):
+        self.inode = inode
+        self.offset = offset
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, state_file):
+        """Read a state file, returning None if it is missing or unreadable."""
+        try:
+            f = open(state_file, 'r')
+        except IOError:
+            return None
+        try:
+            fields = f.read().split()
+        finally:
+            f.close()
+
+        if len(fields) < 2:
+            return None
+        try:
+            inode = int(fields[0])
+            offset = int(fields[1])
+        except ValueError:
+            return None
+        fingerprint = None
+        if len(fields) > 2:
+            fingerprint = fields[2]
+        return cls(inode, offset, fingerprint)
+
+    def save(self, state_file):
+        """Atomically replace the state file with this cursor."""
+        tmp_file = '%s.tmp' % state_file
+        f = open(tmp_file, 'w')
+        try:
+            f.write('%s\n%s\n' % (self.inode, self.offset))
+            if self.fingerprint:
+                f.write('%s\n' % self.fingerprint)
+        finally:
+            f.close()
+        os.rename(tmp_file, state_file)
+
+
+class LogTailer(object):
+    """Read the lines appended to a log file since the cursor in state_file.
+
+    Usage:
+
+        tailer = LogTailer(log_file, state_file)
+        for line in tailer.read_lines():
+            ...
+        tailer.save()
+
+    Only complete lines are returned; a trailing partial line is left for
+    the next run.  read_lines() may be called again on the same tailer to
+    pick up lines written since, but the cursor is only written to the
+    state file when save() is called.
+
+    If the log has been rotated since the cursor was saved, the rotated
+    file is found by its inode (or, if it has been copied or compressed,
+    by the fingerprint of its head) among the files named after the log,
+    such as access_log.1 or access_log.1.gz, and the rest of it is read
+    before the new log is read from the start."""
+
+    def __init__(self, log_file, state_file, block_size=BLOCK_SIZE):
+        self.log_file = log_file
+        self.state_file = state_file
+        self.block_size = block_size
+        self.state = TailState.load(state_file)
+        self.inode = None
+        self.offset = 0
+        self.head = b''
+        self.size = 0
+        self.rotated = None
+
+    def has_state(self):
+        """True if a usable cursor was found in the state file."""
+        return self.state is not None
+
+    def matches(self, state, inode, size, head):
+        """Whether the cursor state points into the file described."""
+        if state.inode != inode or state.offset > size:
+            return False
+        return state.fingerprint is None or state.fingerprint == fingerprint(head, state.offset)
+
+    def open(self):
+        """Open the log file and position the cursor, returning the file.
+        If the log has been rotated, the rotated file to finish first is
+        left in self.rotated."""
+        fd = open(self.log_file, 'rb')
+        st = os.fstat(fd.fileno())
+        self.inode = st.st_ino
+        self.size = st.st_size
+        self.head = fd.read(FINGERPRINT_SIZE)
+        self.offset = 0
+        self.rotated = None
+
+        state = self.state
+        if state is not None:
+            if self.matches(state, self.inode, self.size, self.head):
+                self.offset = state.offset
+            elif state.offset > 0:
+                self.rotated = self.find_rotated(state)
+
+        fd.seek(self.offset)
+        return fd
+
+    def find_rotated(self, state):
+        """Return the path of the rotated log that state points into, or
+        None if it can't be found."""
+        directory, name = os.path.split(os.path.abspath(self.log_file))
+        candidates = []
+        for candidate in os.listdir(directory):
+            if candidate.startswith(name) and candidate != name:
+                path = os.path.join(directory, candidate)
+                try:
+                    candidates.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+
+        # The most recently rotated file is the likeliest.
+        candidates.sort(reverse=True)
+        for mtime, path in candidates[:ROTATED_CANDIDATES]:
+            try:
+                if path.endswith('.gz'):
+                    # Compressing gives the file a new inode, so only the
+                    # fingerprint can identify it.
+                    if state.fingerprint is None:
+                        continue
+                    f = open_rotated(path)
+                    try:
+                        head = f.read(FINGERPRINT_SIZE)
+                    finally:
+                        f.close()
+                    if fingerprint(head, state.offset) == state.fingerprint:
+                        return path
+                else:
+                    f = open(path, 'rb')
+                    try:
+                        st = os.fstat(f.fileno())
+                        head = f.read(FINGERPRINT_SIZE)
+                    finally:
+                        f.close()
+                    if self.matches(state, st.st_ino, st.st_size, head):
+                        return path
+                    # A copy made by copytruncate has a new inode.
+                    if (state.fingerprint is not None and state.offset <= st.st_size and
+                            fingerprint(head, state.offset) == state.fingerprint):
+                        return path
+            except (IOError, OSError):
+                continue
+        return None
+
+    def pending(self):
+        """Number of unread bytes in the current log, as of the last call
+        to open()."""
+        return self.size - self.offset
+
+    def unread(self):
+        """Number of bytes still to read, as far as can be told cheaply: the
+        rest of the current log, and the rest of a rotated log that has not
+        been compressed."""
+        unread = self.size - self.offset
+        if self.rotated is not None and not self.rotated.endswith('.gz'):
+            try:
+                unread += max(os.path.getsize(self.rotated) - self.state.offset, 0)
+            except OSError:
+                pass
+        return unread
+
+    def read_rotated(self):
+        """Yield the unread lines of the rotated log found by open(), if any.
+        The rotated log is finished, so a final unterminated line is
+        included.  If this is not read to the end, the cursor is left
+        pointing into the rotated log."""
+        if self.rotated is None:
+            return
+        state = self.state
+        offset = state.offset
+        fd = open_rotated(self.rotated)
+        try:
+            head = fd.read(FINGERPRINT_SIZE)
+            # Reading a compressed log from an offset decompresses and
+            # discards everything before it.
+            for line in iter_lines(fd, offset, None, self.block_size, final=True):
+                offset += len(line)
+                self.state = TailState(state.inode, offset, fingerprint(head, offset))
+                yield decode_line(line)
+        finally:
+            fd.close()
+        self.rotated = None
+
+    def read_lines(self, fd=None):
+        """Return an iterator over each complete line after the cursor,
+        advancing the cursor as lines are consumed.  The log file is opened
+        straight away (unless already opened with open()) so that errors
+        surface before any parsing starts."""
+        if fd is None:
+            fd = self.open()
+        return self._iter_lines(fd)
+
+    def _iter_lines(self, fd):
+        try:
+            for line in self.read_rotated():
+                yield line
+            for line in iter_lines(fd, self.offset, None, self.block_size):
+                self.offset += len(line)
+                yield decode_line(line)
+        finally:
+            # Remember how far we got, so that reading again from the
+            # same tailer carries on from here.
+            self.state = self.position()
+            fd.close()
+
+    def cursor(self):
+        """The current position in the current log as a TailState."""
+        if len(self.head) < min(self.offset, FINGERPRINT_SIZE):
+            # The log was shorter than the fingerprint when opened.
+            f = open(self.log_file, 'rb')
+            try:
+                self.head = f.read(FINGERPRINT_SIZE)
+            finally:
+                f.close()
+        return TailState(self.inode, self.offset, fingerprint(self.head, self.offset))
+
+    def position(self):
+        """The position just past the last line read, as a TailState, which
+        may be in a rotated log."""
+        if self.rotated is not None:
+            return self.state
+        return self.cursor()
+
+    def split(self, fd, count, limit=None):
+        """Split the unread bytes of the file opened with open(), or the
+        first limit of them, into at most count (start, end) ranges of
+        similar size, each ending on a line boundary.  A trailing partial
+        line is left out."""
+        end = self.size
+        if limit is not None:
+            end = min(end, self.offset + limit)
+        end = last_line_end(fd, self.offset, end, self.block_size)
+        step = (end - self.offset) // count
+        bounds = [self.offset]
+        for i in range(1, count):
+            position = next_line_end(fd, max(self.offset + i * step, bounds[-1]), end, self.block_size)
+            if bounds[-1] < position < end:
+                bounds.append(position)
+        if end > bounds[-1]:
+            bounds.append(end)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def advance(self, offset):
+        """Move the cursor to offset, after the data up to it has been read
+        some other way."""
+        self.offset = offset
+        self.state = self.cursor()
+
+    def skip_to_end(self):
+        """Move the cursor to the end of the file without reading it."""
+        fd = self.open()
+        fd.close()
+        self.rotated = None
+        self.offset = self.size
+        self.state = self.cursor()
+
+    def save(self):
+        """Write the current cursor to the state file."""
+        self.state.save(self.state_file)
@@ -0,0 +1,142 @@
+###
+###  Wait for a log file to change.
+###
+###  Used by the daemon mode of logster to sleep until there is something new
+###  to read.  On Linux the directory holding the log is watched with inotify
+###  (through ctypes, so no extra module is needed), which also catches the
+###  log being rotated.  Everywhere else, or if inotify cannot be set up, the
+###  file is simply polled.
+###
+###  Copyright 2011, Etsy, Inc.
+###
+###  This file is part of Logster.
+###
+###  Logster is free software: you can redistribute it and/or modify
+###  it under the terms of the GNU General Public License as published by
+###  the Free Software Foundation, either version 3 of the License, or
+###  (at your option) any later version.
+###
+###  Logster is distributed in the hope that it will be useful,
+###  but WITHOUT ANY WARRANTY; without even the implied warranty of
+###  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+###  GNU General Public License for more details.
+###
+###  You should have received a copy of the GNU General Public License
+###  along with Logster. If not, see <http://www.gnu.org/licenses/>.
+###
+
+import os
+import errno
+import select
+import struct
+import time
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher(object):
+    """Wake up when the size, inode or mtime of a file changes, checking
+    every poll_interval seconds."""
+    def __init__(self, path, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.last = self._signature()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime)
+
+    def wait(self, timeout):
+        """Block for up to timeout seconds, returning True if the file changed."""
+        deadline = time.time() + timeout
+        while True:
+            current = self._signature()
+            if current != self.last:
+                self.last = current
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Wake up on inotify events for a file, watching its directory so that
+    a rotated or recreated log is noticed too."""
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+
+        self.path = path
+        self.name = os.path.basename(path)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        directory = os.path.dirname(os.path.abspath(path))
+        wd = libc.inotify_add_watch(self.fd, directory.encode('utf-8'), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, 'inotify_add_watch failed for %s' % directory)
+
+    def wait(self, timeout):
+        """Block for up to timeout seconds, returning True if the file changed."""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                readable = select.select([self.fd], [], [], remaining)[0]
+            except (select.error, OSError) as e:
+                if e.args[0] == errno.EINTR:
+                    return False
+                raise
+            if not readable:
+                return False
+            if self._drain():
+                return True
+
+    def _drain(self):
+        """Read the pending events, returning True if any concern our file."""
+        data = os.read(self.fd, 64 * 1024)
+        position = 0
+        changed = False
+        while position + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = data[position:position + length].rstrip(b'\0')
+            position += length
+            if mask & IN_Q_OVERFLOW or name.decode('utf-8', 'replace') == self.name:
+                changed = True
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(path, poll_interval=1.0):
+    """Return an inotify watcher for path, or a polling one if inotify is
+    not available."""
+    try:
+        return InotifyWatcher(path)
+    except (ImportError, OSError, AttributeError):
+        return PollingWatcher(path, poll_interval)
@@ -0,0 +1,178 @@
+from logster.access_log import AccessLogParser, parse, tokenize
+from logster.logster_helper import LogsterParser, LogsterParserGroup, parse_lines
+from logster.parsers.DMMapServerLogster import DMMapServerLogster
+from logster.parsers.DMMapProxyLogster import DMMapProxyLogster
+import pickle
+import unittest
+
+MAP_LINE = ('dm-map.edina.ac.uk 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] '
+            '"GET /mapproxy/service?LAYERS=os-base&tiled=true HTTP/1.1" 200 5120 Response: 2500\n')
+WEB_LINE = ('1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "POST /roam/api/download/orders HTTP/1.1" 201 99 '
+            '"-" "Mozilla/5.0 (X11)" 31000 dm-web -\n')
+COSMO_LINE = ('1.2.3.4 4200 5.6.7.8 - - [18/Oct/2026:10:00:00 +0000] "POST /dfc/cosmo-print HTTP/1.1" 500 12 '
+              '"-" "Mozilla/5.0"\n')
+
+
+def counting(tokenizer, calls):
+    def count(line):
+        calls.append(line)
+        return tokenizer(line)
+    return count
+
+
+class PathParser(AccessLogParser):
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.statuses = []
+
+    def parse_record(self, record):
+        if not record.path.startswith(self.prefix):
+            return False
+        self.statuses.append(record.status)
+
+
+class LineParser(LogsterParser):
+
+    def __init__(self):
+        self.lines = []
+
+    def parse_line(self, line):
+        self.lines.append(line)
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_quotes_and_brackets(self):
+        fields, request_index = tokenize(WEB_LINE)
+        self.assertEqual(fields, ['1.2.3.4', '-', '-', '18/Oct/2026:10:00:00 +0000',
+                                  'POST /roam/api/download/orders HTTP/1.1', '201', '99',
+                                  '-', 'Mozilla/5.0 (X11)', '31000', 'dm-web', '-'])
+        self.assertEqual(request_index, 4)
+
+    def test_escaped_quote(self):
+        fields, request_index = tokenize('1.2.3.4 "GET /a HTTP/1.1" 200 1 "-" "say \\"hi\\" \\\\" x\n')
+        self.assertEqual(fields[-2:], ['say \\"hi\\" \\\\', 'x'])
+
+    def test_unterminated_quote(self):
+        self.assertEqual(tokenize('1.2.3.4 "GET /a very long request\n'),
+                         (['1.2.3.4', 'GET /a very long request'], 1))
+
+    def test_no_quotes(self):
+        self.assertEqual(tokenize('a [b c] d\n'), (['a', 'b c', 'd'], None))
+
+
+class TestAccessRecord(unittest.TestCase):
+
+    def test_map_layout(self):
+        record = parse(MAP_LINE)
+        self.assertEqual((record.method, record.path, record.protocol), ('GET', '/mapproxy/service', 'HTTP/1.1'))
+        self.assertEqual((record.status, record.size, record.response), ('200', '5120', '2500'))
+        self.assertEqual(record.response_msec(), 2.5)
+        self.assertEqual(record.layout, 'map')
+
+    def test_web_layout(self):
+        record = parse(WEB_LINE)
+        self.assertEqual((record.status, record.response, record.query), ('201', '31000', None))
+        self.assertEqual(record.layout, 'web')
+
+    def test_cosmo_layout(self):
+        record = parse(COSMO_LINE)
+        self.assertEqual((record.path, record.status, record.response), ('/dfc/cosmo-print', '500', '4200'))
+        self.assertEqual(record.layout, 'cosmo')
+
+    def test_fields(self):
+        record = parse(MAP_LINE)
+        self.assertEqual(record.fields[0], 'dm-map.edina.ac.uk')
+        self.assertEqual(record.fields[record.request_index + 3], 'Response:')
+
+    def test_params(self):
+        record = parse(MAP_LINE)
+        self.assertEqual(record.params(), {'LAYERS': 'os-base', 'tiled': 'true'})
+        self.assertEqual(record.param('layers'), None)
+        self.assertEqual(record.param('layers', ignore_case=True), 'os-base')
+        self.assertEqual(record.param('bbox', '', ignore_case=True), '')
+
+    def test_not_a_request(self):
+        self.assertEqual(parse('[Sat Oct 18 10:00:00 2026] [error] oops\n'), None)
+        record = parse('1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "-" 408 0 Response: 10\n')
+        self.assertEqual((record.method, record.path, record.status), (None, None, '408'))
+
+    def test_truncated(self):
+        record = parse('1.2.3.4 5000 - - [18/Oct/2026:10:00:00 +0000] "GET /a HTTP/1.1"\n')
+        self.assertEqual((record.path, record.status, record.response, record.layout), ('/a', None, None, None))
+        self.assertEqual(record.response_msec(), None)
+
+
+class TestAccessLogParser(unittest.TestCase):
+
+    def test_parse_line(self):
+        parser = PathParser('/mapproxy/')
+        self.assertEqual(parser.parse_line(MAP_LINE), None)
+        self.assertEqual(parser.parse_line(WEB_LINE), False)
+        self.assertEqual(parser.parse_line('no request here\n'), False)
+        self.assertEqual(parser.statuses, ['200'])
+
+    def test_group_tokenizes_once(self):
+        calls = []
+        tokenizer = counting(parse, calls)
+        parsers = [PathParser('/mapproxy/'), PathParser('/dfc/'), LineParser()]
+        for parser in parsers[:2]:
+            parser.tokenizer = tokenizer
+        group = LogsterParserGroup(parsers)
+        parse_lines(group, [MAP_LINE, WEB_LINE, COSMO_LINE])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(parsers[0].statuses, ['200'])
+        self.assertEqual(parsers[1].statuses, ['500'])
+        self.assertEqual(len(parsers[2].lines), 3)
+
+    def test_group_skips_lines_without_request(self):
+        group = LogsterParserGroup([PathParser('/'), PathParser('/dfc/')])
+        self.assertEqual(group.parse_line('no request here\n'), False)
+        self.assertEqual(group.parse_line(WEB_LINE), None)
+
+    def test_pickle(self):
+        group = pickle.loads(pickle.dumps(LogsterParserGroup([PathParser('/mapproxy/')])))
+        group.parse_line(MAP_LINE)
+        self.assertEqual(group.parsers[0].statuses, ['200'])
+
+
+
+def map_line(request, code=200):
+    return ('dm-map.edina.ac.uk 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] '
+            '"GET %s HTTP/1.1" %d 5120 Response: 2500\n' % (request, code))
+
+
+def metric_names(parser, lines):
+    parse_lines(parser, lines)
+    return sorted(metric.name for metric in parser.get_state(60))
+
+
+class TestMapParsers(unittest.TestCase):
+
+    def test_mapserver_ignores_case(self):
+        lines = [map_line('/cgi-bin/mapserv?map=/etc/mapserver/mapfiles/os/base.map'),
+                 map_line('/CGI-BIN/MAPSERV?MAP=/ETC/MAPSERVER/MAPFILES/os/Base.MAP', 404),
+                 map_line('/cgi-bin/other?map=/etc/mapserver/mapfiles/x.map')]
+        self.assertEqual(metric_names(DMMapServerLogster(), lines),
+                         ['ms_os-Base_count.404', 'ms_os-Base_response.404',
+                          'ms_os-base_count.200', 'ms_os-base_response.200'])
+
+    def test_mapproxy_ignores_case(self):
+        lines = [map_line('/MapProxy/Service?layers=os-base&TILED=TRUE'),
+                 map_line('/MAPPROXY/SERVICE?LAYERS=aerial'),
+                 map_line('/mapproxy/other?layers=aerial')]
+        self.assertEqual(metric_names(DMMapProxyLogster(), lines),
+                         ['mp_os-base_count.200', 'mp_os-base_response.200',
+                          'mpwms_aerial_count.200', 'mpwms_aerial_response.200'])
+
+    def test_other_layouts(self):
+        for target in ('/cgi-bin/mapserv?map=/etc/mapserver/mapfiles/os/base.map', '/mapproxy/service?layers=os-base'):
+            lines = [WEB_LINE.replace('POST /roam/api/download/orders', 'GET ' + target),
+                     COSMO_LINE.replace('POST /dfc/cosmo-print', 'GET ' + target)]
+            self.assertEqual(metric_names(DMMapServerLogster(), lines), [])
+            self.assertEqual(metric_names(DMMapProxyLogster(), lines), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from logster.budget import ReadBudget, CHECK_LINES
+from logster.tailer import LogTailer
+
+
+class TestReadBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.state_file = os.path.join(self.dir, 'access_log.state')
+        f = open(self.log_file, 'wb')
+        f.write(b''.join(('line %03d\n' % i).encode('ascii') for i in range(100)))
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_stops_at_line_and_next_run_carries_on(self):
+        tailer = LogTailer(self.log_file, self.state_file)
+        budget = ReadBudget(max_bytes=225)
+        lines = list(budget.lines(tailer.read_lines()))
+        self.assertEqual(len(lines), 25)
+        self.assertTrue(budget.exhausted)
+        self.assertEqual(tailer.unread(), 675)
+        self.assertEqual(budget.fraction(tailer.unread()), 0.25)
+        tailer.save()
+
+        tailer = LogTailer(self.log_file, self.state_file)
+        budget = ReadBudget(max_bytes=10000)
+        lines = list(budget.lines(tailer.read_lines()))
+        self.assertEqual(lines[0], 'line 025\n')
+        self.assertEqual(len(lines), 75)
+        self.assertFalse(budget.exhausted)
+        self.assertEqual(budget.fraction(tailer.unread()), 1.0)
+
+    def test_time_budget(self):
+        f = open(self.log_file, 'ab')
+        f.write(b'more\n' * (CHECK_LINES * 2))
+        f.close()
+        tailer = LogTailer(self.log_file, self.state_file)
+        budget = ReadBudget(max_seconds=1e-9)
+        lines = list(budget.lines(tailer.read_lines()))
+        # The clock is only checked every CHECK_LINES lines.
+        self.assertTrue(budget.exhausted)
+        self.assertEqual(len(lines), CHECK_LINES)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from logster.checkpoint import Checkpoint
+from logster.logster_helper import LogsterParser, parse_lines
+from logster.tailer import LogTailer
+
+
+class LineCounter(LogsterParser):
+    def __init__(self):
+        self.count = 0
+
+    def parse_line(self, line):
+        self.count += 1
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.state_file = os.path.join(self.dir, 'access_log.state')
+        self.checkpoint_file = os.path.join(self.dir, 'access_log.ckpt')
+        f = open(self.log_file, 'wb')
+        f.write(b'first\n')
+        f.close()
+        tailer = LogTailer(self.log_file, self.state_file)
+        tailer.skip_to_end()
+        tailer.save()
+        f = open(self.log_file, 'ab')
+        f.write(b''.join(('line %d\n' % i).encode('ascii') for i in range(2500)))
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def start(self, key='LineCounter'):
+        tailer = LogTailer(self.log_file, self.state_file)
+        checkpoint = Checkpoint(self.checkpoint_file, key, interval=1e-6)
+        parser = checkpoint.restore(tailer) or LineCounter()
+        return tailer, checkpoint, parser
+
+    def test_resumes_after_crash(self):
+        tailer, checkpoint, parser = self.start()
+        lines = checkpoint.lines(tailer.read_lines(), tailer, parser)
+        for n in range(1500):
+            parser.parse_line(next(lines))
+        # Die without saving the state file.
+        del tailer, checkpoint, parser, lines
+
+        tailer, checkpoint, parser = self.start()
+        self.assertEqual(parser.count, 1000)
+        parse_lines(parser, checkpoint.lines(tailer.read_lines(), tailer, parser))
+        self.assertEqual(parser.count, 2500)
+        tailer.save()
+        checkpoint.remove()
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+    def test_ignored_for_other_parsers_or_state(self):
+        tailer, checkpoint, parser = self.start()
+        parse_lines(parser, checkpoint.lines(tailer.read_lines(), tailer, parser))
+        self.assertEqual(self.start(key='Other')[2].count, 0)
+
+        # The run completed and saved its state but died before removing
+        # the checkpoint.
+        tailer.save()
+        self.assertEqual(self.start()[2].count, 0)
@@ -0,0 +1,16 @@
+from benchmarks.generators import FORMATS, generate
+import unittest
+
+
+class TestGenerators(unittest.TestCase):
+
+    def test_deterministic(self):
+        for format in FORMATS:
+            self.assertEqual(generate(format, 50, 0.5, seed=3), generate(format, 50, 0.5, seed=3))
+            self.assertNotEqual(generate(format, 50, 0.5, seed=3), generate(format, 50, 0.5, seed=4))
+
+    def test_match_ratio(self):
+        lines = generate('apache', 1000, 0.25, parser='DMTileLogster')
+        matching = [line for line in lines if 'tilecache.py' in line]
+        self.assertTrue(200 < len(matching) < 300)
+        self.assertTrue(all(line.endswith('\n') for line in lines))
@@ -0,0 +1,368 @@
+from logster.logster_helper import LogsterParser, LogsterParserGroup, create_parser
+from logster.logster_helper import MetricObject, MetricBatch, LogsterParsingException
+from logster.logster_helper import KeyedAggregator, LatencyBuckets, RESPONSE_STATS, HISTOGRAM_STATS
+from logster.logster_helper import SeriesGuard, response_aggregator, response_options
+import optparse
+import pickle
+import time
+import unittest
+
+
+class WordCounter(LogsterParser):
+    """Counts lines containing a word, failing on lines that don't."""
+    def __init__(self, word):
+        self.word = word
+        self.count = 0
+
+    def parse_line(self, line):
+        if self.word not in line:
+            raise LogsterParsingException("no %s" % self.word)
+        self.count += 1
+
+    def get_state(self, duration):
+        return [MetricObject(self.word, self.count)]
+
+
+class TestLogsterParserGroup(unittest.TestCase):
+
+    def test_every_parser_sees_every_line(self):
+        group = LogsterParserGroup([WordCounter('foo'), WordCounter('bar')])
+        for line in ['foo bar\n', 'foo\n', 'bar\n', 'foo\n']:
+            try:
+                group.parse_line(line)
+            except LogsterParsingException:
+                pass
+        metrics = dict((m.name, m.value) for m in group.get_state(60))
+        self.assertEqual(metrics, {'foo': 3, 'bar': 2})
+
+    def test_parsing_exception_is_raised_after_all_parsers(self):
+        second = WordCounter('bar')
+        group = LogsterParserGroup([WordCounter('foo'), second])
+        self.assertRaises(LogsterParsingException, group.parse_line, 'bar\n')
+        self.assertEqual(second.count, 1)
+
+
+class TestMerge(unittest.TestCase):
+
+    def test_merges_counters_sums_and_lists(self):
+        mine = LogsterParser()
+        mine.total = 1
+        mine.counts = {'ms_os': {'200': 2}}
+        mine.values = [1.0]
+        mine.unit = 'ms'
+        theirs = LogsterParser()
+        theirs.total = 2
+        theirs.counts = {'ms_os': {'200': 1, '404': 1}, 'ms_geo': {'200': 5}}
+        theirs.values = [2.0]
+        theirs.unit = 's'
+        theirs.extra = 3
+        mine.merge(theirs)
+        self.assertEqual(mine.total, 3)
+        self.assertEqual(mine.counts, {'ms_os': {'200': 3, '404': 1}, 'ms_geo': {'200': 5}})
+        self.assertEqual(mine.values, [1.0, 2.0])
+        self.assertEqual(mine.unit, 'ms')
+        self.assertEqual(mine.extra, 3)
+
+    def test_merges_aggregators(self):
+        mine, theirs = LogsterParser(), LogsterParser()
+        mine.responses = KeyedAggregator()
+        mine.responses.add('ms_os', '200', 2.0)
+        theirs.responses = KeyedAggregator()
+        theirs.responses.add('ms_os', '200', 4.0)
+        theirs.responses.add('ms_geo', '404', 1.0)
+        mine.merge(theirs)
+        self.assertEqual(list(mine.responses.items()),
+                         [('ms_os', '200', 2, 6.0, 2.0, 4.0), ('ms_geo', '404', 1, 1.0, 1.0, 1.0)])
+
+    def test_merge_ignore(self):
+        class Levels(LogsterParser):
+            merge_ignore = ('levels',)
+        mine, theirs = Levels(), Levels()
+        mine.levels = theirs.levels = ['WARN']
+        mine.merge(theirs)
+        self.assertEqual(mine.levels, ['WARN'])
+
+    def test_group_merges_each_parser(self):
+        mine = LogsterParserGroup([WordCounter('foo'), WordCounter('bar')])
+        theirs = LogsterParserGroup([WordCounter('foo'), WordCounter('bar')])
+        theirs.parsers[1].count = 4
+        mine.merge(theirs)
+        self.assertEqual([p.count for p in mine.parsers], [0, 4])
+
+
+class TestKeyedAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.aggregator = KeyedAggregator()
+        for series, code, value in [('ms_os', '200', 3.0), ('ms_os', '200', 1.0), ('ms_os', '500', 10.0),
+                                    ('ms_geo', '200', 5.0)]:
+            self.aggregator.add(series, code, value)
+
+    def test_add(self):
+        self.assertEqual(len(self.aggregator), 3)
+        self.assertTrue(('ms_os', '500') in self.aggregator)
+        self.assertEqual(self.aggregator.count('ms_os', '200'), 2)
+        self.assertEqual(self.aggregator.count('ms_os', '404'), 0)
+        self.assertEqual(self.aggregator.mean('ms_os', '200'), 2.0)
+        self.assertEqual(self.aggregator.mean('ms_os', '404'), None)
+        self.assertEqual(list(self.aggregator.items())[0], ('ms_os', '200', 2, 4.0, 1.0, 3.0))
+
+    def test_metrics(self):
+        metrics = [(m.name, m.value, m.units) for m in self.aggregator.metrics(RESPONSE_STATS)]
+        self.assertEqual(metrics, [
+            ('ms_os_count.200', 2, 'Responses per minute'),
+            ('ms_os_response.200', 2.0, 'Avg Response Time per minute'),
+            ('ms_os_count.500', 1, 'Responses per minute'),
+            ('ms_os_response.500', 10.0, 'Avg Response Time per minute'),
+            ('ms_geo_count.200', 1, 'Responses per minute'),
+            ('ms_geo_response.200', 5.0, 'Avg Response Time per minute'),
+        ])
+
+    def test_labels(self):
+        stats = [('max', '%(series)s_max.%(code)s', 'Max %(label)s')]
+        metrics = self.aggregator.metrics(stats, {'ms_os': 'OS maps', 'ms_geo': 'Geology maps'})
+        self.assertEqual([(m.name, m.value, m.units) for m in metrics], [
+            ('ms_os_max.200', 3.0, 'Max OS maps'),
+            ('ms_os_max.500', 10.0, 'Max OS maps'),
+            ('ms_geo_max.200', 5.0, 'Max Geology maps'),
+        ])
+
+    def test_stats_by_series(self):
+        stats = {'ms_os': [('count', '%(series)s_count.%(code)s', 'OS maps')],
+                 'ms_geo': [('max', '%(series)s_max.%(code)s', 'Geology maps'), ('p50', 'none', 'none')]}
+        self.assertEqual([(m.name, m.value, m.units) for m in self.aggregator.metrics(stats)], [
+            ('ms_os_count.200', 2, 'OS maps'),
+            ('ms_os_count.500', 1, 'OS maps'),
+            ('ms_geo_max.200', 5.0, 'Geology maps'),
+        ])
+
+    def test_pickle(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(self.aggregator, protocol))
+            self.assertEqual(list(copy.items()), list(self.aggregator.items()))
+            copy.add('ms_os', '200', 0.5)
+            self.assertEqual(copy.count('ms_os', '200'), 3)
+
+
+class TestLatencyBuckets(unittest.TestCase):
+
+    def setUp(self):
+        self.buckets = LatencyBuckets()
+
+    def test_index(self):
+        self.assertEqual(len(self.buckets), 18)
+        self.assertEqual(self.buckets.labels[:3] + self.buckets.labels[-2:], ['1', '2', '4', '65536', 'inf'])
+        for value, index in [(0, 0), (1, 0), (1.5, 1), (2, 1), (2.1, 2), (8, 3), (1000, 10), (65536, 16), (1e9, 17)]:
+            self.assertEqual(self.buckets.index(value), index, value)
+        for index, bound in enumerate(self.buckets.bounds[:-1]):
+            self.assertEqual(self.buckets.index(bound), index)
+
+    def test_percentile(self):
+        aggregator = KeyedAggregator(self.buckets)
+        for value in range(1, 1001):
+            aggregator.add('tc_os', '200', float(value))
+        self.assertEqual(aggregator.histogram('tc_os', '200')[:4].tolist(), [1, 1, 2, 4])
+        for percentile, exact in [(50, 500), (95, 950), (99, 990)]:
+            estimate = aggregator.percentile('tc_os', '200', percentile)
+            self.assertTrue(abs(estimate - exact) < exact * 0.1, (percentile, estimate))
+        self.assertEqual(aggregator.percentile('tc_os', '200', 100), 1000)
+        self.assertEqual(aggregator.percentile('tc_os', '404', 50), None)
+
+    def test_metrics(self):
+        aggregator = KeyedAggregator(self.buckets)
+        aggregator.add('tc_os', '200', 3.0)
+        aggregator.add('tc_os', '200', 3.0)
+        metrics = dict((m.name, m.value) for m in aggregator.metrics(RESPONSE_STATS + HISTOGRAM_STATS))
+        self.assertEqual(len(metrics), 2 + 3 + 18)
+        self.assertEqual((metrics['tc_os_response_p50.200'], metrics['tc_os_response_p99.200']), (3.0, 3.0))
+        self.assertEqual((metrics['tc_os_response_le_4.200'], metrics['tc_os_response_le_inf.200']), (2, 0))
+        plain = KeyedAggregator()
+        plain.add('tc_os', '200', 3.0)
+        self.assertEqual(len(plain.metrics(RESPONSE_STATS + HISTOGRAM_STATS)), 2)
+
+    def test_merge(self):
+        mine, theirs = KeyedAggregator(LatencyBuckets()), KeyedAggregator(LatencyBuckets())
+        mine.add('tc_os', '200', 1.0)
+        theirs.add('tc_geo', '200', 100.0)
+        theirs.add('tc_os', '200', 100.0)
+        mine.merge(theirs)
+        self.assertEqual(mine.histogram('tc_os', '200')[:8].tolist(), [1, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(sum(mine.histogram('tc_geo', '200')), 1)
+        self.assertRaises(ValueError, mine.merge, KeyedAggregator())
+        copy = pickle.loads(pickle.dumps(mine))
+        self.assertEqual(copy.histogram('tc_os', '200'), mine.histogram('tc_os', '200'))
+
+    def test_response_aggregator(self):
+        self.assertEqual(response_aggregator().buckets, None)
+        self.assertEqual(response_aggregator('--histogram').buckets, LatencyBuckets())
+        optparser = optparse.OptionParser()
+        optparser.add_option('--routes', dest='routes')
+        response_options(optparser)
+        opts, args = optparser.parse_args(['--routes', 'a.ini', '--max-series', '5'])
+        self.assertEqual(response_aggregator(opts=opts).guard.max_series, 5)
+
+    def test_parser_option(self):
+        from logster.parsers.DMTileLogster import DMTileLogster
+        line = 'dm-tile 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "GET /os/tilecache.py?x=1 HTTP/1.1" 200 10 Response: 5000\n'
+        parser = DMTileLogster('--histogram')
+        parser.parse_line(line)
+        names = [m.name for m in parser.get_state(60)]
+        self.assertEqual(names[:5], ['tc_os_count.200', 'tc_os_response.200', 'tc_os_response_p50.200',
+                                     'tc_os_response_p95.200', 'tc_os_response_p99.200'])
+        self.assertTrue('tc_os_response_le_8.200' in names)
+
+
+class TestSeriesGuard(unittest.TestCase):
+
+    def test_space_saving(self):
+        guard = SeriesGuard(2)
+        for series in ['os', 'os', 'os', 'geo', 'spam1']:
+            dropped = guard.hit(series)
+        self.assertEqual(dropped, 'geo')
+        self.assertEqual(guard.hits, {'os': 3, 'spam1': 2})
+        self.assertEqual(guard.hit('spam2'), 'spam1')
+        self.assertEqual(guard.hit('other'), None)
+        self.assertEqual((len(guard), guard.dropped), (2, 2))
+        self.assertTrue('os' in guard)
+        self.assertEqual([(m.name, m.value) for m in guard.metrics()], [('dropped_series', 2)])
+        self.assertRaises(ValueError, SeriesGuard, 0)
+
+    def test_heavy_hitters_survive_a_flood(self):
+        guard = SeriesGuard(10)
+        for i in range(10000):
+            guard.hit('os' if i % 5 == 0 else 'spam%d' % i)
+        self.assertTrue('os' in guard)
+        self.assertEqual(len(guard), 10)
+
+    def test_merge_and_trim(self):
+        mine, theirs = SeriesGuard(2), SeriesGuard(2)
+        for series in ['os', 'os', 'geo']:
+            mine.hit(series)
+        for series in ['os', 'marine', 'marine']:
+            theirs.hit(series)
+        mine.merge(theirs)
+        self.assertEqual(mine.trim(), ['geo'])
+        self.assertEqual((mine.hits, mine.dropped), ({'os': 3, 'marine': 2}, 1))
+        self.assertEqual(mine.trim(), [])
+
+    def test_fold(self):
+        guard = SeriesGuard(1)
+        state = {'geo': {'200': 2}, 'other': {'200': 1, '404': 1}}
+        guard.fold(state, 'geo')
+        guard.fold(state, 'marine')
+        self.assertEqual(state, {'other': {'200': 3, '404': 1}})
+
+    def test_aggregator(self):
+        aggregator = KeyedAggregator(LatencyBuckets(), max_series=2)
+        for series, code in [('os', '200'), ('os', '200'), ('os', '404'), ('geo', '200'), ('spam', '500'),
+                             ('spam2', '200')]:
+            aggregator.add(series, code, 3.0)
+        self.assertEqual(sorted((series, code, count) for series, code, count, total, lo, hi in aggregator.items()),
+                         [('os', '200', 2), ('os', '404', 1), ('other', '200', 1), ('other', '500', 1),
+                          ('spam2', '200', 1)])
+        self.assertEqual(sum(aggregator.histogram('other', '500')), 1)
+        metrics = aggregator.metrics(RESPONSE_STATS)
+        self.assertEqual((metrics[-1].name, metrics[-1].value), ('dropped_series', 2))
+        # Slots left by dropped series are used again.
+        self.assertEqual(len(aggregator.keys), 5)
+
+    def test_fold_into_itself(self):
+        aggregator = KeyedAggregator()
+        aggregator.add('other', '200', 1.0)
+        aggregator.fold('other', 'other')
+        self.assertEqual(aggregator.count('other', '200'), 1)
+
+    def test_aggregator_groups(self):
+        aggregator = KeyedAggregator(max_series=1)
+        for series in [('ms', 'os'), ('ms', 'os'), ('ms', 'other'), ('clive', 'geo'), ('ms', 'marine')]:
+            aggregator.add(series, '200')
+        aggregator.add(('web', 'prints'), '200', guard=False)
+        self.assertEqual(sorted((series, count) for series, code, count, total, lo, hi in aggregator.items()),
+                         [(('clive', 'other'), 1), (('ms', 'marine'), 1), (('ms', 'other'), 3),
+                          (('web', 'prints'), 1)])
+
+    def test_aggregator_merge(self):
+        mine, theirs = KeyedAggregator(max_series=2), KeyedAggregator(max_series=2)
+        for series in ['os', 'os', 'geo']:
+            mine.add(series, '200', 1.0)
+        for series in ['os', 'marine', 'marine']:
+            theirs.add(series, '200', 2.0)
+        mine = pickle.loads(pickle.dumps(mine))
+        mine.merge(theirs)
+        self.assertEqual(sorted((series, count, total) for series, code, count, total, lo, hi in mine.items()),
+                         [('marine', 2, 4.0), ('os', 3, 4.0), ('other', 1, 1.0)])
+
+    def test_parsers(self):
+        from logster.parsers.ApacheLogster import ApacheLogster
+        from logster.parsers.MetricLogster import MetricLogster
+        apache = ApacheLogster('--max-series 2')
+        for host in ['dm-web', 'dm-web', 'dm-evil1', 'dm-evil2']:
+            apache.parse_line('%s 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 200 10\n' % host)
+        self.assertEqual(sorted((m.name, m.value) for m in apache.get_state(60)),
+                         [('ApacheLogster.dropped_series', 1), ('dm-evil2.requests_count.200', 1),
+                          ('dm-web.requests_count.200', 2), ('other.requests_count.200', 1)])
+        metric = MetricLogster('--max-series 2')
+        for name in ['render', 'render', 'junk1', 'junk2']:
+            metric.parse_line('METRIC_TIME metric=%s value=5 ms\n' % name)
+            metric.parse_line('METRIC_COUNT metric=%s value=1 \n' % name)
+        self.assertEqual(sorted(metric.times), ['junk2', 'other', 'render'])
+        self.assertEqual(metric.counts, {'render': 2.0, 'junk2': 1.0, 'other': 1.0})
+        self.assertEqual(len(metric.times['other']['values']), 1)
+
+    def test_group(self):
+        from logster.parsers.ApacheLogster import ApacheLogster
+        from logster.parsers.DMMapProxyLogster import DMMapProxyLogster
+        from logster.parsers.DMTileLogster import DMTileLogster
+        group = create_parser([DMTileLogster, DMMapProxyLogster, ApacheLogster], '--max-series 2')
+        names = [m.name for m in group.get_state(60) if m.name.endswith('dropped_series')]
+        self.assertEqual(names, ['DMTileLogster.dropped_series', 'DMMapProxyLogster.dropped_series',
+                                 'ApacheLogster.dropped_series'])
+
+
+class TestSkippedLines(unittest.TestCase):
+
+    def test_group_skips_only_if_every_parser_does(self):
+        class Picky(LogsterParser):
+            def __init__(self, word):
+                self.word = word
+
+            def parse_line(self, line):
+                if self.word not in line:
+                    return False
+
+        group = LogsterParserGroup([Picky('foo'), Picky('bar')])
+        self.assertEqual(group.parse_line('foo\n'), None)
+        self.assertEqual(group.parse_line('baz\n'), False)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_timestamp_is_time_of_creation(self):
+        before = int(time.time())
+        metric = MetricObject('a', 1)
+        self.assertTrue(before <= metric.timestamp <= time.time())
+        self.assertEqual(MetricObject('a', 1, timestamp=100).timestamp, 100)
+        self.assertRaises(AttributeError, setattr, metric, 'extra', 1)
+
+    def test_pickle(self):
+        metric = MetricObject('a', 1, 'Lines', timestamp=100)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(metric, protocol)), metric)
+
+    def test_batch(self):
+        metrics = [MetricObject('a', 1, timestamp=100), MetricObject('b', 2.5, 'Bytes', timestamp=101)]
+        batch = MetricBatch(metrics)
+        batch.append('c', 3, timestamp=102)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(list(batch)[:2], metrics)
+        self.assertEqual(batch.units, ['', 'Bytes', ''])
+        self.assertTrue(MetricBatch.of(batch) is batch)
+
+        names = batch.published_names('web', 'prod', '_')
+        self.assertEqual(names, ['web_a_prod', 'web_b_prod', 'web_c_prod'])
+        self.assertTrue(batch.published_names('web', 'prod', '_') is names)
+        self.assertEqual(batch.names, ['a', 'b', 'c'])
+
+        self.assertEqual(batch.format('%s %s %s\n', (batch.names, batch.values, batch.timestamps)),
+                         'a 1 100\nb 2.5 101\nc 3 102\n')
+        self.assertEqual(MetricBatch().format('%s\n', ([],)), '')
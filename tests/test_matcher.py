@@ -0,0 +1,107 @@
+from logster.logster_helper import LogsterParser, DERIVE_LITERALS
+from logster.matcher import Matcher
+from logster.prefilter import Prefilter
+from logster.profiler import instrument_patterns, restore_patterns
+import pickle
+import re
+import unittest
+
+
+class PageParser(LogsterParser):
+    literals = DERIVE_LITERALS
+
+    def __init__(self):
+        self.matcher = Matcher([
+            ('login', r'.*GET /login.* (?P<code>\d+) .*'),
+            ('print', r'.*POST /print.* (?P<code>\d+) \d+ Response: (?P<response>\d+).*'),
+        ])
+        self.rules = {}
+
+    def parse_line(self, line):
+        match = self.matcher.match(line)
+        if match is None:
+            return False
+        rule, linebits = match
+        self.rules[rule] = self.rules.get(rule, 0) + 1
+
+
+class TestMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = Matcher([
+            ('login', r'.*GET /login.* (?P<code>\d+) .*'),
+            ('any', r'.*GET (?P<path>\S+) .* (?P<code>\d+) .*'),
+            ('print', r'.*POST /print.* (?P<code>\d+) \d+ Response: (?P<response>\d+).*'),
+        ])
+
+    def test_groups_of_matching_rule(self):
+        self.assertEqual(self.matcher.match('1.2.3.4 "POST /print HTTP/1.1" 500 10 Response: 42\n'),
+                         ('print', {'code': '500', 'response': '42'}))
+        self.assertEqual(self.matcher.match('1.2.3.4 "GET /maps HTTP/1.1" 404 10\n'),
+                         ('any', {'path': '/maps', 'code': '404'}))
+
+    def test_first_rule_wins(self):
+        self.assertEqual(self.matcher.match('1.2.3.4 "GET /login HTTP/1.1" 302 10\n'),
+                         ('login', {'code': '302'}))
+
+    def test_same_as_trying_rules_in_turn(self):
+        lines = [
+            '1.2.3.4 "GET /login HTTP/1.1" 200 10\n',
+            '1.2.3.4 "GET /login?next=/print HTTP/1.1" 200 10\n',
+            '1.2.3.4 "POST /print HTTP/1.1" 200 10 Response: 5\n',
+            '1.2.3.4 "POST /login HTTP/1.1" 200 10\n',
+            'garbage\n',
+        ]
+        for line in lines:
+            expected = None
+            for name, compiled in self.matcher.rules:
+                match = compiled.match(line)
+                if match:
+                    expected = (name, match.groupdict())
+                    break
+            self.assertEqual(self.matcher.match(line), expected)
+
+    def test_no_match(self):
+        self.assertEqual(self.matcher.match('1.2.3.4 "DELETE /maps HTTP/1.1" 200 10\n'), None)
+
+    def test_flags(self):
+        matcher = Matcher([('map', r'.*mapserv.*map=(?P<map>\w+)')], re.IGNORECASE)
+        self.assertEqual(matcher.match('GET /cgi-bin/MAPSERV?MAP=os'), ('map', {'map': 'os'}))
+
+    def test_named_back_reference(self):
+        matcher = Matcher([('twice', r'(?P<word>\w+) (?P=word)'), ('other', r'(?P<word>\w+)')])
+        self.assertEqual(matcher.match('yes yes'), ('twice', {'word': 'yes'}))
+        self.assertEqual(matcher.match('yes no'), ('other', {'word': 'yes'}))
+
+    def test_numbered_back_reference(self):
+        self.assertRaises(ValueError, Matcher, [('twice', r'(\w+) \1')])
+
+    def test_invalid_rule(self):
+        self.assertRaises(re.error, Matcher, [('ok', r'a'), ('broken', r'(a')])
+
+    def test_pickle(self):
+        matcher = pickle.loads(pickle.dumps(self.matcher))
+        self.assertEqual(matcher.match('1.2.3.4 "GET /login HTTP/1.1" 302 10\n'),
+                         ('login', {'code': '302'}))
+
+
+class TestMatcherParsers(unittest.TestCase):
+
+    def test_prefilter_literals(self):
+        self.assertEqual(Prefilter.for_parser(PageParser()).literals, ('GET /login', 'POST /print'))
+
+    def test_profiled_matcher(self):
+        parser = PageParser()
+        replaced = instrument_patterns(parser)
+        self.assertEqual([profiled.name for owner, name, profiled in replaced], ['PageParser.matcher'])
+        parser.parse_line('1.2.3.4 "GET /login HTTP/1.1" 200 10\n')
+        parser.parse_line('garbage\n')
+        profiled = replaced[0][2]
+        self.assertEqual((profiled.calls, profiled.matches), (2, 1))
+        restore_patterns(replaced)
+        self.assertTrue(parser.matcher.regex is profiled.compiled)
+        self.assertEqual(parser.rules, {'login': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
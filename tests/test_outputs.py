@@ -0,0 +1,168 @@
+import os
+import pickle
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+from logster.logster_helper import MetricObject
+from logster.outputs import GangliaSink, GraphiteSink, StdoutSink, MetricSink
+from logster.outputs import read_gmond_channel, send_all
+
+
+class TestMetricNames(unittest.TestCase):
+
+    def test_prefix_and_suffix_leave_metric_alone(self):
+        metric = MetricObject('requests', 1)
+        stdout = StdoutSink(prefix='web', suffix='prod')
+        graphite = GraphiteSink('localhost:2003', prefix='web', suffix='prod')
+        self.assertEqual(stdout.metric_name(metric), 'web_requests_prod')
+        self.assertEqual(graphite.metric_name(metric), 'web.requests.prod')
+        self.assertEqual(metric.name, 'requests')
+
+    def test_invalid_host(self):
+        self.assertRaises(ValueError, GraphiteSink, 'localhost')
+
+
+class TestGraphiteSink(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.host = '127.0.0.1:%s' % self.server.getsockname()[1]
+        self.metrics = [MetricObject('a', 1, timestamp=100), MetricObject('b', 2.5, timestamp=100)]
+
+    def tearDown(self):
+        self.server.close()
+
+    def receive(self, conn, length):
+        data = b''
+        while len(data) < length:
+            data += conn.recv(length - len(data))
+        return data
+
+    def test_plaintext_batch_on_one_connection(self):
+        sink = GraphiteSink(self.host, prefix='p')
+        sink.send(self.metrics)
+        conn = self.server.accept()[0]
+        expected = b'p.a 1 100\np.b 2.5 100\n'
+        self.assertEqual(self.receive(conn, len(expected)), expected)
+        sink.send(self.metrics[:1])
+        self.assertEqual(self.receive(conn, 10), b'p.a 1 100\n')
+        sink.close()
+        conn.close()
+
+    def test_pickle(self):
+        sink = GraphiteSink(self.host, protocol='pickle')
+        sink.send(self.metrics)
+        conn = self.server.accept()[0]
+        length = struct.unpack('!L', self.receive(conn, 4))[0]
+        payload = pickle.loads(self.receive(conn, length))
+        self.assertEqual(payload, [('a', (100, 1)), ('b', (100, 2.5))])
+        sink.close()
+        conn.close()
+
+    def test_backs_off_after_failure(self):
+        self.server.close()
+        sink = GraphiteSink(self.host, timeout=1)
+        self.assertRaises(socket.error, sink.send, self.metrics)
+        self.assertEqual(sink.backoff, 1.0)
+        self.assertRaises(socket.error, sink.send, self.metrics)
+        self.assertEqual(sink.backoff, 1.0)
+
+
+class TestGangliaSink(unittest.TestCase):
+
+    def unpack_string(self, data, position):
+        length = struct.unpack('>I', data[position:position + 4])[0]
+        value = data[position + 4:position + 4 + length].decode('utf-8')
+        return value, position + 4 + length + (-length % 4)
+
+    def test_sends_metadata_and_value_packets(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        sink = GangliaSink.from_gmetric_options('-d 180 -g web', host='127.0.0.1:%s' % server.getsockname()[1],
+                                                prefix='p')
+        sink.send([MetricObject('ms_os_count.200', 12, 'Responses per minute')])
+        meta = server.recv(1024)
+        value = server.recv(1024)
+        sink.close()
+        server.close()
+
+        self.assertEqual(struct.unpack('>i', meta[:4])[0], 128)
+        hostname, position = self.unpack_string(meta, 4)
+        name, position = self.unpack_string(meta, position)
+        self.assertEqual(name, 'p_ms_os_count.200')
+        position += 4
+        metric_type, position = self.unpack_string(meta, position)
+        self.assertEqual(metric_type, 'float')
+        position = self.unpack_string(meta, position)[1]
+        units, position = self.unpack_string(meta, position)
+        self.assertEqual(units, 'Responses per minute')
+        self.assertEqual(struct.unpack('>iIIi', meta[position:position + 16]), (3, 60, 180, 1))
+        self.assertEqual(self.unpack_string(meta, position + 16)[0], 'GROUP')
+
+        self.assertEqual(struct.unpack('>i', value[:4])[0], 133)
+        position = self.unpack_string(value, 4)[1]
+        name, position = self.unpack_string(value, position)
+        self.assertEqual(name, 'p_ms_os_count.200')
+        position = self.unpack_string(value, position + 4)[1]
+        self.assertEqual(self.unpack_string(value, position)[0], '12')
+
+    def test_read_gmond_channel(self):
+        fd, conf = tempfile.mkstemp()
+        os.write(fd, b"""
+udp_send_channel {
+  #mcast_join = 239.2.11.71
+  host = gmond.example.com
+  port = 8650
+  ttl = 1
+}
+""")
+        os.close(fd)
+        try:
+            self.assertEqual(read_gmond_channel(conf), ('gmond.example.com', 8650, False))
+        finally:
+            os.unlink(conf)
+
+
+class RecordingSink(MetricSink):
+    def __init__(self, name, error=None, block=None, **kwargs):
+        MetricSink.__init__(self, **kwargs)
+        self.name = name
+        self.error = error
+        self.block = block
+        self.received = []
+
+    def send(self, metrics):
+        if self.block is not None:
+            self.block.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.received.extend(metrics)
+
+
+class TestSendAll(unittest.TestCase):
+
+    def test_failures_are_isolated(self):
+        release = threading.Event()
+        good = RecordingSink('good')
+        broken = RecordingSink('broken', error=IOError('refused'))
+        hung = RecordingSink('hung', block=release, deadline=0.1)
+        metrics = [MetricObject('a', 1)]
+        try:
+            results = send_all([hung, broken, good], metrics)
+            self.assertEqual([r.ok for r in results], [False, False, True])
+            self.assertTrue('timed out' in str(results[0]))
+            self.assertTrue('refused' in str(results[1]))
+            self.assertEqual(good.received, metrics)
+
+            # The hung sink is skipped until its earlier send finishes.
+            results = send_all([hung], metrics)
+            self.assertTrue('busy' in str(results[0]))
+        finally:
+            release.set()
+        hung.sending.join()
+        self.assertTrue(send_all([hung], metrics)[0].ok)
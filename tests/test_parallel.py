@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from logster.budget import ReadBudget
+from logster.logster_helper import LogsterParser, MetricObject
+from logster.parallel import parse_parallel
+from logster.tailer import LogTailer
+
+
+class CodeCounter(LogsterParser):
+    """Counts lines per code, the same shape as the DM parsers' state."""
+    def __init__(self, option_string=None):
+        self.codes = {}
+        self.lines = 0
+
+    def parse_line(self, line):
+        code = line.split()[-1]
+        self.codes[code] = self.codes.get(code, 0) + 1
+        self.lines += 1
+
+    def get_state(self, duration):
+        return [MetricObject('count.' + code, count) for code, count in self.codes.items()]
+
+
+class TestParseParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.state_file = os.path.join(self.dir, 'access_log.state')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_serial_parse(self):
+        f = open(self.log_file, 'w')
+        for i in range(5000):
+            f.write('GET /%s %s\n' % (i, (200, 404, 500)[i % 3]))
+        f.write('GET /partial')
+        f.close()
+
+        tailer = LogTailer(self.log_file, self.state_file, block_size=4096)
+        parser = CodeCounter()
+        parse_parallel(parser, [CodeCounter], None, tailer, tailer.open(), 3)
+        self.assertEqual(parser.lines, 5000)
+        self.assertEqual(parser.codes, {'200': 1667, '404': 1667, '500': 1666})
+        self.assertEqual(tailer.offset, os.path.getsize(self.log_file) - len('GET /partial'))
+
+    def test_byte_budget(self):
+        f = open(self.log_file, 'w')
+        for i in range(1000):
+            f.write('GET /%03d 200\n' % i)
+        f.close()
+
+        tailer = LogTailer(self.log_file, self.state_file, block_size=4096)
+        parser = CodeCounter()
+        budget = ReadBudget(max_bytes=3000)
+        parse_parallel(parser, [CodeCounter], None, tailer, tailer.open(), 3, budget=budget)
+        self.assertTrue(budget.exhausted)
+        self.assertEqual(parser.lines, 230)
+        self.assertEqual(tailer.offset, 230 * 13)
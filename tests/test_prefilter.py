@@ -0,0 +1,104 @@
+from logster.logster_helper import LogsterParser, LogsterParserGroup, DERIVE_LITERALS, parse_lines
+from logster.prefilter import Prefilter, pattern_literals
+from logster.run_stats import RunStats
+import re
+import unittest
+
+
+class MapParser(LogsterParser):
+    literals = DERIVE_LITERALS
+
+    def __init__(self):
+        self.reg = re.compile(r'.*mapserv.*map=(?P<map>\w+).* (?P<code>\d+) \d+ Response: (?P<response>\d+).*',
+                              re.IGNORECASE)
+        self.tile_reg = re.compile(r'.*/(?P<cache>\w+)/tilecache.py.* (?P<code>\d+) .*')
+        self.lines = []
+
+    def parse_line(self, line):
+        if self.reg.match(line) or self.tile_reg.match(line):
+            self.lines.append(line)
+        else:
+            return False
+
+
+class LoginParser(LogsterParser):
+    literals = ('GET /login',)
+
+    def __init__(self):
+        self.lines = []
+
+    def parse_line(self, line):
+        self.lines.append(line)
+
+
+class TestPatternLiterals(unittest.TestCase):
+
+    def test_first_literal_of_pattern(self):
+        self.assertEqual(pattern_literals(re.compile(r'.*/(\w+)/tilecache.py.* (\d+) \d+ Response: (\d+)')),
+                         ['/tilecache'])
+        self.assertEqual(pattern_literals(re.compile(r'.*METRIC_COUNT\smetric=(?P<name>\S+)')), ['METRIC_COUNT'])
+
+    def test_case_insensitive(self):
+        self.assertEqual(pattern_literals(re.compile(r'.*MapServ.*', re.IGNORECASE)), ['mapserv'])
+
+    def test_alternatives(self):
+        self.assertEqual(pattern_literals(re.compile(r'[0-9:.]+ (WARN|ERROR|FATAL)')), ['WARN', 'ERROR', 'FATAL'])
+        self.assertEqual(pattern_literals(re.compile(r'(abc)?x.*(y|zzz)')), None)
+
+    def test_short_literals(self):
+        self.assertEqual(pattern_literals(re.compile(r'^\[[^]]+\] \[(\w+)\] .*')), ['] ['])
+        self.assertEqual(pattern_literals(re.compile(r'^(\w+) (\d+) .*')), None)
+
+
+class TestPrefilter(unittest.TestCase):
+
+    lines = [
+        'dm-map 1.2.3.4 "GET /cgi-bin/MAPSERV?map=os HTTP/1.1" 200 10 Response: 5\n',
+        'dm-map 1.2.3.4 "GET /os/tilecache.py?x=1 HTTP/1.1" 304 0 Response: 2\n',
+        'dm-map 1.2.3.4 "GET /login HTTP/1.1" 200 10 Response: 3\n',
+        'dm-map 1.2.3.4 "GET /images/logo.png HTTP/1.1" 200 10 Response: 1\n',
+    ]
+
+    def test_derived(self):
+        prefilter = MapParser().get_prefilter()
+        self.assertEqual(sorted(prefilter.literals), ['/tilecache', 'mapserv'])
+        self.assertEqual([prefilter.accepts(line) for line in self.lines], [True, True, False, False])
+        self.assertEqual(list(prefilter.filter(self.lines)), self.lines[:2])
+
+    def test_declared(self):
+        prefilter = LoginParser().get_prefilter()
+        self.assertEqual(list(prefilter.filter(self.lines)), self.lines[2:3])
+        self.assertEqual(LogsterParser().get_prefilter(), None)
+
+    def test_declared_ignoring_case(self):
+        parser = LoginParser()
+        parser.literals_ignore_case = True
+        prefilter = parser.get_prefilter()
+        self.assertTrue(prefilter.accepts('1.2.3.4 "get /LOGIN HTTP/1.1" 200\n'))
+        self.assertFalse(LoginParser().get_prefilter().accepts('1.2.3.4 "get /LOGIN HTTP/1.1" 200\n'))
+
+    def test_same_lines_parsed(self):
+        parser = MapParser()
+        parse_lines(parser, self.lines)
+        unfiltered = MapParser()
+        for line in self.lines:
+            unfiltered.parse_line(line)
+        self.assertEqual(parser.lines, unfiltered.lines)
+
+    def test_group(self):
+        maps, logins = MapParser(), LoginParser()
+        group = LogsterParserGroup([maps, logins])
+        self.assertEqual(sorted(group.get_prefilter().literals), ['/tilecache', 'get /login', 'mapserv'])
+        parse_lines(group, self.lines)
+        self.assertEqual(maps.lines, self.lines[:2])
+        self.assertEqual(logins.lines, self.lines[2:3])
+        self.assertEqual(LogsterParserGroup([maps, LogsterParser()]).get_prefilter(), None)
+
+    def test_counted_as_skipped(self):
+        stats = RunStats()
+        stats.parse_lines(MapParser(), self.lines)
+        self.assertEqual((stats.lines_read, stats.lines_matched, stats.lines_skipped), (4, 2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from logster.logster_helper import LogsterParser, LogsterParserGroup, parse_lines
+from logster.profiler import ParseProfiler, ProfiledPattern
+
+
+class TwoPatterns(LogsterParser):
+    def __init__(self):
+        self.get = re.compile(r'GET (?P<path>\S+)')
+        self.post = re.compile('POST')
+        self.gets = []
+
+    def parse_line(self, line):
+        match = self.get.match(line)
+        if match:
+            self.gets.append(match.group('path'))
+        elif not self.post.match(line):
+            return False
+
+
+class TestParseProfiler(unittest.TestCase):
+
+    def test_patterns_are_timed_and_restored(self):
+        parser = TwoPatterns()
+        group = LogsterParserGroup([parser])
+        profiler = ParseProfiler(group)
+        profiler.runcall(parse_lines, group, ['GET /a\n', 'POST /b\n', 'HEAD /c\n', 'GET /d\n'])
+
+        self.assertEqual(parser.gets, ['/a', '/d'])
+        self.assertFalse(isinstance(parser.get, ProfiledPattern))
+        patterns = dict((p.name, (p.calls, p.matches)) for p in profiler.patterns)
+        self.assertEqual(patterns, {'TwoPatterns.get': (4, 2), 'TwoPatterns.post': (2, 1)})
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'profile')
+            profiler.save(path)
+            report = open(path + '.txt').read()
+            self.assertTrue('TwoPatterns.get' in report)
+            self.assertTrue(os.path.exists(path + '.prof'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_route_patterns(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        parser = DMMapLogster()
+        profiler = ParseProfiler(parser)
+        lines = ['h 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "%s HTTP/1.1" 200 10 Response: 2000\n' % request
+                 for request in ('GET /mapserv?map=mapfiles/os/base.map', 'GET /clive/clive?product=OS&x=1',
+                                 'POST /clive/clive?log=OS&x=1')]
+        profiler.runcall(parse_lines, parser, lines)
+
+        self.assertTrue(parser.routes[0].search is not None)
+        self.assertFalse(isinstance(parser.routes[0].search, ProfiledPattern))
+        patterns = dict((p.name, (p.calls, p.matches)) for p in profiler.patterns)
+        self.assertEqual(patterns, {'DMMapLogster.routes[ms_%(key)s].search': (1, 1),
+                                    'DMMapLogster.routes[clive_%(key)s_map].search': (0, 0),
+                                    'DMMapLogster.routes[clive_products].search': (2, 1),
+                                    'DMMapLogster.routes[clive_%(key)s_print].search': (1, 1)})
+        self.assertEqual(sorted(m.name for m in parser.get_state(60) if '_count.' in m.name),
+                         ['clive_os_print_count.200', 'ms_os_count.200'])
+
+    def test_pattern_attributes_pass_through(self):
+        pattern = re.compile(r'(?P<code>\d+)')
+        profiled = ProfiledPattern('code', pattern)
+        self.assertEqual(profiled.pattern, pattern.pattern)
+        self.assertEqual(profiled.groupindex, pattern.groupindex)
@@ -0,0 +1,47 @@
+from logster.logster_helper import LogsterParser
+from logster.registry import BUILTIN_PARSERS, ParserNotFoundError, load_parser_class
+import logster.parsers
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_builtin_parsers_listed(self):
+        directory = os.path.join(os.path.dirname(__file__), '..', 'logster', 'parsers')
+        modules = set(name[:-3] for name in os.listdir(directory)
+                      if name.endswith('Logster.py'))
+        self.assertEqual(set(BUILTIN_PARSERS), modules)
+
+    def test_external_parser(self):
+        self.assertTrue(load_parser_class('logster.logster_helper:LogsterParser') is LogsterParser)
+        self.assertTrue(load_parser_class('logster.logster_helper.LogsterParser') is LogsterParser)
+
+    def test_parser_dropped_into_parsers(self):
+        directory = tempfile.mkdtemp()
+        logster.parsers.__path__.append(directory)
+        try:
+            f = open(os.path.join(directory, 'LocalLogster.py'), 'w')
+            f.write('from logster.logster_helper import LogsterParser\n\n'
+                    'class LocalLogster(LogsterParser):\n    pass\n')
+            f.close()
+            self.assertEqual(load_parser_class('LocalLogster').__name__, 'LocalLogster')
+
+            f = open(os.path.join(directory, 'BrokenLogster.py'), 'w')
+            f.write('import no_such_module\n')
+            f.close()
+            self.assertRaises(ParserNotFoundError, load_parser_class, 'BrokenLogster')
+        finally:
+            logster.parsers.__path__.remove(directory)
+            shutil.rmtree(directory)
+
+    def test_unknown_parser(self):
+        self.assertRaises(ParserNotFoundError, load_parser_class, 'NoSuchLogster')
+        self.assertRaises(ParserNotFoundError, load_parser_class, 'logster.no_such_module:NoSuchLogster')
+        self.assertRaises(ParserNotFoundError, load_parser_class, 'logster.logster_helper:NoSuchLogster')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+from logster.access_log import parse
+from logster.logster_helper import parse_lines
+from logster.parsers.RouteLogster import RouteLogster
+from logster.routes import PrefixTrie, Route, RouteError, RouteTable, load_routes, make_routes
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+ROUTES = """
+[prints]
+prefix = /dfc/cosmo-print
+method = POST
+response = yes
+count_units = Prints per minute
+
+[clive_%(key)s_map]
+prefix = /clive/clive
+query = product
+pattern = \\w+$
+where = request=GetMap
+lower = yes
+response = yes
+"""
+
+
+def request(method, target, status='200', usec=2000):
+    return ('dm-map.edina.ac.uk 1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "%s %s HTTP/1.1" %s 10 Response: %d\n'
+            % (method, target, status, usec))
+
+
+class TestPrefixTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = PrefixTrie()
+        for prefix in ('/dfc/cosmo-print', '/dfc/', '/dfc/cosmo-my-maps', '/login', '/dfc/'):
+            self.trie.add(prefix, prefix)
+
+    def test_longest_prefix_first(self):
+        self.assertEqual(self.trie.find('/dfc/cosmo-print/pdf'),
+                         [['/dfc/cosmo-print'], ['/dfc/', '/dfc/']])
+        self.assertEqual(self.trie.find('/dfc/cosmo-my-maps'), [['/dfc/cosmo-my-maps'], ['/dfc/', '/dfc/']])
+
+    def test_no_prefix(self):
+        self.assertEqual(self.trie.find('/dfc'), [])
+        self.assertEqual(self.trie.find('/logout'), [])
+        self.assertEqual(self.trie.find(''), [])
+
+    def test_add_after_find(self):
+        self.assertEqual(self.trie.find('/login?next=/'), [['/login']])
+        self.trie.add('/log', '/log')
+        self.assertEqual(self.trie.find('/login?next=/'), [['/login'], ['/log']])
+
+
+class TestRoute(unittest.TestCase):
+
+    def test_conditions(self):
+        route = Route('/clive/clive', 'clive_%(key)s_map', query='product', pattern=r'\w+$',
+                      where='request=GetMap', lower=True)
+        self.assertEqual(route.name(parse(request('GET', '/clive/clive?PRODUCT=OS&REQUEST=getmap'))), 'clive_os_map')
+        self.assertEqual(route.name(parse(request('GET', '/clive/clive?product=OS&request=GetLegend'))), None)
+        self.assertEqual(route.name(parse(request('GET', '/clive/clive?request=GetMap'))), None)
+        self.assertEqual(route.name(parse(request('GET', '/clive/clive?product=O.S&request=GetMap'))), None)
+
+    def test_pattern_group(self):
+        route = Route('/cgi-bin/mapserv', 'ms_%(key)s', query='map', pattern=r'mapfiles(?:/|%2F)(\w+)(?:/|%2F).*\.map')
+        self.assertEqual(route.name(parse(request('GET', '/cgi-bin/mapserv?map=mapfiles%2Fos%2Fos.map'))), 'ms_os')
+
+    def test_method(self):
+        route = Route('/dfc/cosmo-print', 'prints', method='POST')
+        self.assertEqual(route.name(parse(request('POST', '/dfc/cosmo-print'))), 'prints')
+        self.assertEqual(route.name(parse(request('GET', '/dfc/cosmo-print'))), None)
+
+    def test_search(self):
+        route = Route('/clive/clive', 'clive_%(key)s_print', search=r'log=(\w+)&', lower=True)
+        self.assertEqual(route.name(parse(request('POST', '/clive/clive?LOG=Marine&format=pdf'))), 'clive_marine_print')
+        self.assertEqual(route.name(parse(request('POST', '/clive/clive?format=pdf&log=marine'))), None)
+        self.assertEqual(route.name(parse(request('POST', '/clive/clive'))), None)
+        route = Route('/clive/clive', 'clive_products', search=r'product=\w+&')
+        self.assertEqual(route.name(parse(request('GET', '/clive/clive?product=OS&x=1'))), 'clive_products')
+
+    def test_layout(self):
+        route = Route('/dfc/cosmo-print', 'prints', layout='map')
+        self.assertEqual(route.name(parse(request('POST', '/dfc/cosmo-print'))), 'prints')
+        self.assertEqual(route.name(parse(cosmo_request('POST', '/dfc/cosmo-print'))), None)
+        self.assertEqual(route.name(parse('1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "POST /dfc/cosmo-print"\n')), None)
+
+    def test_bad_routes(self):
+        self.assertRaises(RouteError, Route, '', 'prints')
+        self.assertRaises(RouteError, Route, '/a', 'prints', contains='/b')
+        self.assertRaises(RouteError, Route, '/a')
+        self.assertRaises(RouteError, Route, '/clive', 'clive_%(key)s', search=r'product=\w+&')
+        self.assertRaises(RouteError, Route, '/clive', 'clive_%(key)s')
+        self.assertRaises(RouteError, make_routes, [{'prefix': '/a', 'metric': 'a', 'colour': 'red'}])
+        self.assertRaises(RouteError, make_routes, [{'prefix': '/a', 'metric': 'a', 'query': 'a', 'pattern': '('}])
+
+
+class TestRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = RouteTable(make_routes([
+            {'prefix': '/dfc/', 'metric': 'dfc'},
+            {'contains': 'mapserv', 'ignore_case': True, 'metric': 'maps'},
+            {'prefix': '/dfc/cosmo-print', 'metric': 'prints'},
+            {'prefix': '/Login', 'ignore_case': True, 'metric': 'logins'},
+            {'contains': '/wmsMap', 'metric': 'wms'},
+        ]))
+
+    def metrics(self, path):
+        return [route.metric for index, route in self.table.lookup(path)]
+
+    def test_table_order(self):
+        self.assertEqual(self.metrics('/dfc/cosmo-print/mapserv'), ['dfc', 'maps', 'prints'])
+
+    def test_ignore_case(self):
+        self.assertEqual(self.metrics('/LOGIN'), ['logins'])
+        self.assertEqual(self.metrics('/CGI-BIN/MapServ'), ['maps'])
+        self.assertEqual(self.metrics('/DFC/cosmo-print'), [])
+
+    def test_contains(self):
+        self.assertEqual(self.metrics('/dfcmapproxy/wmsMap'), ['wms'])
+        self.assertEqual(self.metrics('/dfcmapproxy/wmsmap'), [])
+        self.assertEqual(self.table.literals(), ('/dfc/', 'mapserv', '/dfc/cosmo-print', '/Login', '/wmsMap'))
+
+    def test_cached(self):
+        self.table.CACHE_SIZE = 2
+        self.assertEqual(self.metrics('/login'), ['logins'])
+        self.assertTrue(self.table.lookup('/login') is self.table.lookup('/login'))
+        self.metrics('/dfc/')
+        self.metrics('/wmsMap')
+        self.assertEqual(list(self.table.cache), ['/wmsMap'])
+
+
+class TestRouteLogster(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.routes = os.path.join(self.dir, 'routes.ini')
+        f = open(self.routes, 'w')
+        f.write(ROUTES)
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_routes(self):
+        table = load_routes(self.routes)
+        self.assertEqual([route['metric'] for route in table], ['prints', 'clive_%(key)s_map'])
+        self.assertEqual(table[0]['response'], True)
+        self.assertRaises(RouteError, load_routes, os.path.join(self.dir, 'missing.ini'))
+
+    def test_parse(self):
+        parser = RouteLogster('--routes %s' % self.routes)
+        self.assertEqual(parser.get_prefilter().literals, ('/dfc/cosmo-print', '/clive/clive'))
+        parse_lines(parser, [
+            request('POST', '/dfc/cosmo-print', usec=1000),
+            request('POST', '/dfc/cosmo-print', usec=3000),
+            request('POST', '/dfc/cosmo-print', '500', 500),
+            request('GET', '/dfc/cosmo-print'),
+            request('GET', '/clive/clive?product=OS&request=GetMap', usec=4000),
+        ])
+        metrics = [(m.name, m.value, m.units) for m in parser.get_state(60)]
+        self.assertEqual(metrics, [
+            ('prints_count.200', 2, 'Prints per minute'),
+            ('prints_response.200', 2.0, 'Avg Response Time per minute'),
+            ('prints_count.500', 1, 'Prints per minute'),
+            ('prints_response.500', 0.5, 'Avg Response Time per minute'),
+            ('clive_os_map_count.200', 1, 'Responses per minute'),
+            ('clive_os_map_response.200', 4.0, 'Avg Response Time per minute'),
+        ])
+
+    def test_histogram(self):
+        parser = RouteLogster('--routes %s --histogram' % self.routes)
+        parse_lines(parser, [request('POST', '/dfc/cosmo-print', usec=usec) for usec in (1000, 3000, 70000000)])
+        metrics = dict((m.name, m.value) for m in parser.get_state(60))
+        self.assertEqual(metrics['prints_response_p50.200'], 3.0)
+        self.assertTrue(65536 < metrics['prints_response_p99.200'] <= 70000)
+        self.assertEqual((metrics['prints_response_le_1.200'], metrics['prints_response_le_4.200'],
+                          metrics['prints_response_le_inf.200']), (1, 1, 1))
+
+    def test_max_series(self):
+        parser = RouteLogster('--routes %s --max-series 2' % self.routes)
+        products = ['OS', 'OS', 'GEO', 'x1', 'x2']
+        parse_lines(parser, [request('GET', '/clive/clive?product=%s&request=GetMap' % product) for product in products]
+                    + [request('POST', '/dfc/cosmo-print')])
+        metrics = dict((m.name, m.value) for m in parser.get_state(60))
+        self.assertEqual(metrics['clive_os_map_count.200'], 2)
+        self.assertEqual(metrics['clive_other_map_count.200'], 2)
+        self.assertEqual(metrics['clive_x2_map_count.200'], 1)
+        self.assertEqual(metrics['prints_count.200'], 1)
+        self.assertEqual(metrics['RouteLogster.dropped_series'], 2)
+
+    def test_other_key_is_not_dropped(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        parser = DMMapLogster('--max-series 1')
+        parse_lines(parser, [request('GET', '/cgi-bin/mapserv?map=mapfiles/%s/x.map' % collection)
+                             for collection in ['other', 'other', 'other', 'zz']])
+        self.assertEqual(counts(parser, []), [('ms_other_count.200', 3), ('ms_zz_count.200', 1)])
+
+    def test_needs_routes(self):
+        self.assertRaises(RouteError, RouteLogster)
+
+    def test_merge(self):
+        parser = RouteLogster('--routes %s' % self.routes)
+        other = pickle.loads(pickle.dumps(parser))
+        parser.parse_line(request('POST', '/dfc/cosmo-print', usec=1000))
+        other.parse_line(request('POST', '/dfc/cosmo-print', usec=3000))
+        parser.merge(other)
+        self.assertEqual([(m.name, m.value) for m in parser.get_state(60)],
+                         [('prints_count.200', 2), ('prints_response.200', 2.0)])
+
+
+def cosmo_request(method, target, status='200', msec=4200):
+    return ('1.2.3.4 %d 5.6.7.8 - - [18/Oct/2026:10:00:00 +0000] "%s %s HTTP/1.1" %s 12 "-" "Mozilla/5.0"\n'
+            % (msec, method, target, status))
+
+
+def web_request(method, target, status='200', usec=31000):
+    return ('1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "%s %s HTTP/1.1" %s 99 "-" "Mozilla/5.0" %d dm-web -\n'
+            % (method, target, status, usec))
+
+
+def counts(parser, lines):
+    parse_lines(parser, lines)
+    return sorted((m.name, m.value) for m in parser.get_state(60) if '_count.' in m.name)
+
+
+class TestDigimapRoutes(unittest.TestCase):
+
+    def test_mapproxy_at_root(self):
+        from logster.parsers.DfSWebLogster import DfSWebLogster
+        from logster.parsers.DfCWebLogster import DfCWebLogster
+        lines = [cosmo_request('GET', '/dfsmapproxy/wmsMap?LAYERS=x'), cosmo_request('POST', '/dfsmapproxy/wmsMap'),
+                 cosmo_request('GET', '/dfs/dfsmapproxy/wmsMap'), cosmo_request('GET', '/dfcmapproxy/wmsMap')]
+        self.assertEqual(counts(DfSWebLogster(), lines), [('mapproxies_count.200', 3)])
+        self.assertEqual(counts(DfCWebLogster(), lines), [('mapproxies_count.200', 1)])
+
+    def test_map_paths_ignore_case(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        self.assertEqual(counts(DMMapLogster(), [
+            request('GET', '/CGI-BIN/MAPSERV?MAP=MAPFILES%2FGeo%2Fx.MAP&mode=map'),
+            request('GET', '/mapserv?map=mapfiles/os/base.map'),
+            request('GET', '/CLIVE/CLIVE?product=Geo&request=GetMap&x=1'),
+            request('GET', '/digimap/clive/clive?product=marine&request=GetMap'),
+        ]), [('clive_geo_map_count.200', 1), ('clive_marine_map_count.200', 1),
+             ('ms_Geo_count.200', 1), ('ms_os_count.200', 1)])
+
+    def test_clive_parameters_followed(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        self.assertEqual(counts(DMMapLogster(), [
+            request('GET', '/clive/clive?request=GetMap&product=OS'),
+            request('POST', '/clive/clive?format=pdf&log=MARINE'),
+            request('POST', '/clive/clive?product=OS&log=MARINE&format=pdf'),
+            request('POST', '/clive/clive?log=OS&format=pdf'),
+        ]), [('clive_os_print_count.200', 1)])
+
+    def test_other_layouts(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        from logster.parsers.DfSMapLogster import DfSMapLogster
+        from logster.parsers.DfSWebLogster import DfSWebLogster
+        from logster.parsers.DfCWebLogster import DfCWebLogster
+        requests = [('GET', '/cgi-bin/mapserv?map=mapfiles/os/base.map'),
+                    ('GET', '/clive/clive?product=OS&request=GetMap&x=1'),
+                    ('POST', '/clive/clive?log=OS&format=pdf')]
+        for parser in (DMMapLogster, DfSMapLogster):
+            self.assertEqual(counts(parser(), [layout(*r) for r in requests for layout in (cosmo_request, web_request)]),
+                             [])
+            self.assertEqual(counts(parser(), [request(*r) for r in requests]),
+                             [('clive_os_map_count.200', 1), ('clive_os_print_count.200', 1), ('ms_os_count.200', 1)])
+        for parser, site, login in ((DfSWebLogster, 'dfs', ('POST', '/submit-login')),
+                                    (DfCWebLogster, 'dfc', ('GET', '/login'))):
+            requests = [login, ('POST', '/%s/cosmo-print' % site), ('GET', '/%smapproxy/wmsMap' % site),
+                        ('POST', '/%s/cosmo-my-maps' % site), ('GET', '/%s/cosmo-get-my-map' % site)]
+            # Logins are counted whatever the layout.
+            self.assertEqual(counts(parser(), [layout(*r) for r in requests for layout in (request, web_request)]),
+                             [('logins_count.200', 2)])
+            self.assertEqual(counts(parser(), [cosmo_request(*r) for r in requests]),
+                             [('bookmarks_load_count.200', 1), ('bookmarks_save_count.200', 1),
+                              ('logins_count.200', 1), ('mapproxies_count.200', 1), ('prints_count.200', 1)])
+
+    def test_truncated_login(self):
+        from logster.parsers.DfCWebLogster import DfCWebLogster
+        parser = DfCWebLogster()
+        line = '1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "GET /login?service=dfc&ticket=' + 'x' * 1000 + '\n'
+        parser.parse_line(line)
+        self.assertEqual([(m.name, m.value) for m in parser.get_state(60)], [('logins_count.200', 1)])
+
+    def test_clive_print(self):
+        from logster.parsers.DMMapLogster import DMMapLogster
+        parser = DMMapLogster()
+        parser.parse_line(request('POST', '/clive/clive?log=MARINE&format=pdf', usec=5000))
+        self.assertEqual([(m.name, m.value) for m in parser.get_state(60)],
+                         [('clive_marine_print_count.200', 1), ('clive_marine_print_response.200', 5.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+from logster.logster_helper import LogsterParser, LogsterParsingException
+from logster.run_stats import RunStats
+from logster.tailer import decode_line
+import unittest
+
+
+class PickyParser(LogsterParser):
+    def parse_line(self, line):
+        if line.startswith('bad'):
+            raise LogsterParsingException("bad line")
+        if not line.startswith('GET'):
+            return False
+
+
+class TestRunStats(unittest.TestCase):
+
+    def test_counts(self):
+        stats = RunStats()
+        stats.parse_lines(PickyParser(), ['GET /\n', 'bad\n', 'POST /\n', 'GET /x\n'])
+        self.assertEqual((stats.lines_read, stats.lines_matched, stats.lines_skipped, stats.parse_exceptions),
+                         (4, 2, 1, 1))
+        self.assertEqual(stats.bytes_read, 24)
+
+        other = RunStats()
+        other.parse_lines(PickyParser(), ['GET /\n'])
+        stats.add(other)
+        self.assertEqual(stats.lines_matched, 3)
+
+    def test_bytes_not_characters(self):
+        stats = RunStats()
+        stats.parse_lines(PickyParser(), [decode_line(b'GET /caf\xc3\xa9\n')])
+        self.assertEqual(stats.bytes_read, 11)
+
+    def test_metrics(self):
+        stats = RunStats()
+        stats.parse_lines(PickyParser(), ['GET /\n'])
+        metrics = dict((m.name, m.value) for m in stats.get_metrics('logster.Picky'))
+        self.assertEqual(metrics['logster.Picky.lines_read'], 1)
+        self.assertEqual(metrics['logster.Picky.submit_seconds'], 0.0)
+        self.assertTrue('logster.Picky.lines_per_second' in metrics)
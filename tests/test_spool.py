@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from logster.logster_helper import MetricObject
+from logster.outputs import MetricSink, send_all
+from logster.spool import MetricSpool, SpooledSink
+
+
+class FlakySink(MetricSink):
+    name = 'flaky'
+
+    def __init__(self, fail_after=None):
+        MetricSink.__init__(self)
+        self.fail_after = fail_after
+        self.batches = []
+
+    def send(self, metrics):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise IOError('collector down')
+        self.batches.append([(m.name, m.value, m.timestamp) for m in metrics])
+
+
+class HungSink(FlakySink):
+
+    def __init__(self, release):
+        FlakySink.__init__(self)
+        self.release = release
+        self.deadline = 0.1
+
+    def send(self, metrics):
+        self.release.wait(5)
+        FlakySink.send(self, metrics)
+
+
+def batch(n):
+    return [MetricObject('m%s' % n, n, timestamp=1000 + n)]
+
+
+class TestMetricSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.spool')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_replay_in_order_and_empty_afterwards(self):
+        spool = MetricSpool(self.path)
+        for n in range(3):
+            spool.append(batch(n))
+        sink = FlakySink()
+        self.assertEqual(spool.replay(sink.send), 3)
+        self.assertEqual(sink.batches, [[('m0', 0, 1000)], [('m1', 1, 1001)], [('m2', 2, 1002)]])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(spool.replay(sink.send), 0)
+
+    def test_failed_replay_keeps_unsent_batches(self):
+        spool = MetricSpool(self.path)
+        for n in range(3):
+            spool.append(batch(n))
+        self.assertRaises(IOError, spool.replay, FlakySink(fail_after=1).send)
+        sink = FlakySink()
+        spool.replay(sink.send)
+        self.assertEqual(sink.batches, [[('m1', 1, 1001)], [('m2', 2, 1002)]])
+
+    def test_size_cap_drops_oldest(self):
+        spool = MetricSpool(self.path)
+        spool.append(batch(0))
+        record_size = os.path.getsize(self.path)
+        spool.max_bytes = record_size * 2
+        for n in range(1, 5):
+            spool.append(batch(n))
+        self.assertTrue(os.path.getsize(self.path) <= spool.max_bytes)
+        sink = FlakySink()
+        spool.replay(sink.send)
+        self.assertEqual([b[0][0] for b in sink.batches], ['m3', 'm4'])
+
+    def test_age_cap(self):
+        spool = MetricSpool(self.path, max_age=60)
+        spool.append(batch(0))
+        spool.max_age = -1
+        sink = FlakySink()
+        self.assertEqual(spool.replay(sink.send), 0)
+        self.assertEqual(sink.batches, [])
+
+
+class TestSpooledSink(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.spool = MetricSpool(os.path.join(self.dir, 'test.spool'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_failed_batch_is_sent_first_next_time(self):
+        down = SpooledSink(FlakySink(fail_after=0), self.spool)
+        self.assertRaises(IOError, down.send, batch(0))
+        up = FlakySink()
+        SpooledSink(up, self.spool).send(batch(1))
+        self.assertEqual(up.batches, [[('m0', 0, 1000)], [('m1', 1, 1001)]])
+
+    def test_busy_batch_is_spooled(self):
+        release = threading.Event()
+        hung = HungSink(release)
+        sink = SpooledSink(hung, self.spool)
+        try:
+            self.assertFalse(send_all([sink], batch(0))[0].ok)
+            result = send_all([sink], batch(1))[0]
+            self.assertTrue('busy' in str(result))
+        finally:
+            release.set()
+        sink.sending.join()
+        self.assertTrue(send_all([sink], batch(2))[0].ok)
+        self.assertEqual(hung.batches, [[('m0', 0, 1000)], [('m1', 1, 1001)], [('m2', 2, 1002)]])
+
+    def test_busy_batch_is_spooled_when_idle(self):
+        sink = SpooledSink(FlakySink(), self.spool)
+        sink.not_sent(batch(0))
+        sink.send(batch(1))
+        self.assertEqual(sink.sink.batches, [[('m0', 0, 1000)], [('m1', 1, 1001)]])
+
+    def test_attributes_pass_through(self):
+        sink = SpooledSink(FlakySink(), self.spool)
+        self.assertEqual(sink.name, 'flaky')
+        sink.sending = 'thread'
+        self.assertEqual(sink.sink.sending, 'thread')
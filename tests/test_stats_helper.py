@@ -1,4 +1,5 @@
 from logster.parsers import stats_helper
+from array import array
 import unittest
 
 class TestStatsHelper(unittest.TestCase):
@@ -63,3 +64,126 @@ class TestStatsHelper(unittest.TestCase):
 
     def test_90th_1_to_15_noncontiguous(self):
         self.assertAlmostEqual(stats_helper.find_percentile([1,2,3,4,5,6,7,8,9,15],90), 9.6)
+
+
+class TestSummarize(unittest.TestCase):
+
+    def check(self, numbers, percentiles):
+        summary = stats_helper.summarize(numbers, percentiles)
+        for percentile in percentiles:
+            self.assertAlmostEqual(summary['percentiles'][percentile],
+                                   stats_helper.find_percentile(list(numbers), percentile))
+        return summary
+
+    def test_matches_find_percentile(self):
+        self.check([1,2,3], [10, 50, 90])
+        self.check([0,1,2,3,4,5,6,7,8,9], [12, 50, 100])
+        self.check([1,2,3,4,5,6,7,8,9,15], [0, 90])
+        self.check([1,-1], [50, 90])
+        self.check([float(1.1),float(2.3),float(0.4)], [50])
+
+    def test_statistics(self):
+        numbers = array('d', [4, 2, 9, 5, 5, 4, 7, 4])
+        summary = self.check(numbers, [50, 90])
+        self.assertEqual((summary['count'], summary['min'], summary['max']), (8, 2, 9))
+        self.assertAlmostEqual(summary['mean'], 5)
+        self.assertAlmostEqual(summary['stddev'], 2)
+        self.assertEqual(list(numbers), [4, 2, 9, 5, 5, 4, 7, 4])
+
+    def test_stddev_of_large_values(self):
+        numbers = [1e9 + 0.1 * i for i in range(10)]
+        backends = [None]
+        if stats_helper.numpy is not None:
+            backends.append(stats_helper.numpy)
+        saved = stats_helper.numpy
+        try:
+            for backend in backends:
+                stats_helper.numpy = backend
+                self.assertAlmostEqual(stats_helper.summarize(numbers, [50])['stddev'], 0.2872281, places=5)
+        finally:
+            stats_helper.numpy = saved
+
+    def test_empty(self):
+        summary = stats_helper.summarize([], [90])
+        self.assertEqual((summary['count'], summary['mean'], summary['percentiles']), (0, None, {90: None}))
+
+    def test_pure_python(self):
+        numpy, stats_helper.numpy = stats_helper.numpy, None
+        try:
+            summary = self.check([1,2,3,4,5,6,7,8,9,10], [90])
+        finally:
+            stats_helper.numpy = numpy
+        self.assertEqual(summary['percentiles'][90], 9.1)
+
+    @unittest.skipIf(stats_helper.numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        summary = self.check(array('d', range(1001)), [1, 50, 99.9])
+        self.assertTrue(isinstance(summary['max'], float))
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def sketch(self, values, relative_error=0.01):
+        sketch = stats_helper.QuantileSketch(relative_error)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertClose(self, estimate, exact, relative_error=0.01):
+        self.assertTrue(abs(estimate - exact) <= abs(exact) * relative_error + 1e-9, (estimate, exact))
+
+    def test_within_error(self):
+        values = [(i * 7919) % 10007 / 10.0 for i in range(20000)]
+        sketch = self.sketch(values)
+        for percentile in (1, 10, 50, 90, 99, 100):
+            self.assertClose(sketch.percentile(percentile), stats_helper.find_percentile(values, percentile))
+        self.assertAlmostEqual(sketch.mean(), stats_helper.find_mean(values))
+        self.assertEqual((sketch.min, sketch.max, len(sketch)), (0.0, 1000.6, 20000))
+
+    def test_interpolates_like_find_percentile(self):
+        self.assertEqual(self.sketch([1]).percentile(90), 1)
+        self.assertEqual(self.sketch([1, 2]).percentile(90), 1.9)
+        self.assertAlmostEqual(self.sketch([1, -1]).percentile(90), 0.8)
+        self.assertEqual(self.sketch([0, 1, 2, 3]).percentile(100), 3)
+        self.assertEqual(self.sketch([1, -1, 0]).median(), 0)
+        self.assertEqual(stats_helper.QuantileSketch().percentile(50), None)
+        self.assertEqual(stats_helper.QuantileSketch().mean(), None)
+
+    def test_bounded(self):
+        sketch = stats_helper.QuantileSketch(0.01, max_buckets=100)
+        for i in range(1, 100001):
+            sketch.add(float(i))
+        self.assertEqual(len(sketch.positive), 100)
+        self.assertClose(sketch.percentile(99), stats_helper.find_percentile(list(range(1, 100001)), 99))
+
+    def test_merge(self):
+        values = [float(i % 977) for i in range(5000)]
+        merged = self.sketch(values[:2000])
+        merged.merge(self.sketch(values[2000:]))
+        whole = self.sketch(values)
+        self.assertEqual((merged.count, merged.min, merged.max), (whole.count, whole.min, whole.max))
+        self.assertEqual(merged.percentile(95), whole.percentile(95))
+        self.assertRaises(ValueError, merged.merge, self.sketch([1], 0.05))
+
+    def test_bad_error(self):
+        self.assertRaises(ValueError, stats_helper.QuantileSketch, 0)
+        self.assertRaises(ValueError, stats_helper.QuantileSketch, 1.5)
+
+    def test_metric_logster(self):
+        from logster.parsers.MetricLogster import MetricLogster
+        lines = ['METRIC_TIME metric=render value=%d ms\n' % (i % 100) for i in range(1000)]
+        exact, sketched = MetricLogster('-p 50,99'), MetricLogster('-p 50,99 --sketch')
+        for line in lines:
+            exact.parse_line(line)
+        half = len(lines) // 2
+        other = MetricLogster('-p 50,99 --sketch')
+        for line in lines[:half]:
+            sketched.parse_line(line)
+        for line in lines[half:]:
+            other.parse_line(line)
+        sketched.merge(other)
+        expected = dict((m.name, m.value) for m in exact.get_state(60))
+        for metric in sketched.get_state(60):
+            self.assertClose(metric.value, expected[metric.name])
+            self.assertEqual(metric.units, 'ms')
+        self.assertEqual(len(sketched.times['render']['values']), 1000)
@@ -0,0 +1,161 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from logster.tailer import LogTailer, TailState
+
+
+class TestLogTailer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.state_file = os.path.join(self.dir, 'access_log.state')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data, mode='ab'):
+        f = open(self.log_file, mode)
+        f.write(data)
+        f.close()
+
+    def read_new(self, block_size=4):
+        tailer = LogTailer(self.log_file, self.state_file, block_size=block_size)
+        lines = list(tailer.read_lines())
+        tailer.save()
+        return lines
+
+    def test_first_run_skips_to_end(self):
+        self.write(b'one\ntwo\n')
+        tailer = LogTailer(self.log_file, self.state_file)
+        self.assertFalse(tailer.has_state())
+        tailer.skip_to_end()
+        tailer.save()
+        self.assertEqual(self.read_new(), [])
+
+    def test_reads_only_new_lines(self):
+        self.write(b'one\n')
+        self.read_new()
+        self.write(b'two\nthree\n')
+        self.assertEqual(self.read_new(), ['two\n', 'three\n'])
+        self.assertEqual(self.read_new(), [])
+
+    def test_partial_line_left_for_next_run(self):
+        self.write(b'one\ntw')
+        self.assertEqual(self.read_new(), ['one\n'])
+        self.write(b'o\n')
+        self.assertEqual(self.read_new(), ['two\n'])
+
+    def test_truncated_file_is_read_from_start(self):
+        self.write(b'a long first line\n')
+        self.read_new()
+        self.write(b'new\n', 'wb')
+        self.assertEqual(self.read_new(), ['new\n'])
+
+    def test_replaced_head_is_read_from_start(self):
+        self.write(b'x' * 300 + b'\n')
+        self.read_new()
+        self.write(b'y' * 300 + b'\nmore\n', 'r+b')
+        self.assertEqual(self.read_new(), ['y' * 300 + '\n', 'more\n'])
+
+    def test_reads_logtail2_state_file(self):
+        self.write(b'one\ntwo\n')
+        f = open(self.state_file, 'w')
+        f.write('%s\n4\n' % os.stat(self.log_file).st_ino)
+        f.close()
+        self.assertEqual(self.read_new(), ['two\n'])
+        state = TailState.load(self.state_file)
+        self.assertEqual(state.offset, 8)
+        self.assertTrue(state.fingerprint)
+
+    def test_same_tailer_carries_on(self):
+        self.write(b'one\n')
+        self.read_new()
+        tailer = LogTailer(self.log_file, self.state_file)
+        self.write(b'two\n')
+        self.assertEqual(list(tailer.read_lines()), ['two\n'])
+        self.write(b'three\n')
+        self.assertEqual(list(tailer.read_lines()), ['three\n'])
+
+    def test_split_on_line_boundaries(self):
+        self.write(b'one\n')
+        self.read_new()
+        self.write(b''.join(('line %d\n' % i).encode('ascii') for i in range(100)) + b'partial')
+        tailer = LogTailer(self.log_file, self.state_file, block_size=16)
+        fd = tailer.open()
+        chunks = tailer.split(fd, 7)
+        fd.seek(0)
+        data = fd.read()
+        fd.close()
+        self.assertEqual(chunks[0][0], 4)
+        self.assertEqual(chunks[-1][1], len(data) - len(b'partial'))
+        for (start, end), (next_start, next_end) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, next_start)
+        for start, end in chunks:
+            self.assertEqual(data[end - 1:end], b'\n')
+
+
+class TestRotation(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.state_file = os.path.join(self.dir, 'state')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, path, data, mode='ab'):
+        f = open(path, mode)
+        f.write(data)
+        f.close()
+
+    def read_new(self):
+        tailer = LogTailer(self.log_file, self.state_file, block_size=4)
+        lines = list(tailer.read_lines())
+        tailer.save()
+        return lines
+
+    def test_moved_log_is_finished_first(self):
+        self.write(self.log_file, b'one\n')
+        self.read_new()
+        self.write(self.log_file, b'two\nthr')
+        os.rename(self.log_file, self.log_file + '.1')
+        self.write(self.log_file, b'four\n')
+        self.assertEqual(self.read_new(), ['two\n', 'thr', 'four\n'])
+        self.assertEqual(self.read_new(), [])
+
+    def test_compressed_log_is_finished_first(self):
+        self.write(self.log_file, b'one\n')
+        self.read_new()
+        self.write(self.log_file, b'two\n')
+        f = gzip.open(self.log_file + '.1.gz', 'wb')
+        f.write(b'one\ntwo\n')
+        f.close()
+        os.unlink(self.log_file)
+        self.write(self.log_file, b'three\n')
+        self.assertEqual(self.read_new(), ['two\n', 'three\n'])
+
+    def test_copytruncate(self):
+        self.write(self.log_file, b'one\n')
+        self.read_new()
+        self.write(self.log_file, b'two\n')
+        self.write(self.log_file + '.1', b'one\ntwo\n')
+        self.write(self.log_file, b'three\nfour\nfive\n', 'r+b')
+        self.assertEqual(self.read_new(), ['two\n', 'three\n', 'four\n', 'five\n'])
+
+    def test_stopping_in_rotated_log(self):
+        self.write(self.log_file, b'one\n')
+        self.read_new()
+        self.write(self.log_file, b'two\nthree\n')
+        os.rename(self.log_file, self.log_file + '.1')
+        self.write(self.log_file, b'four\n')
+        tailer = LogTailer(self.log_file, self.state_file)
+        lines = tailer.read_lines()
+        self.assertEqual(next(lines), 'two\n')
+        lines.close()
+        tailer.save()
+        self.assertEqual(self.read_new(), ['three\n', 'four\n'])
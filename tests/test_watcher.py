@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from logster.watcher import InotifyWatcher, PollingWatcher, make_watcher
+
+
+def inotify_available():
+    try:
+        InotifyWatcher(tempfile.gettempdir()).close()
+    except (ImportError, OSError, AttributeError):
+        return False
+    return True
+
+
+class WatcherTests(object):
+    """Tests run against each kind of watcher."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, 'access_log')
+        self.write(b'one\n')
+        self.watcher = self.make_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.dir)
+
+    def write(self, data, path=None):
+        f = open(path or self.log_file, 'ab')
+        f.write(data)
+        f.close()
+
+    def test_times_out_without_change(self):
+        start = time.time()
+        self.assertFalse(self.watcher.wait(0.2))
+        self.assertTrue(time.time() - start >= 0.15)
+
+    def test_wakes_on_append(self):
+        self.write(b'two\n')
+        self.assertTrue(self.watcher.wait(2))
+
+    def test_wakes_on_append_while_waiting(self):
+        timer = threading.Timer(0.1, self.write, [b'two\n'])
+        timer.start()
+        try:
+            start = time.time()
+            self.assertTrue(self.watcher.wait(5))
+            self.assertTrue(time.time() - start < 4)
+        finally:
+            timer.join()
+
+    def test_wakes_on_rotation(self):
+        os.rename(self.log_file, self.log_file + '.1')
+        self.write(b'new\n')
+        self.assertTrue(self.watcher.wait(2))
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+
+    def make_watcher(self):
+        return PollingWatcher(self.log_file, poll_interval=0.01)
+
+    def test_missing_file(self):
+        watcher = PollingWatcher(os.path.join(self.dir, 'missing'), poll_interval=0.01)
+        self.assertFalse(watcher.wait(0.05))
+        self.write(b'one\n', watcher.path)
+        self.assertTrue(watcher.wait(1))
+
+
+@unittest.skipUnless(inotify_available(), 'inotify is not available')
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+
+    def make_watcher(self):
+        return InotifyWatcher(self.log_file)
+
+    def test_ignores_other_files(self):
+        self.write(b'noise\n', os.path.join(self.dir, 'error_log'))
+        self.assertFalse(self.watcher.wait(0.2))
+
+    def test_make_watcher(self):
+        watcher = make_watcher(self.log_file)
+        watcher.close()
+        self.assertTrue(isinstance(watcher, InotifyWatcher))
+
+
+if __name__ == '__main__':
+    unittest.main()